@@ -0,0 +1,6 @@
+"""
+Бенчмарки производительности CRM.
+
+Запуск из папки crm/:
+    python -m benchmarks.<имя_модуля> --help
+"""
@@ -0,0 +1,150 @@
+"""
+Бенчмарк горячих запросов до и после архивации оплаченных заказов.
+
+Создаёт --orders заказов (доля --pending-share в ожидании, остальные оплачены
+давно), замеряет запросы по активным заказам, выполняет archive_orders
+и замеряет их снова.
+
+    python -m benchmarks.archive --orders 1000000
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from benchmarks.utils import (
+    format_summary,
+    measure,
+    setup_django,
+    temporary_file_database,
+)
+
+
+def seed(orders_count: int, pending_share: float, batch: int = 5000) -> None:
+    from django.utils import timezone
+
+    from ordersapp.models import Dish, Order, OrderEvent
+
+    dishes: List[Dish] = Dish.objects.bulk_create(
+        [Dish(name=f"Блюдо {i}", price=100 + i) for i in range(30)]
+    )
+    through = Order.items.through
+    paid_at = timezone.now() - timedelta(days=90)
+    pending_every: int = max(1, round(1 / pending_share)) if pending_share else 0
+    for start in range(0, orders_count, batch):
+        numbers = range(start, min(start + batch, orders_count))
+        orders: List[Order] = Order.objects.bulk_create(
+            [
+                Order(
+                    table_number=i % 9 + 1,
+                    status=(
+                        Order.STATUS_PENDING
+                        if pending_every and i % pending_every == 0
+                        else Order.STATUS_PAID
+                    ),
+                    total_price=300,
+                )
+                for i in numbers
+            ]
+        )
+        through.objects.bulk_create(
+            [
+                through(order_id=order.pk, dish_id=dishes[(order.pk + k) % 30].pk)
+                for order in orders
+                for k in range(3)
+            ]
+        )
+        OrderEvent.objects.bulk_create(
+            [
+                OrderEvent(
+                    order_id=order.pk,
+                    from_status=Order.STATUS_READY,
+                    to_status=Order.STATUS_PAID,
+                    created_at=paid_at,
+                )
+                for order in orders
+                if order.status == Order.STATUS_PAID
+            ]
+        )
+
+
+def hot_queries() -> Dict[str, Callable[[], object]]:
+    from django.test import Client
+    from django.urls import reverse
+
+    from ordersapp.cache import orders_list_cache
+    from ordersapp.models import Order
+
+    client: Client = Client()
+    url: str = reverse("ordersapp:order-list")
+
+    def api_page() -> None:
+        orders_list_cache.clear()  # замеряем выборку, а не кэш
+        client.get(url, {"status": Order.STATUS_PENDING, "table_number": 7})
+
+    return {
+        "активные заказы стола 7": lambda: list(
+            Order.objects.filter(table_number=7)
+            .exclude(status=Order.STATUS_PAID)
+            .prefetch_related("items")
+        ),
+        "число заказов в ожидании": lambda: Order.objects.filter(
+            status=Order.STATUS_PENDING
+        ).count(),
+        "API: ожидающие заказы стола 7": api_page,
+    }
+
+
+def database_size() -> float:
+    from django.db import connection
+
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA page_count")
+        pages: int = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        return pages * cursor.fetchone()[0] / 1024 / 1024
+
+
+def run(orders_count: int, pending_share: float, repeat: int) -> None:
+    from django.core.management import call_command
+    from django.db import connection
+
+    started: float = time.perf_counter()
+    seed(orders_count, pending_share)
+    print(f"Создано {orders_count} заказов за {time.perf_counter() - started:.1f} с")
+    with connection.cursor() as cursor:
+        cursor.execute("ANALYZE")
+
+    for stage in ("до архивации", "после архивации"):
+        if stage == "после архивации":
+            started = time.perf_counter()
+            call_command("archive_orders", "--batch-size", "5000", stdout=StringIO())
+            print(f"\narchive_orders: {time.perf_counter() - started:.1f} с")
+            with connection.cursor() as cursor:
+                cursor.execute("VACUUM")
+                cursor.execute("ANALYZE")
+        print(f"\n{stage}, размер БД {database_size():.1f} МБ")
+        for title, query in hot_queries().items():
+            query()  # прогрев
+            print(format_summary(f"  {title}", measure(query, repeat)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--pending-share", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    with tempfile.TemporaryDirectory() as tmp:
+        with temporary_file_database(str(Path(tmp) / "bench.sqlite3")):
+            run(args.orders, args.pending_share, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Бенчмарк сжатия ответов: размер ответа и время загрузки страниц
+со списком из --orders заказов без сжатия, с gzip и с brotli.
+
+Время загрузки = время ответа сервера + передача по каналу
+заданной скорости (--mbit), без учёта задержки сети.
+
+    python -m benchmarks.compression --orders 1000
+"""
+
+import argparse
+import statistics
+from typing import Dict, List
+
+from benchmarks.serialization import seed
+from benchmarks.utils import measure, setup_django, temporary_database
+
+ENCODINGS: Dict[str, str] = {
+    "без сжатия": "identity",
+    "gzip": "gzip",
+    "brotli": "br, gzip",
+}
+
+
+def run(orders_count: int, mbit: float, repeat: int) -> None:
+    from django.test import Client
+    from django.urls import reverse
+
+    from crm.middleware import brotli
+    from ordersapp.models import Order
+
+    seed(orders_count)
+    Order.objects.filter(pk__in=Order.objects.values("pk")[: orders_count // 2]).update(
+        status=Order.STATUS_PAID
+    )
+    if brotli is None:
+        print("brotli не установлен: вместо brotli ответ сжимается gzip")
+    client: Client = Client()
+    pages: Dict[str, str] = {
+        "Список заказов (HTML)": reverse("ordersapp:orders_list"),
+        "Выручка (HTML)": reverse("ordersapp:total_incomes"),
+        "Поиск заказов (HTML)": reverse("ordersapp:order_search") + "?q=1",
+    }
+    print(f"Заказов: {orders_count}, канал {mbit} Мбит/с")
+    for title, url in pages.items():
+        print(f"\n{title}")
+        for name, accept in ENCODINGS.items():
+            response = client.get(url, HTTP_ACCEPT_ENCODING=accept)
+            size: int = len(response.content)
+            timings: List[float] = measure(
+                lambda: client.get(url, HTTP_ACCEPT_ENCODING=accept), repeat
+            )
+            server: float = statistics.median(timings)
+            transfer: float = size * 8 / (mbit * 1_000_000) * 1000
+            print(
+                f"  {name:<11} {response.get('Content-Encoding', '-'):<9}"
+                f"{size / 1024:>9.1f} КБ  сервер {server:>7.1f} мс  "
+                f"загрузка {server + transfer:>7.1f} мс"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--mbit", type=float, default=10.0)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        run(args.orders, args.mbit, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Бенчмарк режимов gunicorn (sync, gthread, uvicorn) на нагрузке кафе.
+
+Для каждого режима запускается gunicorn с gunicorn.conf.py на временной БД.
+Часть клиентов открывает тяжёлую страницу выручки, остальные - список
+заказов API. Замеряется пропускная способность и задержка быстрых запросов:
+в режиме sync с одним процессом медленная страница блокирует всех.
+
+    python -m benchmarks.gunicorn_modes --workers 2 --seconds 10 --orders 2000
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from benchmarks.utils import format_summary
+
+CRM_DIR: Path = Path(__file__).resolve().parent.parent
+
+SEED_SCRIPT: str = """
+import django
+django.setup()
+from ordersapp.models import Dish, Order
+count = int({orders})
+dishes = Dish.objects.bulk_create(
+    [Dish(name=f"Блюдо {{i}}", price=100 + i) for i in range(20)]
+)
+orders = Order.objects.bulk_create(
+    [
+        Order(table_number=i % 9 + 1, status=Order.STATUS_PAID, total_price=300)
+        for i in range(count)
+    ]
+)
+through = Order.items.through
+through.objects.bulk_create(
+    [
+        through(order_id=order.pk, dish_id=dishes[(order.pk + k) % 20].pk)
+        for order in orders
+        for k in range(3)
+    ]
+)
+"""
+
+MODES: Tuple[str, ...] = ("sync", "gthread", "uvicorn")
+FAST_URL: str = "/cafe/api/orders/?table_number={table}"
+SLOW_URL: str = "/cafe/orders/total/"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(base_url: str, timeout: float = 30) -> None:
+    deadline: float = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/cafe/", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn не запустился")
+
+
+def load(base_url: str, seconds: float, fast_clients: int, slow_clients: int):
+    """
+    Нагрузка: быстрые и медленные клиенты в отдельных потоках
+    :return: задержки быстрых и медленных запросов (мс), количество ошибок
+    """
+    deadline: float = time.monotonic() + seconds
+    timings: Dict[str, List[float]] = {"fast": [], "slow": []}
+    errors: List[int] = [0]
+    lock: threading.Lock = threading.Lock()
+
+    def client(kind: str, number: int) -> None:
+        while time.monotonic() < deadline:
+            path: str = (
+                FAST_URL.format(table=number % 9 + 1) if kind == "fast" else SLOW_URL
+            )
+            started: float = time.perf_counter()
+            try:
+                urllib.request.urlopen(base_url + path, timeout=60).read()
+            except OSError:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                timings[kind].append((time.perf_counter() - started) * 1000)
+
+    threads: List[threading.Thread] = [
+        threading.Thread(target=client, args=("fast", i)) for i in range(fast_clients)
+    ] + [threading.Thread(target=client, args=("slow", i)) for i in range(slow_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings, errors[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--fast-clients", type=int, default=8)
+    parser.add_argument("--slow-clients", type=int, default=2)
+    parser.add_argument("--modes", nargs="+", default=list(MODES), choices=MODES)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env: Dict[str, str] = {
+            **os.environ,
+            "DJANGO_SETTINGS_MODULE": "crm.settings_production",
+            "DJANGO_DATABASE_NAME": str(Path(tmp) / "bench.sqlite3"),
+            "DJANGO_LOGLEVEL": "WARNING",
+            "GUNICORN_ACCESSLOG": "/dev/null",
+            "GUNICORN_WORKERS": str(args.workers),
+            "GUNICORN_THREADS": str(args.threads),
+        }
+        subprocess.run(
+            [sys.executable, "manage.py", "migrate", "-v", "0"],
+            cwd=CRM_DIR,
+            env=env,
+            check=True,
+        )
+        subprocess.run(
+            [sys.executable, "-c", SEED_SCRIPT.format(orders=args.orders)],
+            cwd=CRM_DIR,
+            env=env,
+            check=True,
+        )
+
+        for mode in args.modes:
+            port: int = free_port()
+            server = subprocess.Popen(
+                [sys.executable, "-m", "gunicorn"],
+                cwd=CRM_DIR,
+                env={
+                    **env,
+                    "GUNICORN_WORKER_CLASS": mode,
+                    "GUNICORN_BIND": f"127.0.0.1:{port}",
+                },
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            base_url: str = f"http://127.0.0.1:{port}"
+            try:
+                wait_until_ready(base_url)
+                timings, errors = load(
+                    base_url, args.seconds, args.fast_clients, args.slow_clients
+                )
+            finally:
+                server.terminate()
+                server.wait()
+            fast_rps: float = len(timings["fast"]) / args.seconds
+            print(
+                f"\n{mode} (workers={args.workers}"
+                + (f", threads={args.threads}" if mode == "gthread" else "")
+                + f"): {fast_rps:.1f} быстрых запросов/с, ошибок: {errors}"
+            )
+            for kind, title in (("fast", "список заказов API"), ("slow", "выручка")):
+                if timings[kind]:
+                    print(format_summary(f"  {title}", timings[kind]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Бенчмарк индексов заказов: чтение и запись с составными/частичными
+индексами (миграция 0010) и с прежними одиночными (0009).
+
+Создаёт --orders заказов, выполняет аудит планов запросов,
+замеряет горячие запросы и запись, затем откатывает миграцию 0010
+на тех же данных и повторяет замеры.
+
+    python -m benchmarks.indexes --orders 200000
+"""
+
+import argparse
+import tempfile
+import time
+from itertools import count
+from pathlib import Path
+from typing import Callable, Dict, Iterator
+
+from benchmarks.archive import database_size, seed
+from benchmarks.utils import (
+    format_summary,
+    measure,
+    setup_django,
+    temporary_file_database,
+)
+
+
+def read_queries() -> Dict[str, Callable[[], object]]:
+    from django.test import Client
+    from django.urls import reverse
+
+    from ordersapp.archive import paid_revenue_total
+    from ordersapp.cache import orders_list_cache
+    from ordersapp.models import Order, TableState
+    from ordersapp.tenancy import DEFAULT_CAFE_ID
+
+    client: Client = Client()
+    url: str = reverse("ordersapp:order-list")
+
+    def api(params: dict) -> Callable[[], None]:
+        def page() -> None:
+            orders_list_cache.clear()  # замеряем выборку, а не кэш
+            client.get(url, params)
+
+        return page
+
+    return {
+        "API: ожидающие заказы стола 7": api(
+            {"table_number": 7, "status": Order.STATUS_PENDING}
+        ),
+        "API: оплаченные по сумме": api(
+            {"status": Order.STATUS_PAID, "ordering": "-total_price"}
+        ),
+        "API: сортировка по сумме": api({"ordering": "-total_price"}),
+        "пересчёт TableState стола 7": lambda: TableState.refresh(DEFAULT_CAFE_ID, [7]),
+        "выручка": paid_revenue_total,
+    }
+
+
+def write_queries() -> Dict[str, Callable[[], object]]:
+    from ordersapp.models import Dish, Order
+
+    dishes = list(Dish.objects.all()[:3])
+    tables: Iterator[int] = count()
+
+    def create_order() -> None:
+        order: Order = Order.objects.create(table_number=next(tables) % 9 + 1)
+        order.items.set(dishes)
+
+    def change_status() -> None:
+        order: Order = Order.objects.filter(status=Order.STATUS_PENDING).last()
+        order.status = Order.STATUS_READY
+        order.save()
+
+    return {
+        "создание заказа с 3 блюдами": create_order,
+        "смена статуса заказа": change_status,
+    }
+
+
+def run(orders_count: int, pending_share: float, repeat: int) -> None:
+    from django.core.management import call_command
+    from django.db import connection
+
+    from ordersapp.index_audit import audit
+
+    started: float = time.perf_counter()
+    seed(orders_count, pending_share)
+    print(f"Создано {orders_count} заказов за {time.perf_counter() - started:.1f} с")
+
+    for stage in ("составные индексы (0010)", "одиночные индексы (0009)"):
+        if stage.endswith("(0009)"):
+            started = time.perf_counter()
+            call_command("migrate", "ordersapp", "0009", verbosity=0)
+            print(f"\nоткат 0010: {time.perf_counter() - started:.1f} с")
+        with connection.cursor() as cursor:
+            cursor.execute("VACUUM")
+            cursor.execute("ANALYZE")
+        print(f"\n{stage}, размер БД {database_size():.1f} МБ")
+        checked, findings = audit(("ordersapp_dish", "ordersapp_tablestate"))
+        unique = {(f.scenario, f.detail) for f in findings}
+        print(f"  аудит: запросов {checked}, проблемных строк плана {len(unique)}")
+        for scenario, detail in sorted(unique):
+            print(f"    {scenario}: {detail}")
+        for title, query in {**read_queries(), **write_queries()}.items():
+            query()  # прогрев
+            print(format_summary(f"  {title}", measure(query, repeat)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=200_000)
+    parser.add_argument("--pending-share", type=float, default=0.02)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    with tempfile.TemporaryDirectory() as tmp:
+        with temporary_file_database(str(Path(tmp) / "bench.sqlite3")):
+            run(args.orders, args.pending_share, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Бенчмарк задержки запросов при логировании на уровне INFO под нагрузкой.
+
+Сравнивает синхронную запись в файл (как было раньше) с AsyncQueueHandler
+и с отключённым логированием. Каждый поток отправляет POST /cafe/api/orders/,
+который пишет INFO-запись с телом запроса.
+
+    python -m benchmarks.logging_latency --requests 500 --threads 4
+"""
+
+import argparse
+import logging
+import tempfile
+import threading
+from logging import Handler
+from logging.handlers import TimedRotatingFileHandler
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from benchmarks.utils import (
+    format_summary,
+    measure,
+    setup_django,
+    temporary_file_database,
+)
+
+
+def build_handlers(logdir: Path) -> Dict[str, Callable[[], Optional[Handler]]]:
+    from crm.log_handlers import AsyncQueueHandler
+
+    return {
+        "sync TimedRotatingFileHandler": lambda: TimedRotatingFileHandler(
+            logdir / "sync.log", backupCount=3, encoding="utf-8"
+        ),
+        "AsyncQueueHandler": lambda: AsyncQueueHandler(
+            filename=str(logdir / "async.log"), console=False
+        ),
+        "без логирования (WARNING)": lambda: None,
+    }
+
+
+def run_log_calls(calls: int, workdir: Path) -> None:
+    """
+    Стоимость одного вызова log.info в потоке запроса, без учёта БД
+    """
+    logger: logging.Logger = logging.getLogger("benchmarks.logging")
+    logger.propagate = False
+    payload: Dict[str, object] = {"table_number": 3, "items": list(range(20))}
+    for title, factory in build_handlers(workdir).items():
+        handler: Optional[Handler] = factory()
+        logger.handlers = []
+        if handler is None:
+            logger.setLevel(logging.WARNING)
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+        timings: List[float] = measure(
+            lambda: logger.info("Создание заказа: %s", payload), calls
+        )
+        if handler is not None:
+            handler.close()
+        print(format_summary(f"log.info: {title}", timings))
+
+
+def run(requests_count: int, threads: int, workdir: Path) -> None:
+    from django.test import Client
+    from django.urls import reverse
+
+    from ordersapp.models import Dish
+
+    dish_ids: List[int] = [
+        Dish.objects.create(name=f"Блюдо {i}", price=100 + i).pk for i in range(5)
+    ]
+    url: str = reverse("ordersapp:order-list")
+    root: logging.Logger = logging.getLogger()
+    saved_handlers: List[Handler] = root.handlers[:]
+    saved_level: int = root.level
+
+    for title, factory in build_handlers(workdir).items():
+        handler: Optional[Handler] = factory()
+        root.handlers = []
+        if handler is None:
+            root.setLevel(logging.WARNING)
+        else:
+            handler.setFormatter(
+                logging.Formatter("%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+            )
+            root.addHandler(handler)
+            root.setLevel(logging.INFO)
+
+        timings: List[float] = []
+        lock: threading.Lock = threading.Lock()
+
+        def worker() -> None:
+            client: Client = Client()
+            payload: Dict[str, object] = {"table_number": 3, "items": dish_ids}
+            result: List[float] = measure(
+                lambda: client.post(url, payload, content_type="application/json"),
+                requests_count // threads,
+            )
+            with lock:
+                timings.extend(result)
+
+        pool: List[threading.Thread] = [
+            threading.Thread(target=worker) for _ in range(threads)
+        ]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        if handler is not None:
+            handler.close()
+        print(format_summary(title, timings))
+
+    root.handlers = saved_handlers
+    root.setLevel(saved_level)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    setup_django()
+    with tempfile.TemporaryDirectory() as tmp:
+        with temporary_file_database(str(Path(tmp) / "bench.sqlite3")):
+            run_log_calls(args.calls, Path(tmp))
+            run(args.requests, args.threads, Path(tmp))
+
+
+if __name__ == "__main__":
+    main()
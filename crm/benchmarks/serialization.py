@@ -0,0 +1,87 @@
+"""
+Бенчмарк сериализации списка заказов: время на 1000 заказов
+для OrderSerializer и быстрой сериализации через values()
+(serialize_orders), с JSONRenderer DRF и FastJSONRenderer (orjson).
+
+    python -m benchmarks.serialization --orders 1000
+"""
+
+import argparse
+from typing import Callable, Dict, List
+
+from benchmarks.utils import format_summary, measure, setup_django, temporary_database
+
+
+def seed(orders_count: int) -> None:
+    from ordersapp.models import Dish, Order
+
+    dishes: List[Dish] = Dish.objects.bulk_create(
+        [Dish(name=f"Блюдо {i}", price=100 + i + 0.25) for i in range(30)]
+    )
+    orders: List[Order] = Order.objects.bulk_create(
+        [
+            Order(table_number=i % 9 + 1, total_price=300 + i % 7 + 0.75)
+            for i in range(orders_count)
+        ]
+    )
+    through = Order.items.through
+    through.objects.bulk_create(
+        [
+            through(order_id=order.pk, dish_id=dishes[(order.pk + k) % 30].pk)
+            for order in orders
+            for k in range(3)
+        ]
+    )
+
+
+def cases() -> Dict[str, Callable[[], object]]:
+    from rest_framework.renderers import JSONRenderer
+
+    from crm.fast_json import FastJSONRenderer, orjson
+    from ordersapp.models import Order
+    from ordersapp.serializers import ORDER_VALUES, OrderSerializer, serialize_orders
+
+    orders = Order.objects.order_by("pk")
+    drf: JSONRenderer = JSONRenderer()
+    fast: FastJSONRenderer = FastJSONRenderer()
+    data: list = serialize_orders(orders.values(*ORDER_VALUES))
+    if orjson is None:
+        print("orjson не установлен: FastJSONRenderer работает как JSONRenderer")
+    return {
+        "OrderSerializer (items по запросу)": lambda: OrderSerializer(
+            orders.all(), many=True
+        ).data,
+        "OrderSerializer + prefetch_related": lambda: OrderSerializer(
+            orders.prefetch_related("items"), many=True
+        ).data,
+        "serialize_orders (values)": lambda: serialize_orders(
+            orders.values(*ORDER_VALUES)
+        ),
+        "JSONRenderer (json)": lambda: drf.render(data),
+        "FastJSONRenderer (orjson)": lambda: fast.render(data),
+        "было: OrderSerializer + JSONRenderer": lambda: drf.render(
+            OrderSerializer(orders.all(), many=True).data
+        ),
+        "стало: serialize_orders + FastJSON": lambda: fast.render(
+            serialize_orders(orders.values(*ORDER_VALUES))
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    setup_django()
+    with temporary_database():
+        seed(args.orders)
+        print(f"Заказов: {args.orders}, блюд в заказе: 3")
+        for title, case in cases().items():
+            case()  # прогрев
+            print(format_summary(f"  {title}", measure(case, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Бенчмарк запуска процесса: импорт crm.wsgi и время до первого ответа.
+
+Для каждого профиля настроек в отдельном процессе:
+    - `python -X importtime -c "import crm.wsgi"`: суммарное время импорта
+      и самые тяжёлые пакеты верхнего уровня;
+    - время от старта интерпретатора до ответа на первый запрос к crm.wsgi
+      (медиана по нескольким запускам).
+
+    python -m benchmarks.startup --runs 5 --output benchmarks/results/startup.md
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+CRM_DIR: Path = Path(__file__).resolve().parent.parent
+
+PROFILES: Dict[str, Dict[str, str]] = {
+    "crm.settings, DEBUG=1": {
+        "DJANGO_SETTINGS_MODULE": "crm.settings",
+        "DJANGO_DEBUG": "1",
+    },
+    "crm.settings, DEBUG=0": {
+        "DJANGO_SETTINGS_MODULE": "crm.settings",
+        "DJANGO_DEBUG": "0",
+    },
+    "crm.settings_production": {
+        "DJANGO_SETTINGS_MODULE": "crm.settings_production",
+        "DJANGO_DEBUG": "0",
+    },
+}
+
+FIRST_REQUEST_SCRIPT: str = """
+import io, sys, time
+from crm.wsgi import application
+environ = {
+    "REQUEST_METHOD": "GET", "PATH_INFO": "/cafe/", "QUERY_STRING": "",
+    "SERVER_NAME": "127.0.0.1", "SERVER_PORT": "8000", "HTTP_HOST": "127.0.0.1",
+    "SERVER_PROTOCOL": "HTTP/1.1", "wsgi.url_scheme": "http",
+    "wsgi.input": io.BytesIO(), "wsgi.errors": sys.stderr,
+    "wsgi.version": (1, 0), "wsgi.multithread": False,
+    "wsgi.multiprocess": True, "wsgi.run_once": False,
+}
+statuses = []
+body = b"".join(application(environ, lambda status, headers: statuses.append(status)))
+assert statuses[0].startswith("200"), statuses
+"""
+
+
+def run_python(args: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=CRM_DIR,
+        env={**os.environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_time(env: Dict[str, str]) -> Tuple[float, List[Tuple[str, float]]]:
+    """
+    :return: суммарное время импорта (мс) и топ пакетов по собственному времени
+    """
+    result = run_python(["-X", "importtime", "-c", "import crm.wsgi"], env)
+    total_us: int = 0
+    packages: Dict[str, int] = defaultdict(int)
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line.removeprefix("import time:").split("|")
+        total_us += int(self_us)
+        packages[name.strip().split(".")[0]] += int(self_us)
+    top: List[Tuple[str, float]] = sorted(
+        ((name, us / 1000) for name, us in packages.items()),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:8]
+    return total_us / 1000, top
+
+
+def first_request_time(env: Dict[str, str]) -> float:
+    """
+    :return: время от запуска интерпретатора до ответа на первый запрос (мс)
+    """
+    started: float = time.perf_counter()
+    run_python(["-c", FIRST_REQUEST_SCRIPT], env)
+    return (time.perf_counter() - started) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--output", type=Path, default=None)
+    args = parser.parse_args()
+
+    lines: List[str] = [
+        "# Запуск crm.wsgi",
+        "",
+        f"Python {sys.version.split()[0]}, запусков на профиль: {args.runs}.",
+        "",
+        "| Профиль | Импорт crm.wsgi, мс | Первый ответ, мс (медиана) |",
+        "|---|---|---|",
+    ]
+    details: List[str] = []
+    for title, env in PROFILES.items():
+        imports: List[float] = []
+        top: List[Tuple[str, float]] = []
+        for _ in range(args.runs):
+            total, top = import_time(env)
+            imports.append(total)
+        first: List[float] = [first_request_time(env) for _ in range(args.runs)]
+        lines.append(
+            f"| {title} | {statistics.median(imports):.1f} "
+            f"| {statistics.median(first):.1f} |"
+        )
+        details.append(f"\n## {title}: самые тяжёлые пакеты при импорте\n")
+        details += [f"- {name}: {ms:.1f} мс" for name, ms in top]
+
+    report: str = "\n".join(lines + details) + "\n"
+    print(report)
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(report, encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
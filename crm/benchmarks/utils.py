@@ -0,0 +1,100 @@
+"""
+Общие функции для бенчмарков: настройка Django,
+временная тестовая БД и подсчёт статистики по замерам.
+"""
+
+import os
+import statistics
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List
+
+
+def setup_django(settings_module: str = "crm.settings") -> None:
+    """
+    Инициализирует Django вне manage.py
+    :param settings_module: модуль настроек
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def temporary_database() -> Iterator[None]:
+    """
+    Создаёт тестовую БД (как при `manage.py test`) и удаляет её по выходу,
+    чтобы бенчмарки не трогали рабочую базу
+    """
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name: str = connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def measure(func: Callable[[], object], repeat: int) -> List[float]:
+    """
+    Выполняет функцию repeat раз
+    :return: список длительностей в миллисекундах
+    """
+    timings: List[float] = []
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    """
+    Считает среднее и перцентили по замерам (в миллисекундах)
+    """
+    ordered: List[float] = sorted(timings)
+
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+    return {
+        "n": len(ordered),
+        "mean": statistics.fmean(ordered),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": ordered[-1],
+    }
+
+
+def format_summary(title: str, timings: List[float]) -> str:
+    """
+    Строка отчёта по замерам
+    """
+    stats: Dict[str, float] = summarize(timings)
+    return (
+        f"{title:<40} n={stats['n']:<6} mean={stats['mean']:.3f}ms "
+        f"p50={stats['p50']:.3f}ms p95={stats['p95']:.3f}ms "
+        f"p99={stats['p99']:.3f}ms max={stats['max']:.3f}ms"
+    )
+
+
+@contextmanager
+def temporary_file_database(path: str) -> Iterator[None]:
+    """
+    Как temporary_database, но тестовая БД SQLite создаётся в файле:
+    так её могут одновременно использовать несколько потоков
+    :param path: путь к файлу БД
+    """
+    from django.db import connection
+
+    connection.settings_dict["TEST"]["NAME"] = path
+    # транзакции сразу берут блокировку на запись: без этого параллельные
+    # транзакции "чтение -> запись" получают "database is locked" без ожидания
+    connection.settings_dict["OPTIONS"]["transaction_mode"] = "IMMEDIATE"
+    with temporary_database():
+        yield
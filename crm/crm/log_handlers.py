@@ -0,0 +1,124 @@
+"""
+Обработчики и форматтеры логирования проекта.
+
+Запись в файл и в консоль вынесена из потока запроса:
+обработчик только кладёт запись в очередь, а фоновый поток
+QueueListener выполняет форматирование и ввод-вывод.
+"""
+
+import atexit
+import json
+import logging
+import os
+import sys
+from logging import Formatter, Handler, LogRecord
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from pathlib import Path
+from queue import SimpleQueue
+from typing import Any, Dict, List, Optional
+
+
+class JsonFormatter(Formatter):
+    """
+    Форматтер, выводящий каждую запись одной строкой JSON.
+    Удобен для сбора логов (docker json-file, Loki, ELK).
+    """
+
+    def format(self, record: LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exc_info"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class AsyncQueueHandler(QueueHandler):
+    """
+    Неблокирующий обработчик логов.
+
+    В потоке запроса запись только помещается в очередь,
+    форматирование и запись в файл/консоль выполняет QueueListener.
+    После fork (gunicorn с preload_app) слушатель перезапускается
+    в дочернем процессе, так как потоки при fork не наследуются.
+
+    :param filename: путь к файлу лога (None - без файла)
+    :param when: интервал ротации TimedRotatingFileHandler
+    :param backupCount: сколько файлов хранить
+    :param console: дублировать ли записи в stderr
+    """
+
+    def __init__(
+        self,
+        filename: Optional[str] = None,
+        when: str = "midnight",
+        backupCount: int = 3,
+        console: bool = True,
+    ) -> None:
+        super().__init__(SimpleQueue())
+        self.targets: List[Handler] = []
+        if console:
+            self.targets.append(logging.StreamHandler(sys.stderr))
+        if filename:
+            Path(filename).parent.mkdir(parents=True, exist_ok=True)
+            self.targets.append(
+                TimedRotatingFileHandler(
+                    filename,
+                    when=when,
+                    backupCount=backupCount,
+                    encoding="utf-8",
+                    delay=True,
+                )
+            )
+        self.listener: Optional[QueueListener] = None
+        self._pid: Optional[int] = None
+        self._start_listener()
+        atexit.register(self.close)
+
+    def _start_listener(self) -> None:
+        self.queue = SimpleQueue()
+        self.listener = QueueListener(
+            self.queue, *self.targets, respect_handler_level=True
+        )
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def setFormatter(self, fmt: Optional[Formatter]) -> None:
+        # форматирует фоновый поток, поэтому форматтер нужен целевым обработчикам
+        for target in self.targets:
+            target.setFormatter(fmt)
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        """
+        Подготавливает запись к передаче в очередь.
+        Сообщение собирается из аргументов сразу (аргументы могут
+        измениться позже), а итоговое форматирование остаётся
+        фоновому потоку.
+        """
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def emit(self, record: LogRecord) -> None:
+        if self._pid != os.getpid():
+            self._start_listener()
+        super().emit(record)
+
+    def close(self) -> None:
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+        for target in self.targets:
+            target.close()
+        super().close()
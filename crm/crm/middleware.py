@@ -0,0 +1,85 @@
+"""
+Middleware проекта.
+"""
+
+import secrets
+from typing import Tuple
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен: без него ответы сжимаются gzip
+    brotli = None
+
+re_accepts_brotli = _lazy_re_compile(r"\bbr\b")
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Сжатие HTML и JSON ответов: brotli, если клиент его принимает
+    и модуль установлен, иначе gzip (стандартный GZipMiddleware
+    с защитой от BREACH случайными байтами).
+
+    Сжимаются только текстовые типы из COMPRESSION_CONTENT_TYPES
+    и ответы не короче COMPRESSION_MIN_SIZE байт: короткие ответы
+    сжатие почти не уменьшает, а время на него тратится.
+    Потоковые ответы сжимаются gzip.
+
+    HTML (страницы с CSRF-токеном) перед сжатием brotli дополняется
+    комментарием случайной длины - та же защита от BREACH, что у gzip:
+    длина сжатого ответа перестаёт зависеть только от содержимого.
+    """
+
+    # уровень 5: сжатие близко к максимальному при скорости gzip;
+    # уровень 11 (по умолчанию в brotli) для динамических ответов слишком медленный
+    brotli_quality: int = 5
+
+    def process_response(
+        self, request: HttpRequest, response: HttpResponse
+    ) -> HttpResponse:
+        content_type: str = response.get("Content-Type", "").split(";")[0].strip()
+        types: Tuple[str, ...] = tuple(settings.COMPRESSION_CONTENT_TYPES)
+        if content_type not in types or response.has_header("Content-Encoding"):
+            return response
+        if (
+            not response.streaming
+            and len(response.content) < settings.COMPRESSION_MIN_SIZE
+        ):
+            return response
+        accepted: str = request.META.get("HTTP_ACCEPT_ENCODING", "")
+        if (
+            brotli is None
+            or response.streaming
+            or not re_accepts_brotli.search(accepted)
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        content: bytes = response.content
+        if content_type == "text/html":
+            content += self.breach_padding()
+        compressed: bytes = brotli.compress(
+            content, mode=brotli.MODE_TEXT, quality=self.brotli_quality
+        )
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers["Content-Length"] = str(len(compressed))
+        etag: str = response.get("ETag", "")
+        if etag.startswith('"'):
+            response.headers["ETag"] = "W/" + etag
+        response.headers["Content-Encoding"] = "br"
+        return response
+
+    def breach_padding(self) -> bytes:
+        """
+        HTML-комментарий из 0..max_random_bytes случайных байт (в hex),
+        как случайное имя файла в заголовке gzip у GZipMiddleware
+        """
+        size: int = secrets.randbelow(self.max_random_bytes + 1)
+        return f"<!-- {secrets.token_hex(size)} -->".encode()
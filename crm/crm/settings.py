@@ -13,12 +13,10 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import sys
 from os import getenv
 from pathlib import Path
-from datetime import datetime
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
-DATABASE_DIR = BASE_DIR / "database"
-DATABASE_DIR.mkdir(exist_ok=True)  # создаём папку в которой будет БД
+DATABASE_DIR = BASE_DIR / "database"  # папку создаёт manage.py или Dockerfile
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -62,7 +60,9 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "crm.middleware.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    "ordersapp.tenancy.CafeMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -70,7 +70,10 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 TESTING = "test" in sys.argv
-if not TESTING:
+# debug toolbar подключается только при отладке: без DEBUG он не импортируется
+# и не добавляет middleware к каждому запросу
+DEBUG_TOOLBAR = DEBUG and not TESTING
+if DEBUG_TOOLBAR:
     INSTALLED_APPS += ["debug_toolbar"]
     MIDDLEWARE += ["debug_toolbar.middleware.DebugToolbarMiddleware"]
 
@@ -100,10 +103,31 @@ WSGI_APPLICATION = "crm.wsgi.application"
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
-        "NAME": DATABASE_DIR / "db.sqlite3",
+        "NAME": getenv("DJANGO_DATABASE_NAME", DATABASE_DIR / "db.sqlite3"),
+        "OPTIONS": {
+            # транзакция сразу берёт блокировку на запись и ждёт её до timeout секунд,
+            # вместо мгновенной ошибки "database is locked" у параллельных запросов
+            "transaction_mode": "IMMEDIATE",
+            "timeout": 20,
+        },
+        # тестовая БД в файле, чтобы тесты с потоками работали как в продакшене
+        "TEST": {"NAME": DATABASE_DIR / "test_db.sqlite3"},
     }
 }
 
+# Отдельный файл SQLite для каждого кафе: DJANGO_CAFE_DATABASES=north,south
+# добавляет псевдонимы cafe_north, cafe_south (их указывают в Cafe.database).
+# БД кафе создаётся командой migrate --database cafe_north
+for _name in filter(None, getenv("DJANGO_CAFE_DATABASES", "").split(",")):
+    DATABASES[f"cafe_{_name}"] = {
+        **DATABASES["default"],
+        "NAME": DATABASE_DIR / f"cafe_{_name}.sqlite3",
+        "TEST": {"NAME": DATABASE_DIR / f"test_cafe_{_name}.sqlite3"},
+    }
+
+# данные кафе читаются и пишутся в БД кафе (ordersapp/tenancy.py)
+DATABASE_ROUTERS = ["ordersapp.tenancy.CafeRouter"]
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -137,25 +161,81 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"  # сюда собирает collectstatic
+
+# Сжатие ответов (crm/middleware.py): brotli или gzip для текстовых ответов
+# не короче COMPRESSION_MIN_SIZE байт
+COMPRESSION_MIN_SIZE = int(getenv("DJANGO_COMPRESSION_MIN_SIZE", 1024))
+COMPRESSION_CONTENT_TYPES = [
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "image/svg+xml",
+]
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# Кэш Django. Хранит счётчик поколений заказов для кэша списка заказов,
+# поэтому при нескольких процессах gunicorn бэкенд должен быть общим
+# (например, django.core.cache.backends.filebased.FileBasedCache или Redis)
+CACHES = {
+    "default": {
+        "BACKEND": getenv(
+            "DJANGO_CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": getenv("DJANGO_CACHE_LOCATION", ""),
+    }
+}
+
+# Кафе без явного выбора (?cafe=, заголовок X-Cafe) и сколько секунд
+# кафе хранится в кэше Django
+DEFAULT_CAFE = getenv("DJANGO_DEFAULT_CAFE", "main")
+CAFE_CACHE_TIMEOUT = int(getenv("DJANGO_CAFE_CACHE_TIMEOUT", 300))
+
+# Ширина ленты чекового принтера в символах (32 - лента 58 мм, 48 - 80 мм)
+# и сколько секунд готовый чек хранится в кэше Django
+RECEIPT_WIDTH = int(getenv("DJANGO_RECEIPT_WIDTH", 32))
+RECEIPT_CACHE_TIMEOUT = int(getenv("DJANGO_RECEIPT_CACHE_TIMEOUT", 24 * 60 * 60))
+
+# Максимальное количество закэшированных страниц списка заказов в процессе
+ORDERS_LIST_CACHE_SIZE = int(getenv("DJANGO_ORDERS_LIST_CACHE_SIZE", 256))
+
+# Сколько секунд хранится ключ Idempotency-Key для повторов POST /cafe/api/orders/
+IDEMPOTENCY_KEY_TTL = int(getenv("DJANGO_IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+# Папка для результатов фоновых задач (отчёты, выгрузки), см. команду run_jobs
+JOBS_RESULT_DIR = Path(getenv("DJANGO_JOBS_RESULT_DIR", BASE_DIR / "job_results"))
+
 REST_FRAMEWORK = {
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
     "DEFAULT_FILTER_BACKENDS": [
         "django_filters.rest_framework.DjangoFilterBackend",
     ],
+    # JSON через orjson, если он установлен (crm/fast_json.py)
+    "DEFAULT_RENDERER_CLASSES": [
+        "crm.fast_json.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "crm.fast_json.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
-LOGDIR = BASE_DIR / "logs"
-LOGDIR.mkdir(exist_ok=True)
-LOGFILE_NAME = LOGDIR / f"django_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
+LOGDIR = BASE_DIR / "logs"  # папку создаёт обработчик логов
+LOGFILE_NAME = LOGDIR / "django.log"  # ротируется раз в сутки
 LOGFILE_SIZE = 1 * 1024 * 1024  # 1мБ
 LOGFILE_COUNT = 3
+LOG_LEVEL = getenv("DJANGO_LOGLEVEL", "INFO").upper()
+LOG_FORMAT = getenv("DJANGO_LOG_FORMAT", "verbose")  # verbose или json
 
 # Настройка логирования
 LOGGING = {
@@ -164,25 +244,24 @@ LOGGING = {
     "formatters": {  # укаазание формата вывода
         "verbose": {  # подробные логи
             "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-        }
+        },
+        "json": {  # структурированные логи, одна запись - одна строка JSON
+            "()": "crm.log_handlers.JsonFormatter",
+        },
     },
     "handlers": {
-        "console": {
-            "class": "logging.StreamHandler",
-            "formatter": "verbose",
-        },
-        "logfile": {
-            "class": "logging.handlers.TimedRotatingFileHandler",
-            "filename": LOGFILE_NAME,  # имя файла
+        "async": {
+            # запись в консоль и файл выполняет фоновый поток, а не поток запроса
+            "()": "crm.log_handlers.AsyncQueueHandler",
+            "filename": str(LOGFILE_NAME),  # имя файла
             "backupCount": LOGFILE_COUNT,  # сколько файлов хранить
-            "formatter": "verbose",
+            "formatter": LOG_FORMAT,
         },
     },
     "root": {
         "handlers": [
-            "console",
-            "logfile",
+            "async",
         ],
-        "level": "INFO",
+        "level": LOG_LEVEL,
     },
 }
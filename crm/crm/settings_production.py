@@ -0,0 +1,108 @@
+"""
+Настройки для продакшена (gunicorn в Docker).
+
+Подключаются переменной окружения:
+    DJANGO_SETTINGS_MODULE=crm.settings_production
+
+Берут за основу crm.settings и загружают только то, что нужно для
+обслуживания запросов: без debug toolbar и браузерного API DRF,
+с постоянными соединениями к БД и логами только в консоль
+(ротацией занимается docker).
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import (
+    CACHES,
+    DATABASES,
+    DEBUG_TOOLBAR_CONFIG,
+    INSTALLED_APPS,
+    LOG_FORMAT,
+    LOG_LEVEL,
+    MIDDLEWARE,
+    REST_FRAMEWORK,
+)
+
+DEBUG = False
+DEBUG_TOOLBAR = False
+# с DJANGO_DEBUG=1 базовые настройки уже подключили toolbar: убираем его
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app != "debug_toolbar"]
+MIDDLEWARE = [
+    middleware
+    for middleware in MIDDLEWARE
+    if middleware != "debug_toolbar.middleware.DebugToolbarMiddleware"
+]
+DEBUG_TOOLBAR_CONFIG = {
+    **DEBUG_TOOLBAR_CONFIG,
+    "SHOW_TOOLBAR_CALLBACK": lambda request: False,
+}
+
+# кэш списка заказов сверяется со счётчиком поколений в кэше Django:
+# с кэшем в памяти процесса запись в одном воркере gunicorn не сбрасывает
+# кэш других воркеров и они отдают устаревшие списки, поэтому без общего
+# бэкенда (файлы, Redis, memcached) кэш списка выключен
+PROCESS_LOCAL_CACHE_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+if CACHES["default"]["BACKEND"] in PROCESS_LOCAL_CACHE_BACKENDS:
+    ORDERS_LIST_CACHE_SIZE = 0
+
+DATABASES = {
+    alias: {
+        **config,
+        # соединение с БД переиспользуется между запросами одного процесса
+        "CONN_MAX_AGE": 60,
+        "CONN_HEALTH_CHECKS": True,
+    }
+    for alias, config in DATABASES.items()  # default и БД кафе
+}
+
+# статику отдаёт WhiteNoise прямо из gunicorn: файлы с хешем в имени
+# (ManifestStaticFilesStorage) кэшируются браузером навсегда, а сжатые
+# .gz/.br версии готовятся при collectstatic, а не на каждый запрос
+_security: int = MIDDLEWARE.index("django.middleware.security.SecurityMiddleware")
+MIDDLEWARE = [
+    *MIDDLEWARE[: _security + 1],
+    "whitenoise.middleware.WhiteNoiseMiddleware",
+    *MIDDLEWARE[_security + 1 :],
+]
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"
+    },
+}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # браузерный API тянет шаблоны и формы на каждый ответ
+    "DEFAULT_RENDERER_CLASSES": [
+        "crm.fast_json.FastJSONRenderer",
+    ],
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "verbose": {
+            "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+        },
+        "json": {
+            "()": "crm.log_handlers.JsonFormatter",
+        },
+    },
+    "handlers": {
+        "async": {
+            # только консоль: файлы логов в контейнере ротирует драйвер docker
+            "()": "crm.log_handlers.AsyncQueueHandler",
+            "formatter": LOG_FORMAT,
+        },
+    },
+    "root": {
+        "handlers": [
+            "async",
+        ],
+        "level": LOG_LEVEL,
+    },
+}
@@ -26,7 +26,7 @@ urlpatterns: List[path] = [
     path("cafe/", include("ordersapp.urls")),
 ]
 
-if settings.DEBUG:
+if settings.DEBUG_TOOLBAR:
     # Добавляем toolbar
     urlpatterns.append(
         path("__debug__/", include("debug_toolbar.urls")),
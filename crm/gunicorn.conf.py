@@ -0,0 +1,62 @@
+"""
+Конфигурация gunicorn. Gunicorn читает её автоматически из текущей папки
+(`gunicorn` без аргументов), параметры переопределяются переменными окружения:
+
+    GUNICORN_WORKER_CLASS  sync | gthread | uvicorn (по умолчанию gthread)
+    GUNICORN_WORKERS       количество процессов (по умолчанию 2 * CPU + 1)
+    GUNICORN_THREADS       потоков на процесс для gthread (по умолчанию 4)
+    GUNICORN_PRELOAD       1 - загружать приложение до fork (по умолчанию 1)
+    GUNICORN_MAX_REQUESTS  перезапуск процесса после N запросов (по умолчанию 1000)
+    GUNICORN_BIND          адрес (по умолчанию 0.0.0.0:8000)
+
+Режим uvicorn обслуживает ASGI-приложение crm.asgi, остальные - crm.wsgi.
+"""
+
+import multiprocessing
+import os
+from typing import Dict
+
+WORKER_CLASSES: Dict[str, str] = {
+    "sync": "sync",
+    "gthread": "gthread",
+    "uvicorn": "uvicorn_worker.UvicornWorker",
+}
+
+worker_mode: str = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_mode not in WORKER_CLASSES:
+    raise ValueError(
+        f"GUNICORN_WORKER_CLASS должен быть одним из: {', '.join(WORKER_CLASSES)}"
+    )
+
+wsgi_app: str = (
+    "crm.asgi:application" if worker_mode == "uvicorn" else "crm.wsgi:application"
+)
+worker_class: str = WORKER_CLASSES[worker_mode]
+bind: str = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers: int = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads: int = int(os.getenv("GUNICORN_THREADS", 4)) if worker_mode == "gthread" else 1
+
+# приложение импортируется один раз в мастере, процессы получают его
+# через fork и делят страницы памяти (copy-on-write)
+preload_app: bool = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+
+# процессы перезапускаются после max_requests запросов; разброс jitter
+# не даёт всем процессам перезапуститься одновременно
+max_requests: int = int(os.getenv("GUNICORN_MAX_REQUESTS", 1000))
+max_requests_jitter: int = max(1, max_requests // 10)
+
+timeout: int = 30
+graceful_timeout: int = 30
+keepalive: int = 5
+accesslog: str = os.getenv("GUNICORN_ACCESSLOG", "-")
+
+
+def post_fork(server, worker) -> None:
+    """
+    Соединения с БД, открытые в мастере при preload_app,
+    нельзя использовать в нескольких процессах
+    """
+    if preload_app:
+        from django.db import connections
+
+        connections.close_all()
@@ -15,6 +15,9 @@ def main():
             "available on your PYTHONPATH environment variable? Did you "
             "forget to activate a virtual environment?"
         ) from exc
+    from django.conf import settings
+
+    settings.DATABASE_DIR.mkdir(exist_ok=True)  # создаём папку в которой будет БД
     execute_from_command_line(sys.argv)
 
 
@@ -0,0 +1,154 @@
+"""
+Архив оплаченных заказов (:model:`ordersapp.ArchivedOrder`).
+
+Перенос оплаченных заказов из горячих таблиц и запросы,
+которые видят горячие и архивные заказы вместе (выручка, выгрузка).
+"""
+
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Dict, Iterator, List, Optional
+
+from django.db import transaction
+from django.db.models import OuterRef, Q, QuerySet, Subquery, Sum
+
+from .models import ArchivedOrder, Cafe, Dish, Order, OrderEvent
+from .pricing import order_items
+
+
+def _for_cafe(queryset: QuerySet, cafe: Optional[Cafe]) -> QuerySet:
+    return queryset.filter(cafe=cafe) if cafe is not None else queryset
+
+
+def archivable_orders(
+    cutoff: datetime, include_undated: bool = False, cafe: Optional[Cafe] = None
+) -> QuerySet:
+    """
+    Заказы, оплаченные раньше cutoff. Время оплаты берётся
+    из последнего перехода в "Оплачено" в журнале OrderEvent
+    :param cutoff: граница времени оплаты
+    :param include_undated: брать и оплаченные заказы без события оплаты
+        (оплачены до появления журнала)
+    :param cafe: только заказы этого кафе
+    """
+    paid_at: Subquery = Subquery(
+        OrderEvent.objects.filter(order=OuterRef("pk"), to_status=Order.STATUS_PAID)
+        .order_by("-created_at")
+        .values("created_at")[:1]
+    )
+    condition: Q = Q(paid_at__lt=cutoff)
+    if include_undated:
+        condition |= Q(paid_at__isnull=True)
+    return (
+        _for_cafe(Order.objects.filter(status=Order.STATUS_PAID), cafe)
+        .annotate(paid_at=paid_at)
+        .filter(condition)
+    )
+
+
+def archive_batch(orders: QuerySet, batch_size: int) -> int:
+    """
+    Переносит в архив очередную пачку заказов одной транзакцией:
+    вставка в ArchivedOrder и удаление из Order (со связями с блюдами).
+    Заказы и блюда читаются через values_list, без создания моделей,
+    цены блюд - на момент создания заказа (pricing.order_items)
+    :return: сколько заказов перенесено
+    """
+    through = Order.items.through
+    with transaction.atomic(using=orders.db):
+        rows: List[tuple] = list(
+            orders.order_by("pk").values_list(
+                "pk", "cafe_id", "table_number", "total_price", "paid_at", "created_at"
+            )[:batch_size]
+        )
+        if not rows:
+            return 0
+        ids: List[int] = [row[0] for row in rows]
+        items = order_items({row[0]: row[5] for row in rows}, orders.db)
+        ArchivedOrder.objects.using(orders.db).bulk_create(
+            [
+                ArchivedOrder(
+                    id=pk,
+                    cafe_id=cafe_id,
+                    table_number=table_number,
+                    total_price=total_price,
+                    items=[[dish_id, price] for dish_id, _, price in items[pk]],
+                    paid_at=paid_at,
+                )
+                for pk, cafe_id, table_number, total_price, paid_at, _ in rows
+            ]
+        )
+        through.objects.using(orders.db).filter(order_id__in=ids).delete()
+        Order.objects.using(orders.db).filter(pk__in=ids).delete()
+    return len(rows)
+
+
+def paid_revenue_total(cafe: Optional[Cafe] = None) -> Decimal:
+    """
+    Выручка по всем оплаченным заказам: горячим и архивным
+    :param cafe: только заказы этого кафе
+    """
+    hot: Decimal = _for_cafe(
+        Order.objects.filter(status=Order.STATUS_PAID), cafe
+    ).aggregate(total=Sum("total_price"))["total"] or Decimal(0)
+    archived: Decimal = _for_cafe(ArchivedOrder.objects.all(), cafe).aggregate(
+        total=Sum("total_price")
+    )["total"] or Decimal(0)
+    return hot + archived
+
+
+def iter_paid_orders(
+    chunk_size: int = 2000, cafe: Optional[Cafe] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Все оплаченные заказы (сначала горячие, затем архивные)
+    в одном формате, потоково, без загрузки всего списка в память
+    :param chunk_size: сколько строк читать из БД за раз
+    :param cafe: только заказы этого кафе
+    :return: словари с ключами pk, table_number, status, total_price, items
+    """
+    paid: QuerySet = _for_cafe(Order.objects.filter(status=Order.STATUS_PAID), cafe)
+    hot: Iterator[tuple] = (
+        paid.order_by("pk")
+        .values_list("pk", "table_number", "total_price", "created_at")
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        chunk: List[tuple] = list(islice(hot, chunk_size))
+        if not chunk:
+            break
+        # цены блюд - на момент создания заказа, одним индексом на пачку
+        items = order_items({row[0]: row[3] for row in chunk}, paid.db)
+        for pk, table_number, total_price, _ in chunk:
+            yield {
+                "pk": pk,
+                "table_number": table_number,
+                "status": Order.STATUS_PAID,
+                "total_price": total_price,
+                "items": [
+                    {"id": dish_id, "name": name, "price": price}
+                    for dish_id, name, price in items[pk]
+                ],
+            }
+    names: Dict[int, str] = dict(
+        _for_cafe(Dish.objects.all(), cafe).values_list("pk", "name")
+    )
+    archived: QuerySet = (
+        _for_cafe(ArchivedOrder.objects.all(), cafe)
+        .order_by("pk")
+        .values_list("pk", "table_number", "total_price", "items")
+    )
+    for pk, table_number, total_price, archived_items in archived.iterator(
+        chunk_size=chunk_size
+    ):
+        yield {
+            "pk": pk,
+            "table_number": table_number,
+            "status": Order.STATUS_PAID,
+            "total_price": total_price,
+            "items": [
+                {"id": dish_id, "name": names.get(dish_id, ""), "price": Decimal(price)}
+                for dish_id, price in archived_items
+            ],
+        }
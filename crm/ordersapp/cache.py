@@ -0,0 +1,143 @@
+"""
+Кэш ответов списка заказов (GET /cafe/api/orders/).
+
+Ответ кэшируется в памяти процесса по нормализованным параметрам запроса
+(фильтры, поиск, сортировка, страница) с вытеснением давно не использованных
+записей (LRU) и ограничением на их количество.
+
+Актуальность проверяется поколением заказов: любое изменение заказа
+после коммита записывает новое поколение (случайную строку), и записи
+прошлых поколений считаются устаревшими. Поколение не счётчик: incr
+файлового кэша - это get и set, и два одновременных изменения увеличили бы
+счётчик один раз. Поколение хранится в кэше Django (CACHES), поэтому
+при нескольких процессах gunicorn нужен общий бэкенд кэша: с кэшем
+в памяти процесса профиль crm.settings_production выключает кэш списка.
+"""
+
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest
+
+GENERATION_KEY: str = "ordersapp:orders_generation"
+
+
+def new_generation() -> str:
+    """
+    Новое поколение: строка, которая не совпадёт ни с одной прежней
+    """
+    return uuid.uuid4().hex
+
+
+def orders_generation() -> str:
+    """
+    Текущее поколение заказов. Если ключ вытеснен из кэша, записывается
+    новое поколение, а не начальное значение: иначе записи, сохранённые
+    при начальном поколении, снова стали бы актуальными
+    """
+    return cache.get_or_set(GENERATION_KEY, new_generation, timeout=None)
+
+
+def bump_orders_generation(using: Optional[str] = None) -> None:
+    """
+    Меняет поколение заказов после коммита текущей транзакции:
+    до коммита другие запросы ещё видят старые данные
+    :param using: псевдоним БД, в которую пишутся заказы (БД кафе):
+        ждём коммита транзакции именно этой БД
+    """
+    transaction.on_commit(
+        lambda: cache.set(GENERATION_KEY, new_generation(), timeout=None),
+        using=using,
+    )
+
+
+def normalize_query(request: HttpRequest) -> Tuple[Hashable, ...]:
+    """
+    Ключ кэша: хост, кафе запроса, путь и отсортированные непустые параметры
+    запроса, так что ?status=Готово&ordering=-total_price и обратный порядок совпадают
+    """
+    params: Tuple[Tuple[str, Tuple[str, ...]], ...] = tuple(
+        sorted(
+            (name, tuple(sorted(value for value in values if value)))
+            for name, values in request.GET.lists()
+            if any(values)
+        )
+    )
+    cafe_id: Optional[int] = getattr(getattr(request, "cafe", None), "pk", None)
+    return request.get_host(), cafe_id, request.path, params
+
+
+class ResponseCache:
+    """
+    Потокобезопасный LRU-кэш данных ответа с проверкой поколения
+    :param max_entries: максимальное количество записей, 0 - кэш выключен
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries: int = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[str, Any]]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.invalidations: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable, generation: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry: Optional[Tuple[str, Any]] = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] != generation:
+                del self._entries[key]
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, generation: str, data: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (generation, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests: int = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+orders_list_cache: ResponseCache = ResponseCache(
+    max_entries=getattr(settings, "ORDERS_LIST_CACHE_SIZE", 256)
+)
@@ -0,0 +1,52 @@
+from typing import Optional, Tuple
+
+from django import forms
+from django.db.models import Model
+
+from .models import Cafe, Dish, Order
+
+
+class OrderCreateForm(forms.ModelForm):
+    """
+    Форма создания заказа: столы из раскладки кафе и блюда из его меню
+    """
+
+    class Meta:
+        model: Model = Order
+        fields: Tuple[str, str] = ("table_number", "items")
+
+    def __init__(self, *args, cafe: Cafe, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.fields["table_number"] = forms.TypedChoiceField(
+            label=self.fields["table_number"].label,
+            choices=cafe.table_choices(),
+            coerce=int,
+        )
+        self.fields["items"].queryset = Dish.objects.filter(cafe=cafe)
+
+
+class OrderUpdateForm(forms.ModelForm):
+    """
+    Форма обновления заказа.
+    Скрытое поле version хранит версию заказа на момент открытия формы:
+    если заказ успели изменить, сохранение вернёт ошибку, а не затрёт чужие правки.
+    """
+
+    class Meta:
+        model: Model = Order
+        fields: Tuple[str, str, str] = ("status", "items", "version")
+        widgets = {"version": forms.HiddenInput()}
+
+    def __init__(self, *args, cafe: Optional[Cafe] = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        # без версии (старые клиенты) проверяется версия, прочитанная из БД
+        self.fields["version"].required = False
+        if cafe is not None:
+            self.fields["items"].queryset = Dish.objects.filter(cafe=cafe)
+
+    def clean_version(self) -> int:
+        """
+        Пустая версия (пустое скрытое поле) - версия, прочитанная из БД
+        """
+        version: Optional[int] = self.cleaned_data.get("version")
+        return self.instance.version if version is None else version
@@ -0,0 +1,173 @@
+"""
+Аудит индексов по реальным запросам приложения.
+
+Страницы и эндпоинты вызываются тестовым клиентом, SQL каждого
+запроса перехватывается и передаётся в EXPLAIN (QUERY PLAN).
+В плане ищутся полные сканирования таблиц и сортировки во
+временных B-деревьях - признаки того, что подходящего индекса нет.
+Все вызовы выполняются в транзакции, которая откатывается,
+поэтому аудит можно запускать на рабочей базе.
+"""
+
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .models import Dish, Order
+
+# Префикс EXPLAIN для разных СУБД
+_EXPLAIN_SQL: Dict[str, str] = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+# Имя таблицы (или псевдонима) в строке плана
+_TABLE_RE: re.Pattern = re.compile(r"(?:^SCAN|Seq Scan on) (\w+)")
+# Имена CTE в запросе: их сканирование - чтение промежуточного результата
+_CTE_RE: re.Pattern = re.compile(r"(\w+) AS \(")
+_ALIAS_RE: re.Pattern = re.compile(r"(?:FROM|JOIN) (\w+) (\w+)")
+
+
+class Finding(NamedTuple):
+    """
+    Проблемная строка плана: сценарий, SQL запроса и строка плана
+    """
+
+    scenario: str
+    sql: str
+    detail: str
+    kind: str  # "scan" - полное сканирование, "sort" - сортировка без индекса
+
+
+def scenarios(order_pk: int, dish_pk: int) -> List[Tuple[str, str, str, Any]]:
+    """
+    Сценарии аудита: страницы и эндпоинты с типичными параметрами
+    :return: список (название, HTTP-метод, url, данные запроса)
+    """
+    orders: str = reverse("ordersapp:order-list")
+    order: str = reverse("ordersapp:order-detail", kwargs={"pk": order_pk})
+    return [
+        ("API: список заказов", "get", orders, {}),
+        (
+            "API: активные заказы стола",
+            "get",
+            orders,
+            {"table_number": 7, "status": Order.STATUS_PENDING},
+        ),
+        ("API: сортировка по сумме", "get", orders, {"ordering": "-total_price"}),
+        (
+            "API: оплаченные по сумме",
+            "get",
+            orders,
+            {"status": Order.STATUS_PAID, "ordering": "-total_price"},
+        ),
+        ("API: заказ", "get", order, {}),
+        (
+            "API: создание заказа",
+            "post",
+            orders,
+            {"table_number": 7, "items": [dish_pk]},
+        ),
+        ("API: смена статуса", "patch", order, {"status": Order.STATUS_READY}),
+        ("API: оплата", "patch", order, {"status": Order.STATUS_PAID}),
+        ("API: столы", "get", reverse("ordersapp:tablestate-list"), {}),
+        (
+            "API: время приготовления",
+            "get",
+            reverse("ordersapp:order-preparation-stats"),
+            {},
+        ),
+        ("Список заказов", "get", reverse("ordersapp:orders_list"), {}),
+        ("Поиск заказов", "get", reverse("ordersapp:order_search"), {"q": "7"}),
+        ("Выручка", "get", reverse("ordersapp:total_incomes"), {}),
+        ("План зала", "get", reverse("ordersapp:tables_floor"), {}),
+        ("Список блюд", "get", reverse("ordersapp:dishes_list"), {}),
+    ]
+
+
+def explain(sql: str, using: str = "default") -> List[str]:
+    """
+    План выполнения запроса построчно
+    :param sql: запрос с подставленными параметрами
+    """
+    connection = connections[using]
+    if connection.vendor not in _EXPLAIN_SQL:
+        raise NotImplementedError(f"Аудит не поддерживает СУБД {connection.vendor}")
+    with connection.cursor() as cursor:
+        cursor.execute(_EXPLAIN_SQL[connection.vendor] + sql)
+        rows: List[tuple] = cursor.fetchall()
+    # sqlite: (id, parent, notused, detail), postgresql: (строка плана,)
+    return [str(row[-1]) for row in rows]
+
+
+def classify(detail: str) -> Optional[str]:
+    """
+    Тип проблемы в строке плана или None, если строка в порядке
+    """
+    if detail.startswith("SCAN ") and " USING " not in detail:
+        return "scan"
+    if "USE TEMP B-TREE FOR ORDER BY" in detail:
+        return "sort"
+    if "Seq Scan on" in detail:
+        return "scan"
+    if detail.strip().startswith("Sort ") or "->  Sort " in detail:
+        return "sort"
+    return None
+
+
+def _table(detail: str) -> Optional[str]:
+    match: Optional[re.Match] = _TABLE_RE.search(detail.strip())
+    return match.group(1) if match else None
+
+
+def _is_explainable(sql: str) -> bool:
+    return sql.lstrip().upper().startswith(("SELECT", "WITH", "UPDATE", "DELETE"))
+
+
+def audit(
+    ignore_tables: Tuple[str, ...] = (), using: str = "default"
+) -> Tuple[int, List[Finding]]:
+    """
+    Прогоняет сценарии и собирает проблемные строки планов.
+    Для сценариев создаётся заказ; все изменения откатываются
+    :param ignore_tables: таблицы, полное сканирование которых допустимо
+        (маленькие справочники)
+    :return: (сколько запросов проверено, найденные проблемы)
+    """
+    connection = connections[using]
+    client: Client = Client()
+    findings: List[Finding] = []
+    checked: int = 0
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+        with transaction.atomic(using=using):
+            dish: Dish = Dish.objects.using(using).create(name="Аудит", price=100)
+            order: Order = Order.objects.using(using).create(table_number=7)
+            order.items.add(dish)
+            for title, method, url, data in scenarios(order.pk, dish.pk):
+                kwargs: Dict[str, Any] = {}
+                if method != "get":
+                    kwargs["content_type"] = "application/json"
+                with CaptureQueriesContext(connection) as captured:
+                    getattr(client, method)(url, data, **kwargs)
+                seen: set = set()
+                for query in captured.captured_queries:
+                    sql: str = query["sql"]
+                    if not _is_explainable(sql) or sql in seen:
+                        continue
+                    seen.add(sql)
+                    checked += 1
+                    # подзапросы, CTE и справочники не считаются
+                    ctes: set = set(_CTE_RE.findall(sql))
+                    skip: set = {None, *ignore_tables, *ctes}
+                    skip.update(a for t, a in _ALIAS_RE.findall(sql) if t in ctes)
+                    for detail in explain(sql, using):
+                        kind: Optional[str] = classify(detail)
+                        if kind is None or kind == "scan" and _table(detail) in skip:
+                            continue
+                        findings.append(Finding(title, sql, detail.strip(), kind))
+            transaction.set_rollback(True, using=using)
+    return checked, findings
@@ -0,0 +1,192 @@
+"""
+Фоновые задачи (:model:`ordersapp.Job`): отчёты и выгрузки.
+
+Запрос только ставит задачу в очередь (таблица Job), выполняет её
+команда run_jobs в отдельных процессах. Результат - CSV-файл
+в JOBS_RESULT_DIR, его отдаёт эндпоинт скачивания.
+"""
+
+import csv
+import logging
+from collections import defaultdict
+from decimal import Decimal
+from logging import Logger
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .archive import iter_paid_orders
+from .models import ArchivedOrder, Cafe, Job, Order
+from .tenancy import using_cafe
+
+log: Logger = logging.getLogger(__name__)
+
+# как часто (в строках) сохранять прогресс задачи в БД
+PROGRESS_EVERY: int = 1000
+CENT: Decimal = Decimal("0.01")
+
+
+class Progress:
+    """
+    Счётчик обработанных строк задачи. Процент сохраняется в БД
+    не чаще раза в PROGRESS_EVERY строк и только при изменении
+    """
+
+    def __init__(self, job: Job, total: int) -> None:
+        self.job: Job = job
+        self.total: int = max(total, 1)
+        self.done: int = 0
+        self.percent: int = 0
+
+    def step(self) -> None:
+        self.done += 1
+        if self.done % PROGRESS_EVERY == 0:
+            self.save()
+
+    def save(self) -> None:
+        percent: int = min(99, self.done * 100 // self.total)
+        if percent != self.percent:
+            self.percent = percent
+            Job.objects.filter(pk=self.job.pk).update(progress=percent)
+
+
+def _paid_orders_count(cafe: Cafe) -> int:
+    return (
+        Order.objects.filter(cafe=cafe, status=Order.STATUS_PAID).count()
+        + ArchivedOrder.objects.filter(cafe=cafe).count()
+    )
+
+
+def revenue_report(job: Job, path: Path) -> None:
+    """
+    Выручка по столам кафе задачи: количество оплаченных заказов и сумма,
+    включая архивные заказы, и итоговая строка.
+    Суммы считает БД (GROUP BY по горячим и архивным заказам)
+    """
+    orders: Dict[int, int] = defaultdict(int)
+    revenue: Dict[int, Decimal] = defaultdict(Decimal)
+    sources: tuple = (
+        Order.objects.filter(cafe=job.cafe, status=Order.STATUS_PAID),
+        ArchivedOrder.objects.filter(cafe=job.cafe),
+    )
+    for step, queryset in enumerate(sources, start=1):
+        for table, count, total in (
+            queryset.order_by()
+            .values("table_number")
+            .annotate(count=Count("pk"), total=Sum("total_price"))
+            .values_list("table_number", "count", "total")
+        ):
+            orders[table] += count
+            revenue[table] += total or 0
+        Job.objects.filter(pk=job.pk).update(progress=step * 50 - 1)
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Стол", "Заказов", "Выручка"])
+        for table in sorted(orders):
+            writer.writerow([table, orders[table], revenue[table].quantize(CENT)])
+        total: Decimal = sum(revenue.values(), Decimal(0))
+        writer.writerow(["Итого", sum(orders.values()), total.quantize(CENT)])
+
+
+def submit_revenue_report(cafe: Cafe) -> Job:
+    """
+    Ставит в очередь отчёт о выручке кафе. Если отчёт уже
+    в очереди или выполняется, новая задача не создаётся
+    :return: новая или уже ожидающая задача
+    """
+    pending: Optional[Job] = (
+        Job.objects.filter(
+            cafe=cafe,
+            kind=Job.KIND_REVENUE_REPORT,
+            status__in=(Job.STATUS_QUEUED, Job.STATUS_RUNNING),
+        )
+        .order_by("-pk")
+        .first()
+    )
+    return pending or Job.objects.create(cafe=cafe, kind=Job.KIND_REVENUE_REPORT)
+
+
+def revenue_report_total(job: Job) -> Optional[Decimal]:
+    """
+    Итоговая выручка из файла выполненного отчёта (строка "Итого")
+    :return: сумма или None, если файла результата нет
+    """
+    path: Optional[Path] = job.result_path
+    if path is None or not path.exists():
+        return None
+    with path.open(newline="", encoding="utf-8") as file:
+        rows: List[List[str]] = list(csv.reader(file))
+    return Decimal(rows[-1][2])
+
+
+def orders_export(job: Job, path: Path) -> None:
+    """
+    Все оплаченные заказы кафе (горячие и архивные) построчно:
+    номер, стол, сумма и блюда. Файл пишется потоково
+    """
+    progress: Progress = Progress(job, _paid_orders_count(job.cafe))
+    with path.open("w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["Заказ", "Стол", "Сумма", "Блюда"])
+        for order in iter_paid_orders(cafe=job.cafe):
+            dishes: str = "; ".join(
+                f"{item['name']} ({item['price']})" for item in order["items"]
+            )
+            writer.writerow(
+                [order["pk"], order["table_number"], order["total_price"], dishes]
+            )
+            progress.step()
+
+
+HANDLERS: Dict[str, Callable[[Job, Path], None]] = {
+    Job.KIND_REVENUE_REPORT: revenue_report,
+    Job.KIND_ORDERS_EXPORT: orders_export,
+}
+
+
+def run_job(pk: int) -> str:
+    """
+    Выполняет задачу, уже переведённую в статус "running" (Job.objects.claim),
+    от имени кафе задачи. Вызывается в процессе пула run_jobs
+    :param pk: номер задачи
+    :return: итоговый статус задачи
+    """
+    job: Job = Job.objects.select_related("cafe").get(pk=pk)
+    result_dir: Path = Path(settings.JOBS_RESULT_DIR)
+    result_dir.mkdir(parents=True, exist_ok=True)
+    name: str = f"{job.pk}-{job.kind}.csv"
+    # пишем во временный файл: скачать можно только полностью готовый результат
+    partial: Path = result_dir / f"{name}.part"
+    try:
+        with using_cafe(job.cafe):
+            HANDLERS[job.kind](job, partial)
+        partial.replace(result_dir / name)
+    except Exception as exc:
+        log.exception("Ошибка фоновой задачи %s", pk)
+        partial.unlink(missing_ok=True)
+        Job.objects.filter(pk=pk).update(
+            status=Job.STATUS_FAILED, error=repr(exc), finished_at=timezone.now()
+        )
+        return Job.STATUS_FAILED
+    Job.objects.filter(pk=pk).update(
+        status=Job.STATUS_DONE,
+        progress=100,
+        result_file=name,
+        finished_at=timezone.now(),
+    )
+    log.info("Фоновая задача %s выполнена: %s", pk, name)
+    return Job.STATUS_DONE
+
+
+def requeue_running() -> int:
+    """
+    Возвращает в очередь задачи, которые остались в статусе "running"
+    (обработчик был остановлен во время выполнения)
+    :return: сколько задач возвращено
+    """
+    return Job.objects.filter(status=Job.STATUS_RUNNING).update(
+        status=Job.STATUS_QUEUED, progress=0, started_at=None
+    )
@@ -0,0 +1,189 @@
+"""
+Обслуживание БД (команда cafe_maintenance).
+
+Для каждой БД (default и отдельные БД кафе):
+    - проверка целостности (PRAGMA integrity_check / quick_check);
+    - сверка Order.total_price с суммой цен блюд на момент создания
+      заказа (история DishPrice): сумма поддерживается
+      сигналом update_order_total_price и расходится, если сигнал
+      не сработал (QuerySet.update, сырой SQL). Расхождения ищет
+      и исправляет один UPDATE с подзапросом;
+    - возврат свободных страниц файлу (PRAGMA incremental_vacuum);
+    - обновление статистики планировщика (ANALYZE, PRAGMA optimize).
+Шаги, которые пишут в БД, выполняются короткими отдельными запросами
+и не держат блокировку записи дольше, чем нужно.
+"""
+
+import os
+from decimal import Decimal
+from typing import List, Optional, Set, Tuple
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Count, F, QuerySet, Sum
+from django.db.models.functions import Round
+
+from .cache import bump_orders_generation
+from .models import Cafe, Order, TableState, items_total
+
+STEPS: Tuple[str, ...] = ("integrity", "reconcile", "vacuum", "analyze")
+CENT: Decimal = Decimal("0.01")
+
+
+def database_aliases() -> List[str]:
+    """
+    БД с данными: default и БД, указанные у кафе
+    """
+    aliases: Set[str] = set(
+        Cafe.objects.exclude(database="").values_list("database", flat=True)
+    )
+    return [DEFAULT_DB_ALIAS, *sorted(aliases - {DEFAULT_DB_ALIAS})]
+
+
+def file_size(using: str) -> Optional[int]:
+    """
+    Размер файла SQLite вместе с журналом WAL в байтах,
+    None - если БД не файл SQLite
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return None
+    name: str = str(connection.settings_dict["NAME"])
+    if connection.is_in_memory_db():
+        return None
+    return sum(
+        os.path.getsize(path) for path in (name, f"{name}-wal") if os.path.exists(path)
+    )
+
+
+def _pragma(using: str, sql: str) -> List[tuple]:
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def _execute(using: str, sql: str) -> None:
+    with connections[using].cursor() as cursor:
+        cursor.execute(sql)
+
+
+def integrity_check(using: str, quick: bool = False) -> List[str]:
+    """
+    Проверяет целостность файла БД и внешних ключей
+    :param quick: PRAGMA quick_check - без сверки индексов с таблицами, быстрее
+    :return: список найденных проблем, пустой - всё в порядке
+    """
+    if connections[using].vendor != "sqlite":
+        return []
+    pragma: str = "quick_check" if quick else "integrity_check"
+    problems: List[str] = [
+        row[0] for row in _pragma(using, f"PRAGMA {pragma}") if row[0] != "ok"
+    ]
+    problems += [
+        f"внешний ключ: {table} строка {rowid} -> {parent}"
+        for table, rowid, parent, _ in _pragma(using, "PRAGMA foreign_key_check")
+    ]
+    return problems
+
+
+def drifted_orders(using: str, include_paid: bool = False) -> QuerySet:
+    """
+    Заказы, у которых total_price не совпадает с суммой цен блюд.
+    Суммы сравниваются с округлением до копеек: SQLite складывает
+    цены как числа с плавающей точкой
+    :param include_paid: проверять и оплаченные заказы (их сумма - уже
+        выручка, поэтому по умолчанию не трогаем)
+    """
+    orders: QuerySet = Order.objects.using(using)
+    if not include_paid:
+        orders = orders.exclude(status=Order.STATUS_PAID)
+    return orders.annotate(
+        stored=Round("total_price", 2), expected=Round(items_total(), 2)
+    ).exclude(stored=F("expected"))
+
+
+def reconcile_totals(
+    using: str, include_paid: bool = False, dry_run: bool = False, sample: int = 10
+) -> Tuple[int, Decimal, List[tuple]]:
+    """
+    Находит и (если не dry_run) исправляет расхождения total_price.
+    Исправление - один UPDATE ... WHERE id IN (подзапрос расхождений)
+    с увеличением версии заказа, затем пересчёт затронутых столов
+    :param sample: сколько расхождений вернуть для отчёта
+    :return: количество расхождений, сумма поправки и примеры
+        (номер заказа, стол, было, должно быть)
+    """
+    drifted: QuerySet = drifted_orders(using, include_paid)
+    with transaction.atomic(using=using):
+        report = drifted.aggregate(
+            count=Count("pk"), delta=Sum(F("expected") - F("stored"))
+        )
+        count: int = report["count"] or 0
+        delta: Decimal = Decimal(report["delta"] or 0).quantize(CENT)
+        examples: List[tuple] = [
+            (pk, table_number, Decimal(stored).quantize(CENT), expected.quantize(CENT))
+            for pk, table_number, stored, expected in drifted.order_by(
+                "pk"
+            ).values_list("pk", "table_number", "stored", "expected")[:sample]
+        ]
+        if count and not dry_run:
+            tables: List[tuple] = list(
+                drifted.order_by().values_list("cafe_id", "table_number").distinct()
+            )
+            Order.objects.using(using).filter(pk__in=drifted.values("pk")).update(
+                total_price=items_total(), version=F("version") + 1
+            )
+            for cafe_id, table_number in tables:
+                TableState.refresh(cafe_id, [table_number], using=using)
+            bump_orders_generation(using)
+    return count, delta, examples
+
+
+def incremental_vacuum(using: str, pages: int = 0, enable: bool = False) -> str:
+    """
+    Возвращает файлу свободные страницы БД без полного VACUUM.
+    Работает, только если в БД включён auto_vacuum = INCREMENTAL;
+    включение (enable) один раз перестраивает файл полным VACUUM
+    :param pages: сколько страниц освободить, 0 - все
+    :return: описание результата
+    """
+    connection = connections[using]
+    if connection.vendor == "postgresql":
+        _execute(using, "VACUUM")
+        return "VACUUM"
+    if connection.vendor != "sqlite":
+        return f"не поддерживается для {connection.vendor}"
+    mode: int = _pragma(using, "PRAGMA auto_vacuum")[0][0]
+    if mode != 2 and enable:
+        if connection.in_atomic_block:
+            raise RuntimeError("VACUUM нельзя выполнить внутри транзакции")
+        _execute(using, "PRAGMA auto_vacuum = INCREMENTAL")
+        _execute(using, "VACUUM")
+        return "включён auto_vacuum = INCREMENTAL, файл перестроен (VACUUM)"
+    free: int = _pragma(using, "PRAGMA freelist_count")[0][0]
+    if mode != 2:
+        return (
+            f"свободных страниц: {free}; auto_vacuum не INCREMENTAL, "
+            "включите его параметром --enable-incremental-vacuum"
+        )
+    _pragma(using, f"PRAGMA incremental_vacuum({pages or free})")
+    left: int = _pragma(using, "PRAGMA freelist_count")[0][0]
+    checkpoint: str = ""
+    if _pragma(using, "PRAGMA journal_mode")[0][0] == "wal":
+        _pragma(using, "PRAGMA wal_checkpoint(TRUNCATE)")
+        checkpoint = ", журнал WAL сброшен"
+    return f"освобождено страниц: {free - left}{checkpoint}"
+
+
+def analyze(using: str) -> str:
+    """
+    Обновляет статистику планировщика запросов
+    """
+    vendor: str = connections[using].vendor
+    if vendor not in ("sqlite", "postgresql"):
+        return f"не поддерживается для {vendor}"
+    _execute(using, "ANALYZE")
+    if vendor == "sqlite":
+        # optimize пересобирает статистику, только если она устарела
+        _pragma(using, "PRAGMA optimize")
+        return "ANALYZE, PRAGMA optimize"
+    return "ANALYZE"
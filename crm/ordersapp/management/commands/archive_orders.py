@@ -0,0 +1,85 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from ordersapp.archive import archivable_orders, archive_batch
+from ordersapp.models import Cafe
+from ordersapp.tenancy import using_cafe
+
+
+class Command(BaseCommand):
+    """
+    Переносит оплаченные заказы старше заданного возраста
+    в архивную таблицу ArchivedOrder пачками, по очереди для каждого кафе:
+        python manage.py archive_orders --older-than-days 30
+    """
+
+    help = "Переносит старые оплаченные заказы в архив"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=30,
+            help="архивировать заказы, оплаченные больше N дней назад",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="сколько заказов переносить за одну транзакцию",
+        )
+        parser.add_argument(
+            "--include-undated",
+            action="store_true",
+            help="архивировать и оплаченные заказы без записи об оплате в журнале",
+        )
+        parser.add_argument(
+            "--cafe",
+            action="append",
+            metavar="SLUG",
+            help="только это кафе (можно указать несколько раз)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="только посчитать заказы для архивации",
+        )
+
+    def handle(self, *args, **options) -> None:
+        cafes: QuerySet = Cafe.objects.order_by("pk")
+        if options["cafe"]:
+            cafes = cafes.filter(slug__in=options["cafe"])
+            missing = set(options["cafe"]) - {cafe.slug for cafe in cafes}
+            if missing:
+                raise CommandError(f"Кафе не найдены: {', '.join(sorted(missing))}")
+        cutoff = timezone.now() - timedelta(days=options["older_than_days"])
+        for cafe in cafes:
+            # запросы идут в БД кафе
+            with using_cafe(cafe):
+                self.archive_cafe(cafe, cutoff, options)
+
+    def archive_cafe(self, cafe: Cafe, cutoff, options) -> None:
+        orders: QuerySet = archivable_orders(
+            cutoff, options["include_undated"], cafe=cafe
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"{cafe}: заказов для архивации: {orders.count()}")
+            return
+
+        started: float = time.perf_counter()
+        total: int = 0
+        while True:
+            # короткие транзакции: остальные запросы не ждут всю архивацию
+            moved: int = archive_batch(orders, options["batch_size"])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f"{cafe}: перенесено в архив: {total}")
+        self.stdout.write(
+            f"{cafe}: готово, {total} заказов за "
+            f"{time.perf_counter() - started:.1f} с"
+        )
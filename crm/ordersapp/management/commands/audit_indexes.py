@@ -0,0 +1,51 @@
+from collections import Counter
+from typing import List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ordersapp.index_audit import Finding, audit
+
+
+class Command(BaseCommand):
+    """
+    Аудит индексов: прогоняет страницы и эндпоинты приложения,
+    выполняет EXPLAIN для каждого запроса и выводит полные
+    сканирования таблиц и сортировки без индекса:
+        python manage.py audit_indexes --fail-on-scan
+    """
+
+    help = "Ищет запросы приложения, которые выполняются без подходящего индекса"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--ignore-table",
+            action="append",
+            default=["ordersapp_dish", "ordersapp_tablestate"],
+            help="таблица, полное сканирование которой допустимо (можно повторять)",
+        )
+        parser.add_argument(
+            "--fail-on-scan",
+            action="store_true",
+            help="завершиться с ошибкой, если найдено полное сканирование",
+        )
+        parser.add_argument(
+            "--sql", action="store_true", help="выводить текст запросов"
+        )
+
+    def handle(self, *args, **options) -> None:
+        checked, findings = audit(ignore_tables=tuple(options["ignore_table"]))
+        # одна и та же строка плана в сценарии выводится один раз
+        unique: List[Finding] = list(
+            {(f.scenario, f.detail): f for f in findings}.values()
+        )
+        for finding in unique:
+            self.stdout.write(f"[{finding.kind}] {finding.scenario}: {finding.detail}")
+            if options["sql"]:
+                self.stdout.write(f"    {finding.sql}")
+        kinds: Counter = Counter(finding.kind for finding in unique)
+        self.stdout.write(
+            f"Проверено запросов: {checked}, полных сканирований: {kinds['scan']}, "
+            f"сортировок без индекса: {kinds['sort']}"
+        )
+        if options["fail_on_scan"] and kinds["scan"]:
+            raise CommandError(f"Полных сканирований: {kinds['scan']}")
@@ -0,0 +1,181 @@
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from ordersapp.maintenance import (
+    STEPS,
+    analyze,
+    database_aliases,
+    file_size,
+    incremental_vacuum,
+    integrity_check,
+    reconcile_totals,
+)
+
+
+class StepResult(NamedTuple):
+    """
+    Результат шага: время в секундах, описание и признак успеха
+    """
+
+    step: str
+    seconds: float
+    detail: str
+    ok: bool = True
+
+
+def format_size(size: Optional[int]) -> str:
+    return "-" if size is None else f"{size / 1024 / 1024:.2f} МБ"
+
+
+class Command(BaseCommand):
+    """
+    Обслуживание БД: проверка целостности, сверка сумм заказов,
+    возврат свободного места (incremental vacuum) и обновление
+    статистики (ANALYZE, PRAGMA optimize) с отчётом о размере
+    файлов и времени каждого шага:
+        python manage.py cafe_maintenance --dry-run
+        python manage.py cafe_maintenance --enable-incremental-vacuum
+    """
+
+    help = "Проверяет и обслуживает БД кафе"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--database",
+            action="append",
+            help="псевдоним БД (можно повторять), по умолчанию - все БД кафе",
+        )
+        parser.add_argument(
+            "--skip",
+            action="append",
+            choices=STEPS,
+            default=[],
+            help="пропустить шаг (можно повторять)",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="только проверить: целостность и отчёт о расхождениях сумм",
+        )
+        parser.add_argument(
+            "--include-paid",
+            action="store_true",
+            help="сверять суммы и оплаченных заказов",
+        )
+        parser.add_argument(
+            "--show",
+            type=int,
+            default=10,
+            help="сколько расхождений сумм вывести",
+        )
+        parser.add_argument(
+            "--quick",
+            action="store_true",
+            help="быстрая проверка целостности (PRAGMA quick_check)",
+        )
+        parser.add_argument(
+            "--vacuum-pages",
+            type=int,
+            default=0,
+            help="сколько свободных страниц вернуть файлу, 0 - все",
+        )
+        parser.add_argument(
+            "--enable-incremental-vacuum",
+            action="store_true",
+            help="включить auto_vacuum = INCREMENTAL (один раз перестраивает "
+            "файл полным VACUUM и блокирует БД на время перестройки)",
+        )
+
+    def handle(self, *args, **options) -> None:
+        aliases: List[str] = options["database"] or database_aliases()
+        unknown: List[str] = [a for a in aliases if a not in settings.DATABASES]
+        if unknown:
+            raise CommandError(f"Нет БД в DATABASES: {', '.join(unknown)}")
+        failed: List[str] = []
+        for using in aliases:
+            if not self.maintain(using, options):
+                failed.append(using)
+        if failed:
+            raise CommandError(f"Нарушена целостность БД: {', '.join(failed)}")
+
+    def maintain(self, using: str, options: dict) -> bool:
+        """
+        Обслуживание одной БД
+        :return: False, если проверка целостности нашла проблемы
+        """
+        skip: set = set(options["skip"])
+        dry_run: bool = options["dry_run"]
+        started: float = time.perf_counter()
+        size: Optional[int] = file_size(using)
+        self.stdout.write(
+            f"БД {using} ({settings.DATABASES[using]['NAME']}): {format_size(size)}"
+        )
+        steps: List[tuple] = []
+        if "integrity" not in skip:
+            steps.append(("integrity", lambda: self.integrity(using, options)))
+        if "reconcile" not in skip:
+            steps.append(("reconcile", lambda: self.reconcile(using, options)))
+        if not dry_run and "vacuum" not in skip:
+            steps.append(("vacuum", lambda: self.vacuum(using, options)))
+        if not dry_run and "analyze" not in skip:
+            steps.append(("analyze", lambda: (analyze(using), True)))
+
+        healthy: bool = True
+        for step, func in steps:
+            result: StepResult = self.timed(step, func)
+            self.stdout.write(
+                f"  {result.step:<10} {result.seconds:>8.2f} с  {result.detail}"
+            )
+            if not result.ok:
+                # повреждённую БД не изменяем: сначала восстановление из копии
+                healthy = False
+                break
+        self.stdout.write(
+            f"  размер: {format_size(size)} -> {format_size(file_size(using))}, "
+            f"всего {time.perf_counter() - started:.2f} с"
+        )
+        return healthy
+
+    @staticmethod
+    def timed(step: str, func: Callable[[], tuple]) -> StepResult:
+        started: float = time.perf_counter()
+        detail, ok = func()
+        return StepResult(step, time.perf_counter() - started, detail, ok)
+
+    def integrity(self, using: str, options: dict) -> tuple:
+        problems: List[str] = integrity_check(using, options["quick"])
+        if not problems:
+            return "ok", True
+        for problem in problems[:20]:
+            self.stderr.write(f"    {problem}")
+        return f"найдено проблем: {len(problems)}", False
+
+    def vacuum(self, using: str, options: dict) -> tuple:
+        try:
+            detail: str = incremental_vacuum(
+                using, options["vacuum_pages"], options["enable_incremental_vacuum"]
+            )
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+        return detail, True
+
+    def reconcile(self, using: str, options: dict) -> tuple:
+        count, delta, examples = reconcile_totals(
+            using,
+            include_paid=options["include_paid"],
+            dry_run=options["dry_run"],
+            sample=options["show"],
+        )
+        if not count:
+            return "суммы заказов совпадают", True
+        for pk, table_number, stored, expected in examples:
+            self.stdout.write(
+                f"    заказ {pk} (стол {table_number}): {stored} -> {expected}"
+            )
+        action: str = (
+            "не исправлено (--dry-run)" if options["dry_run"] else "исправлено"
+        )
+        return f"расхождений сумм: {count}, поправка {delta} руб, {action}", True
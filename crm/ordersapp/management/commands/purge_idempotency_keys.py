@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from ordersapp.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    """
+    Удаляет ключи Idempotency-Key, время жизни которых истекло.
+    Запускается периодически (cron), например раз в час:
+        python manage.py purge_idempotency_keys
+    """
+
+    help = "Удаляет устаревшие ключи идемпотентности"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="сколько ключей удалять за один запрос",
+        )
+
+    def handle(self, *args, **options) -> None:
+        batch_size: int = options["batch_size"]
+        total: int = 0
+        while True:
+            # удаляем пачками, чтобы не держать долгую блокировку на запись
+            ids = list(
+                IdempotencyKey.objects.expired().values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not ids:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(pk__in=ids).delete()
+            total += deleted
+        self.stdout.write(f"Удалено ключей: {total}")
@@ -0,0 +1,105 @@
+import sys
+from datetime import datetime, time
+from typing import BinaryIO, Optional
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import QuerySet
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ordersapp.receipts import iter_receipts, shift_orders
+from ordersapp.tenancy import get_cafe, using_cafe
+
+
+def parse_moment(value: Optional[str], name: str) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        # ValueError - формат верный, но такой даты нет (13-й месяц)
+        parsed: Optional[datetime] = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise CommandError(f"{name}: ожидается дата и время в ISO 8601")
+    return timezone.make_aware(parsed) if timezone.is_naive(parsed) else parsed
+
+
+class Command(BaseCommand):
+    """
+    Чеки всех заказов, оплаченных за смену, одним проходом:
+    заказы читаются пачками, чеки пишутся в файл по одному,
+    поэтому память не зависит от длины смены:
+        python manage.py render_receipts --output shift.txt
+        python manage.py render_receipts --type escpos --output /dev/usb/lp0
+    """
+
+    help = "Печатает чеки заказов, оплаченных за смену"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--cafe",
+            metavar="SLUG",
+            default=settings.DEFAULT_CAFE,
+            help="кафе, по умолчанию DEFAULT_CAFE",
+        )
+        parser.add_argument(
+            "--since",
+            help="начало смены (ISO 8601), по умолчанию - начало текущего дня",
+        )
+        parser.add_argument(
+            "--until",
+            help="конец смены (ISO 8601), по умолчанию - текущий момент",
+        )
+        parser.add_argument(
+            "--type",
+            choices=("text", "escpos"),
+            default="text",
+            help="формат чеков: текст или команды ESC/POS",
+        )
+        parser.add_argument(
+            "--output",
+            help="файл или устройство принтера, по умолчанию - stdout",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="сколько заказов читать из БД за раз",
+        )
+
+    def handle(self, *args, **options) -> None:
+        cafe = get_cafe(options["cafe"])
+        if cafe is None:
+            raise CommandError(f"Кафе не найдено: {options['cafe']}")
+        since: datetime = parse_moment(options["since"], "--since") or (
+            timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        )
+        until: Optional[datetime] = parse_moment(options["until"], "--until")
+        output: Optional[str] = options["output"]
+        # запросы идут в БД кафе
+        with using_cafe(cafe):
+            orders: QuerySet = shift_orders(cafe, since, until)
+            if output:
+                with open(output, "wb") as file:
+                    count: int = self.write(file, orders, cafe, options)
+                self.stdout.write(f"{cafe}: чеков: {count}, файл {output}")
+            else:
+                self.stdout.flush()
+                self.write(sys.stdout.buffer, orders, cafe, options)
+
+    @staticmethod
+    def write(file: BinaryIO, orders: QuerySet, cafe, options: dict) -> int:
+        """
+        Пишет чеки в файл по мере отрисовки
+        :return: сколько чеков записано
+        """
+        count: int = 0
+        for content in iter_receipts(
+            orders, cafe, options["type"], options["chunk_size"]
+        ):
+            if count and options["type"] == "text":
+                file.write(b"\n")
+            file.write(content)
+            count += 1
+        return count
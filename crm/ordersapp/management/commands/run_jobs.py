@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from ordersapp import worker
+from ordersapp.jobs import requeue_running
+from ordersapp.models import Job
+
+
+class Command(BaseCommand):
+    """
+    Обработчик очереди фоновых задач (отчёты, выгрузки).
+    Забирает задачи из таблицы Job и выполняет их в пуле процессов:
+        python manage.py run_jobs --processes 2
+    """
+
+    help = "Выполняет фоновые задачи из очереди"
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=max(1, (os.cpu_count() or 2) // 2),
+            help="количество процессов для задач",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="пауза между проверками очереди, секунд",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="выполнить задачи, которые уже в очереди, и завершиться",
+        )
+        parser.add_argument(
+            "--requeue-running",
+            action="store_true",
+            help='вернуть в очередь задачи, оставшиеся в статусе "running" '
+            "после остановки обработчика",
+        )
+
+    def handle(self, *args, **options) -> None:
+        if options["requeue_running"]:
+            self.stdout.write(f"Возвращено в очередь: {requeue_running()}")
+        processes: int = options["processes"]
+        running: Dict[Future, int] = {}
+        # процессы пула запускаются через spawn (без копии соединений с БД
+        # и потоков родителя) и открывают свои соединения
+        connections.close_all()
+        with ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=worker.init,
+        ) as pool:
+            self.stdout.write(f"Обработчик задач запущен, процессов: {processes}")
+            try:
+                while True:
+                    for future in [f for f in running if f.done()]:
+                        self._report(running.pop(future), future)
+                    free: int = processes - len(running)
+                    claimed: List[int] = Job.objects.claim(free) if free else []
+                    for pk in claimed:
+                        self.stdout.write(f"Задача {pk} запущена")
+                        running[pool.submit(worker.run, pk)] = pk
+                    if options["once"] and not claimed and not running:
+                        break
+                    if not claimed:
+                        time.sleep(options["poll_interval"])
+            except KeyboardInterrupt:
+                self.stdout.write("Остановка: ждём завершения запущенных задач")
+            for future, pk in running.items():
+                future.exception()  # дождаться завершения
+                self._report(pk, future)
+
+    def _report(self, pk: int, future: Future) -> None:
+        error = future.exception()
+        if error is not None:
+            # процесс пула упал, задача не успела записать статус
+            self.stderr.write(f"Задача {pk}: процесс завершился с ошибкой {error!r}")
+            Job.objects.filter(pk=pk, status=Job.STATUS_RUNNING).update(
+                status=Job.STATUS_FAILED, error=repr(error)
+            )
+            return
+        self.stdout.write(f"Задача {pk}: {future.result()}")
@@ -0,0 +1,94 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0004_alter_order_status"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="table_number",
+            field=models.IntegerField(
+                choices=[
+                    (1, "Стол 1"),
+                    (2, "Стол 2"),
+                    (3, "Стол 3"),
+                    (4, "Стол 4"),
+                    (5, "Стол 5"),
+                    (6, "Стол 6"),
+                    (7, "Стол 7"),
+                    (8, "Стол 8"),
+                    (9, "Стол 9"),
+                ],
+                db_index=True,
+            ),
+        ),
+        migrations.CreateModel(
+            name="OrderEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "from_status",
+                    models.CharField(
+                        blank=True,
+                        choices=[
+                            ("В ожидании", "В ожидании"),
+                            ("Готово", "Готово"),
+                            ("Оплачено", "Оплачено"),
+                        ],
+                        max_length=10,
+                        null=True,
+                    ),
+                ),
+                (
+                    "to_status",
+                    models.CharField(
+                        choices=[
+                            ("В ожидании", "В ожидании"),
+                            ("Готово", "Готово"),
+                            ("Оплачено", "Оплачено"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="events",
+                        to="ordersapp.order",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["created_at"], name="orderevent_created_idx"),
+                    models.Index(
+                        fields=["to_status", "created_at"],
+                        name="orderevent_status_time_idx",
+                    ),
+                    models.Index(
+                        fields=["order", "created_at"], name="orderevent_order_idx"
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:08
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+
+def create_table_states(apps, schema_editor):
+    """
+    Создаёт строки для всех столов и заполняет их по текущим заказам
+    """
+    Order = apps.get_model("ordersapp", "Order")
+    TableState = apps.get_model("ordersapp", "TableState")
+    db = schema_editor.connection.alias
+    unpaid = {
+        row["table_number"]: row
+        for row in Order.objects.using(db)
+        .exclude(status="Оплачено")
+        .values("table_number")
+        .annotate(open_orders=Count("pk"), unpaid_total=Sum("total_price"))
+    }
+    now = timezone.now()
+    TableState.objects.using(db).bulk_create(
+        [
+            TableState(
+                table_number=number,
+                open_orders=unpaid.get(number, {}).get("open_orders", 0),
+                unpaid_total=unpaid.get(number, {}).get("unpaid_total") or 0,
+                last_activity=now,
+            )
+            for number in range(1, 10)
+        ]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0007_idempotencykey"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TableState",
+            fields=[
+                (
+                    "table_number",
+                    models.IntegerField(
+                        choices=[
+                            (1, "Стол 1"),
+                            (2, "Стол 2"),
+                            (3, "Стол 3"),
+                            (4, "Стол 4"),
+                            (5, "Стол 5"),
+                            (6, "Стол 6"),
+                            (7, "Стол 7"),
+                            (8, "Стол 8"),
+                            (9, "Стол 9"),
+                        ],
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("open_orders", models.PositiveIntegerField(default=0)),
+                (
+                    "unpaid_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("last_activity", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.RunPython(create_table_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:14
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0008_tablestate"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedOrder",
+            fields=[
+                ("id", models.BigIntegerField(primary_key=True, serialize=False)),
+                ("table_number", models.IntegerField()),
+                ("total_price", models.DecimalField(decimal_places=2, max_digits=8)),
+                (
+                    "items",
+                    models.JSONField(
+                        default=list,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("paid_at", models.DateTimeField(null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["paid_at"], name="archivedorder_paid_idx")
+                ],
+            },
+        ),
+    ]
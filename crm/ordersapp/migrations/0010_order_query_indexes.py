@@ -0,0 +1,95 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:20
+
+from django.db import migrations, models
+
+# одиночные индексы (db_index=True), которые заменяются составными:
+# имя индекса, таблица и столбец, как их создали миграции 0001-0004
+SINGLE_INDEXES = [
+    ("ordersapp_dish_description_71b4c546", "ordersapp_dish", "description"),
+    ("ordersapp_order_status_93d8cfb6", "ordersapp_order", "status"),
+    ("ordersapp_order_table_number_4b65f1e9", "ordersapp_order", "table_number"),
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0009_archivedorder"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="dish",
+                    name="description",
+                    field=models.TextField(blank=True),
+                ),
+                migrations.AlterField(
+                    model_name="order",
+                    name="status",
+                    field=models.CharField(
+                        choices=[
+                            ("В ожидании", "В ожидании"),
+                            ("Готово", "Готово"),
+                            ("Оплачено", "Оплачено"),
+                        ],
+                        default="В ожидании",
+                        max_length=10,
+                    ),
+                ),
+                migrations.AlterField(
+                    model_name="order",
+                    name="table_number",
+                    field=models.IntegerField(
+                        choices=[
+                            (1, "Стол 1"),
+                            (2, "Стол 2"),
+                            (3, "Стол 3"),
+                            (4, "Стол 4"),
+                            (5, "Стол 5"),
+                            (6, "Стол 6"),
+                            (7, "Стол 7"),
+                            (8, "Стол 8"),
+                            (9, "Стол 9"),
+                        ]
+                    ),
+                ),
+            ],
+            database_operations=[
+                # DROP INDEX: AlterField на SQLite пересоздал бы таблицу
+                # заказов целиком ради снятия db_index
+                migrations.RunSQL(
+                    sql=[f'DROP INDEX "{name}";' for name, _, _ in SINGLE_INDEXES],
+                    reverse_sql=[
+                        f'CREATE INDEX "{name}" ON "{table}" ("{column}");'
+                        for name, table, column in SINGLE_INDEXES
+                    ],
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["table_number", "status"], name="order_table_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["status", "total_price"], name="order_status_total_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["total_price"], name="order_total_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status", "Оплачено"), _negated=True),
+                fields=["table_number", "total_price"],
+                name="order_open_idx",
+            ),
+        ),
+    ]
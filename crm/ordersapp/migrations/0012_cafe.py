@@ -0,0 +1,246 @@
+# Generated by Django 5.1.6 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+import ordersapp.models
+import ordersapp.tenancy
+
+
+def create_default_cafe(apps, schema_editor):
+    """
+    Создаёт кафе по умолчанию: ему принадлежат уже существующие
+    блюда, заказы и задачи
+    """
+    Cafe = apps.get_model("ordersapp", "Cafe")
+    Cafe.objects.using(schema_editor.connection.alias).get_or_create(
+        pk=ordersapp.tenancy.DEFAULT_CAFE_ID,
+        defaults={"name": "Кафе", "slug": "main", "tables": list(range(1, 10))},
+    )
+
+
+def create_table_states(apps, schema_editor):
+    """
+    Создаёт строки для столов всех кафе и заполняет их по текущим заказам
+    """
+    Cafe = apps.get_model("ordersapp", "Cafe")
+    Order = apps.get_model("ordersapp", "Order")
+    TableState = apps.get_model("ordersapp", "TableState")
+    db = schema_editor.connection.alias
+    unpaid = {
+        (row["cafe_id"], row["table_number"]): row
+        for row in Order.objects.using(db)
+        .exclude(status="Оплачено")
+        .values("cafe_id", "table_number")
+        .annotate(open_orders=Count("pk"), unpaid_total=Sum("total_price"))
+    }
+    now = timezone.now()
+    TableState.objects.using(db).bulk_create(
+        [
+            TableState(
+                cafe_id=cafe_id,
+                table_number=number,
+                open_orders=unpaid.get((cafe_id, number), {}).get("open_orders", 0),
+                unpaid_total=unpaid.get((cafe_id, number), {}).get("unpaid_total") or 0,
+                last_activity=now,
+            )
+            for cafe_id, tables in Cafe.objects.using(db).values_list("pk", "tables")
+            for number in tables
+        ]
+    )
+
+
+def cafe_field(related_name, on_delete=django.db.models.deletion.DO_NOTHING):
+    return models.ForeignKey(
+        db_constraint=False,
+        db_index=False,
+        default=ordersapp.tenancy.current_cafe_id,
+        on_delete=on_delete,
+        related_name=related_name,
+        to="ordersapp.cafe",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0011_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Cafe",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=100)),
+                ("slug", models.SlugField(unique=True)),
+                ("tables", models.JSONField(default=ordersapp.models.default_tables)),
+                ("database", models.CharField(blank=True, max_length=64)),
+            ],
+        ),
+        migrations.RunPython(create_default_cafe, migrations.RunPython.noop),
+        # индексы пересоздаются с кафе первым полем
+        migrations.RemoveIndex(
+            model_name="archivedorder",
+            name="archivedorder_paid_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="order",
+            name="order_table_status_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="order",
+            name="order_status_total_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="order",
+            name="order_total_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="order",
+            name="order_open_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="orderevent",
+            name="orderevent_created_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="orderevent",
+            name="orderevent_status_time_idx",
+        ),
+        migrations.AlterField(
+            model_name="dish",
+            name="name",
+            field=models.CharField(max_length=100),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="table_number",
+            field=models.IntegerField(),
+        ),
+        migrations.AddField(
+            model_name="archivedorder",
+            name="cafe",
+            field=cafe_field("+"),
+        ),
+        migrations.AddField(
+            model_name="dish",
+            name="cafe",
+            field=cafe_field("dishes"),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="cafe",
+            field=cafe_field("orders"),
+        ),
+        migrations.AddField(
+            model_name="orderevent",
+            name="cafe",
+            field=cafe_field("+"),
+        ),
+        migrations.AddField(
+            model_name="job",
+            name="cafe",
+            field=models.ForeignKey(
+                default=ordersapp.tenancy.current_cafe_id,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="jobs",
+                to="ordersapp.cafe",
+            ),
+        ),
+        # состояние стола теперь определяется парой (кафе, стол):
+        # таблица производная, поэтому пересоздаётся и заполняется заново
+        migrations.DeleteModel(
+            name="TableState",
+        ),
+        migrations.CreateModel(
+            name="TableState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("cafe", cafe_field("table_states")),
+                ("table_number", models.IntegerField()),
+                ("open_orders", models.PositiveIntegerField(default=0)),
+                (
+                    "unpaid_total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=10),
+                ),
+                ("last_activity", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("cafe", "table_number"),
+                        name="tablestate_cafe_table_uniq",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_table_states, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="archivedorder",
+            index=models.Index(
+                fields=["cafe", "paid_at"], name="archivedorder_paid_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="dish",
+            index=models.Index(fields=["cafe", "name"], name="dish_cafe_name_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["cafe", "table_number", "status"],
+                name="order_table_status_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["cafe", "status", "total_price"],
+                name="order_status_total_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(fields=["cafe", "total_price"], name="order_total_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                condition=models.Q(("status", "Оплачено"), _negated=True),
+                fields=["cafe", "table_number", "total_price"],
+                name="order_open_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderevent",
+            index=models.Index(
+                fields=["cafe", "created_at"], name="orderevent_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="orderevent",
+            index=models.Index(
+                fields=["cafe", "to_status", "created_at"],
+                name="orderevent_status_time_idx",
+            ),
+        ),
+    ]
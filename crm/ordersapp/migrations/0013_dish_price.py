@@ -0,0 +1,102 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:06
+
+from datetime import datetime, timezone
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+# цены, заданные до появления истории, действуют с начала истории:
+# заказы, созданные раньше, оцениваются по ним же
+HISTORY_START = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+def fill_created_at(apps, schema_editor):
+    """
+    Время создания существующих заказов - первое событие заказа
+    в журнале OrderEvent, без событий - время миграции
+    """
+    Order = apps.get_model("ordersapp", "Order")
+    OrderEvent = apps.get_model("ordersapp", "OrderEvent")
+    db = schema_editor.connection.alias
+    first_event = (
+        OrderEvent.objects.using(db)
+        .filter(order=OuterRef("pk"))
+        .values("order")
+        .annotate(first=Min("created_at"))
+        .values("first")
+    )
+    Order.objects.using(db).update(
+        created_at=Coalesce(Subquery(first_event), F("created_at"))
+    )
+
+
+def create_price_history(apps, schema_editor):
+    """
+    Текущая цена каждого блюда - первая запись его истории цен
+    """
+    Dish = apps.get_model("ordersapp", "Dish")
+    DishPrice = apps.get_model("ordersapp", "DishPrice")
+    db = schema_editor.connection.alias
+    DishPrice.objects.using(db).bulk_create(
+        [
+            DishPrice(dish_id=pk, price=price, effective_from=HISTORY_START)
+            for pk, price in Dish.objects.using(db).values_list("pk", "price")
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0012_cafe"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="created_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(fill_created_at, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name="DishPrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("price", models.DecimalField(decimal_places=2, max_digits=8)),
+                (
+                    "effective_from",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                (
+                    "dish",
+                    models.ForeignKey(
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="prices",
+                        to="ordersapp.dish",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["dish", "effective_from"],
+                        name="dishprice_dish_time_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(create_price_history, migrations.RunPython.noop),
+    ]
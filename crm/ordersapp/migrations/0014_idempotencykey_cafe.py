@@ -0,0 +1,36 @@
+# Generated by Django 5.1.6 on 2026-10-19 12:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+import ordersapp.tenancy
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("ordersapp", "0013_dish_price"),
+    ]
+
+    operations = [
+        # существующие ключи получает кафе по умолчанию
+        migrations.AddField(
+            model_name="idempotencykey",
+            name="cafe",
+            field=models.ForeignKey(
+                default=ordersapp.tenancy.current_cafe_id,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="+",
+                to="ordersapp.cafe",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="idempotencykey",
+            name="key",
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AlterUniqueTogether(
+            name="idempotencykey",
+            unique_together={("cafe", "key")},
+        ),
+    ]
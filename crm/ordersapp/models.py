@@ -1,7 +1,132 @@
-from typing import Generator, List
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Generator, Iterable, List, Optional, Set
 
-from django.db import models
-from django.db.models import Field
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.db.models import (
+    Count,
+    DecimalField,
+    F,
+    Field,
+    OuterRef,
+    QuerySet,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .cache import bump_orders_generation
+from .tenancy import current_cafe_id, forget_cafes
+
+
+class OrderVersionConflict(Exception):
+    """
+    Заказ был изменён другим пользователем после того,
+    как его прочитали (версия в БД не совпала с ожидаемой)
+    """
+
+    def __init__(self, pk: int, expected: int) -> None:
+        self.pk: int = pk
+        self.expected: int = expected
+        super().__init__(f"Заказ {pk} изменён: ожидалась версия {expected}")
+
+
+def default_tables() -> List[int]:
+    """
+    Раскладка столов нового кафе: столы с 1 по 9
+    """
+    return list(range(1, 10))
+
+
+class Cafe(models.Model):
+    """
+    Модель Cafe - кафе (заведение сети). Меню, заказы и столы
+    принадлежат кафе, представления показывают данные только
+    кафе запроса (см. ordersapp/tenancy.py).
+    Данные кафе можно хранить в отдельном файле SQLite (поле database):
+    тогда кафе не ждут друг друга на блокировке записи одной БД.
+    Сама модель всегда хранится в default.
+
+    Блюда тут: :model:`ordersapp.Dish`
+    """
+
+    name: Field = models.CharField(max_length=100)
+    slug: Field = models.SlugField(max_length=50, unique=True)
+    # номера столов в зале, в порядке на плане зала
+    tables: Field = models.JSONField(default=default_tables)
+    # псевдоним БД из DATABASES, пусто - default
+    database: Field = models.CharField(max_length=64, blank=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def db_alias(self) -> str:
+        """
+        Псевдоним БД с данными кафе
+        """
+        return self.database or DEFAULT_DB_ALIAS
+
+    def table_choices(self) -> List[tuple[int, str]]:
+        return [(number, f"Стол {number}") for number in self.tables]
+
+    def clean(self) -> None:
+        if (
+            not isinstance(self.tables, list)
+            or not self.tables
+            or not all(
+                isinstance(number, int) and not isinstance(number, bool) and number > 0
+                for number in self.tables
+            )
+            or len(set(self.tables)) != len(self.tables)
+        ):
+            raise ValidationError(
+                {"tables": "Ожидается непустой список разных номеров столов"}
+            )
+        if self.database and self.database not in settings.DATABASES:
+            raise ValidationError(
+                {"database": f"БД {self.database} нет в настройке DATABASES"}
+            )
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет кафе, сбрасывает его в кэше и приводит строки
+        TableState в БД кафе к раскладке столов
+        """
+        slugs: Set[str] = {self.slug}
+        if self.pk is not None:
+            slugs.update(Cafe.objects.filter(pk=self.pk).values_list("slug", flat=True))
+        super().save(*args, **kwargs)
+        forget_cafes(*slugs)
+        self.sync_tables()
+
+    def delete(self, *args, **kwargs):
+        forget_cafes(self.slug)
+        return super().delete(*args, **kwargs)
+
+    def sync_tables(self) -> None:
+        """
+        Создаёт состояние для новых столов, удаляет убранные столы
+        и пересчитывает суммы по открытым заказам.
+        БД кафе должна быть уже создана (migrate --database)
+        """
+        states: QuerySet = TableState.objects.using(self.db_alias)
+        with transaction.atomic(using=self.db_alias):
+            states.filter(cafe_id=self.pk).exclude(
+                table_number__in=self.tables
+            ).delete()
+            states.bulk_create(
+                [TableState(cafe_id=self.pk, table_number=n) for n in self.tables],
+                ignore_conflicts=True,
+            )
+            TableState.refresh(self.pk, self.tables, using=self.db_alias)
 
 
 class Dish(models.Model):
@@ -14,14 +139,154 @@ class Dish(models.Model):
 
     class Meta:
         verbose_name_plural = "dishes"
+        indexes = [
+            # меню кафе
+            models.Index(fields=["cafe", "name"], name="dish_cafe_name_idx"),
+        ]
 
-    name: Field = models.CharField(max_length=100, db_index=True)
-    description: Field = models.TextField(null=False, blank=True, db_index=True)
+    # кафе хранится в default, блюдо - в БД кафе, поэтому без внешнего ключа в БД
+    cafe: Field = models.ForeignKey(
+        Cafe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        default=current_cafe_id,
+        related_name="dishes",
+    )
+    name: Field = models.CharField(max_length=100)
+    description: Field = models.TextField(null=False, blank=True)
+    # текущая цена в меню; заказы оцениваются по истории цен (DishPrice)
     price: Field = models.DecimalField(default=0, max_digits=8, decimal_places=2)
 
     def __str__(self):
         return f"{self.name} - {self.price} руб"
 
+    @classmethod
+    def from_db(cls, db: str, field_names: List[str], values: List[Any]) -> "Dish":
+        instance: Dish = super().from_db(db, field_names, values)
+        # запоминаем цену из БД, чтобы при сохранении увидеть её изменение
+        instance._loaded_price = instance.__dict__.get("price")
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет блюдо и в той же транзакции записывает в историю
+        новую цену: она действует с момента сохранения, уже созданные
+        заказы сохраняют прежние цены
+        """
+        previous: Optional[Decimal] = getattr(self, "_loaded_price", None)
+        update_fields: Optional[Iterable[str]] = kwargs.get("update_fields")
+        changed: bool = (update_fields is None or "price" in update_fields) and (
+            previous is None or Decimal(previous) != Decimal(str(self.price))
+        )
+        using: str = kwargs.get("using") or router.db_for_write(
+            self.__class__, instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+            if changed:
+                DishPrice.objects.using(self._state.db).create(
+                    dish=self, price=self.price
+                )
+        self._loaded_price = self.price
+
+
+class DishPrice(models.Model):
+    """
+    Модель DishPrice - история цен блюда: цена действует
+    с effective_from до начала следующей цены этого блюда.
+    Блюда заказа оцениваются по ценам на момент создания заказа
+    (см. ordersapp/pricing.py), поэтому суммы заказов воспроизводимы.
+    Запись добавляет Dish.save при изменении цены; цену с будущей
+    даты можно задать, создав запись напрямую
+    """
+
+    class Meta:
+        indexes = [
+            # цены блюда по времени: индекс цен и подзапрос items_total
+            models.Index(
+                fields=["dish", "effective_from"], name="dishprice_dish_time_idx"
+            ),
+        ]
+
+    dish: Field = models.ForeignKey(
+        Dish, on_delete=models.CASCADE, db_index=False, related_name="prices"
+    )
+    price: Field = models.DecimalField(max_digits=8, decimal_places=2)
+    effective_from: Field = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.dish_id}: {self.price} руб с {self.effective_from}"
+
+
+def items_total() -> Coalesce:
+    """
+    Сумма цен блюд заказа на момент его создания (заказ - внешний
+    запрос, OuterRef("pk")): цена берётся из истории DishPrice, без неё -
+    текущая цена блюда, как в pricing.PriceBook. Считается в БД: для сверки
+    сумм заказов одним запросом (команда cafe_maintenance)
+    """
+    price: QuerySet = (
+        DishPrice.objects.filter(
+            dish=OuterRef("dish_id"),
+            effective_from__lte=OuterRef(OuterRef("created_at")),
+        )
+        .order_by("-effective_from", "-pk")
+        .values("price")[:1]
+    )
+    total: QuerySet = (
+        Order.items.through.objects.filter(order=OuterRef("pk"))
+        .annotate(item_price=Coalesce(Subquery(price), F("dish__price")))
+        .values("order")
+        .annotate(total=Sum("item_price"))
+        .values("total")
+    )
+    return Coalesce(
+        Subquery(total),
+        Value(0),
+        output_field=DecimalField(max_digits=8, decimal_places=2),
+    )
+
+
+class OrderQuerySet(models.QuerySet):
+    """
+    Набор запросов для заказов
+    """
+
+    def update_status(self, status: str) -> int:
+        """
+        Массово меняет статус заказов и пишет события
+        об изменении статуса одной вставкой в той же транзакции
+        :param status: новый статус
+        :return: количество изменённых заказов
+        """
+        with transaction.atomic(using=self.db):
+            changed: List[tuple[int, str, int]] = list(
+                self.exclude(status=status).values_list("pk", "status", "cafe_id")
+            )
+            if not changed:
+                return 0
+            ids: List[int] = [pk for pk, _, _ in changed]
+            self.model.objects.using(self.db).filter(pk__in=ids).update(
+                status=status, version=F("version") + 1
+            )
+            OrderEvent.objects.using(self.db).bulk_create(
+                [
+                    OrderEvent(
+                        order_id=pk, cafe_id=cafe_id, from_status=old, to_status=status
+                    )
+                    for pk, old, cafe_id in changed
+                ],
+                batch_size=500,
+            )
+            # update() не отправляет post_save, поэтому сбрасываем кэш списков
+            # и пересчитываем столы явно
+            bump_orders_generation(self.db)
+            TableState.refresh_for_orders(
+                self.model.objects.using(self.db).filter(pk__in=ids), using=self.db
+            )
+        return len(changed)
+
 
 class Order(models.Model):
     """
@@ -29,18 +294,435 @@ class Order(models.Model):
     в кафе
     """
 
+    class Meta:
+        # индексы под реальные запросы (см. команду audit_indexes);
+        # все запросы представлений ограничены кафе, поэтому кафе - первое поле
+        indexes = [
+            # заказы стола, в т.ч. с фильтром по статусу (API, план зала)
+            models.Index(
+                fields=["cafe", "table_number", "status"],
+                name="order_table_status_idx",
+            ),
+            # фильтр по статусу с сортировкой по сумме и выручка: без чтения таблицы
+            models.Index(
+                fields=["cafe", "status", "total_price"], name="order_status_total_idx"
+            ),
+            # сортировка списка по сумме
+            models.Index(fields=["cafe", "total_price"], name="order_total_idx"),
+            # неоплаченные заказы стола для TableState: в индекс
+            # попадают только открытые заказы, а не вся история
+            models.Index(
+                fields=["cafe", "table_number", "total_price"],
+                name="order_open_idx",
+                condition=~models.Q(status="Оплачено"),
+            ),
+        ]
+
+    STATUS_PENDING: str = "В ожидании"
+    STATUS_READY: str = "Готово"
+    STATUS_PAID: str = "Оплачено"
     STATUS_CHOICES: List[tuple[str, str]] = [
-        ("В ожидании", "В ожидании"),
-        ("Готово", "Готово"),
-        ("Оплачено", "Оплачено"),
+        (STATUS_PENDING, STATUS_PENDING),
+        (STATUS_READY, STATUS_READY),
+        (STATUS_PAID, STATUS_PAID),
     ]
-    TABLE_CHOICES: List[tuple[int, str]] = [(i, f"Стол {i}") for i in range(1, 10)]
-    table_number: Field = models.IntegerField(choices=TABLE_CHOICES, db_index=True)
+    cafe: Field = models.ForeignKey(
+        Cafe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        default=current_cafe_id,
+        related_name="orders",
+    )
+    # допустимые номера задаёт раскладка столов кафе (Cafe.tables)
+    table_number: Field = models.IntegerField()
     items: Field = models.ManyToManyField(Dish, related_name="orders")
     total_price: Field = models.DecimalField(default=0, max_digits=8, decimal_places=2)
     status: Field = models.CharField(
-        max_length=10, choices=STATUS_CHOICES, default="В ожидании", db_index=True
+        max_length=10, choices=STATUS_CHOICES, default="В ожидании"
     )
+    # номер версии для оптимистичной блокировки: растёт при каждом сохранении
+    version: Field = models.PositiveIntegerField(default=1)
+    # момент, на который оцениваются блюда заказа (история цен DishPrice)
+    created_at: Field = models.DateTimeField(default=timezone.now)
+
+    objects = OrderQuerySet.as_manager()
 
     def __str__(self):
         return f"Заказ {self.pk} - Стол {self.table_number} ({self.status})"
+
+    @classmethod
+    def from_db(cls, db: str, field_names: List[str], values: List[Any]) -> "Order":
+        instance: Order = super().from_db(db, field_names, values)
+        # запоминаем статус из БД, чтобы при сохранении увидеть переход
+        instance._loaded_status = instance.__dict__.get("status")
+        instance._loaded_table_number = instance.__dict__.get("table_number")
+        return instance
+
+    def save(self, *args, **kwargs) -> None:
+        """
+        Сохраняет заказ и в той же транзакции записывает
+        событие в OrderEvent, если статус изменился.
+
+        Существующий заказ обновляется условно: UPDATE ... WHERE version = N.
+        Если заказ успел изменить кто-то другой, выбрасывается
+        OrderVersionConflict и ничего не записывается.
+        """
+        previous: Optional[str] = getattr(self, "_loaded_status", None)
+        update_fields: Optional[Iterable[str]] = kwargs.get("update_fields")
+        track: bool = update_fields is None or "status" in update_fields
+        versioned: bool = not self._state.adding and self.pk is not None
+        expected: int = self.version
+        if versioned:
+            self.version = expected + 1
+            self._expected_version = expected
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "version"}
+        using: str = kwargs.get("using") or router.db_for_write(
+            self.__class__, instance=self
+        )
+        try:
+            with transaction.atomic(using=using):
+                super().save(*args, **kwargs)
+                if track and previous != self.status:
+                    OrderEvent.objects.using(self._state.db).create(
+                        order_id=self.pk,
+                        cafe_id=self.cafe_id,
+                        from_status=previous,
+                        to_status=self.status,
+                    )
+        except Exception:
+            self.version = expected
+            raise
+        finally:
+            self._expected_version = None
+        if track:
+            self._loaded_status = self.status
+        if update_fields is None or "table_number" in update_fields:
+            self._loaded_table_number = self.table_number
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected: Optional[int] = getattr(self, "_expected_version", None)
+        if expected is None:
+            return super()._do_update(
+                base_qs, using, pk_val, values, update_fields, forced_update
+            )
+        updated: bool = super()._do_update(
+            base_qs.filter(version=expected),
+            using,
+            pk_val,
+            values,
+            update_fields,
+            forced_update,
+        )
+        if not updated and base_qs.filter(pk=pk_val).exists():
+            raise OrderVersionConflict(pk_val, expected)
+        return updated
+
+
+class TableState(models.Model):
+    """
+    Модель TableState - текущее состояние стола: открытые (неоплаченные)
+    заказы, их сумма и время последнего изменения.
+    Пересчитывается в той же транзакции, что и изменение заказа,
+    поэтому "сколько должен стол 7" - это чтение одной строки по ключу.
+    Строки для столов кафе создаёт Cafe.sync_tables.
+
+    Заказы тут: :model:`ordersapp.Order`
+    """
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["cafe", "table_number"], name="tablestate_cafe_table_uniq"
+            ),
+        ]
+
+    cafe: Field = models.ForeignKey(
+        Cafe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        default=current_cafe_id,
+        related_name="table_states",
+    )
+    table_number: Field = models.IntegerField()
+    open_orders: Field = models.PositiveIntegerField(default=0)
+    unpaid_total: Field = models.DecimalField(
+        default=0, max_digits=10, decimal_places=2
+    )
+    last_activity: Field = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Стол {self.table_number}: {self.unpaid_total} руб"
+
+    @classmethod
+    def refresh(
+        cls, cafe_id: int, table_numbers: Iterable[int], using: Optional[str] = None
+    ) -> None:
+        """
+        Пересчитывает состояние столов кафе одним UPDATE с подзапросами
+        по неоплаченным заказам
+        :param cafe_id: номер кафе
+        :param table_numbers: номера столов
+        :param using: псевдоним БД
+        """
+        unpaid: QuerySet = (
+            Order.objects.using(using)
+            .filter(cafe_id=cafe_id, table_number=OuterRef("table_number"))
+            .exclude(status=Order.STATUS_PAID)
+            .values("table_number")
+        )
+        cls.objects.using(using).filter(
+            cafe_id=cafe_id, table_number__in=table_numbers
+        ).update(
+            open_orders=Coalesce(
+                Subquery(unpaid.annotate(count=Count("pk")).values("count")),
+                Value(0),
+            ),
+            unpaid_total=Coalesce(
+                Subquery(unpaid.annotate(total=Sum("total_price")).values("total")),
+                Value(0),
+                output_field=DecimalField(max_digits=10, decimal_places=2),
+            ),
+            last_activity=timezone.now(),
+        )
+
+    @classmethod
+    def refresh_for_orders(cls, orders: QuerySet, using: Optional[str] = None) -> None:
+        """
+        Пересчитывает столы, на которых стоят заказы (заказы могут быть
+        из разных кафе)
+        :param orders: выборка заказов
+        :param using: псевдоним БД
+        """
+        tables: Dict[int, Set[int]] = defaultdict(set)
+        for cafe_id, table_number in (
+            orders.order_by().values_list("cafe_id", "table_number").distinct()
+        ):
+            tables[cafe_id].add(table_number)
+        for cafe_id, numbers in tables.items():
+            cls.refresh(cafe_id, numbers, using=using)
+
+
+class OrderEvent(models.Model):
+    """
+    Модель OrderEvent - неизменяемый журнал переходов статуса заказа.
+    Записи только добавляются: по ним считается время приготовления.
+    При удалении заказа история сохраняется.
+
+    Заказ тут: :model:`ordersapp.Order`
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cafe", "created_at"], name="orderevent_created_idx"),
+            models.Index(
+                fields=["cafe", "to_status", "created_at"],
+                name="orderevent_status_time_idx",
+            ),
+            models.Index(fields=["order", "created_at"], name="orderevent_order_idx"),
+        ]
+
+    cafe: Field = models.ForeignKey(
+        Cafe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        default=current_cafe_id,
+        related_name="+",
+    )
+    order: Field = models.ForeignKey(
+        Order,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        related_name="events",
+    )
+    from_status: Field = models.CharField(
+        max_length=10, choices=Order.STATUS_CHOICES, null=True, blank=True
+    )
+    to_status: Field = models.CharField(max_length=10, choices=Order.STATUS_CHOICES)
+    created_at: Field = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Заказ {self.order_id}: {self.from_status} -> {self.to_status}"
+
+    def save(self, *args, **kwargs) -> None:
+        if not self._state.adding:
+            raise ValueError("OrderEvent нельзя изменять, только добавлять")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("OrderEvent нельзя удалять")
+
+
+class IdempotencyKeyQuerySet(models.QuerySet):
+    """
+    Набор запросов для ключей идемпотентности
+    """
+
+    def expired(self) -> "IdempotencyKeyQuerySet":
+        """
+        Ключи, время жизни которых (IDEMPOTENCY_KEY_TTL) истекло
+        """
+        return self.filter(created_at__lt=IdempotencyKey.expiry_cutoff())
+
+
+class IdempotencyKey(models.Model):
+    """
+    Модель IdempotencyKey хранит ответ на POST-запрос с заголовком
+    Idempotency-Key, чтобы повтор запроса (планшет не дождался ответа)
+    получил тот же ответ, а не создал дубликат заказа.
+    Ключи уникальны в пределах кафе: планшеты разных кафе
+    могут прислать одинаковые ключи.
+    Устаревшие ключи удаляет команда purge_idempotency_keys.
+    """
+
+    class Meta:
+        unique_together = ("cafe", "key")
+        indexes = [
+            models.Index(fields=["created_at"], name="idempotency_created_idx"),
+        ]
+
+    cafe: Field = models.ForeignKey(
+        Cafe, on_delete=models.CASCADE, default=current_cafe_id, related_name="+"
+    )
+    key: Field = models.CharField(max_length=255)
+    fingerprint: Field = models.CharField(max_length=64)  # sha256 тела запроса
+    status_code: Field = models.PositiveSmallIntegerField(null=True)
+    response_body: Field = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at: Field = models.DateTimeField(default=timezone.now)
+
+    objects = IdempotencyKeyQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.key} ({self.status_code})"
+
+    @staticmethod
+    def expiry_cutoff() -> datetime:
+        """
+        Ключи, созданные раньше этого момента, считаются устаревшими
+        """
+        return timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+
+    def is_expired(self) -> bool:
+        return self.created_at < self.expiry_cutoff()
+
+
+class ArchivedOrder(models.Model):
+    """
+    Модель ArchivedOrder - оплаченный заказ, перенесённый из
+    :model:`ordersapp.Order` командой archive_orders.
+    Блюда хранятся компактным JSON-списком пар [id блюда, цена],
+    поэтому архив не нагружает таблицу связей и индексы горячих заказов.
+    Первичный ключ совпадает с номером исходного заказа.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["cafe", "paid_at"], name="archivedorder_paid_idx"),
+        ]
+
+    id: Field = models.BigIntegerField(primary_key=True)
+    cafe: Field = models.ForeignKey(
+        Cafe,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        db_index=False,
+        default=current_cafe_id,
+        related_name="+",
+    )
+    table_number: Field = models.IntegerField()
+    total_price: Field = models.DecimalField(max_digits=8, decimal_places=2)
+    items: Field = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    paid_at: Field = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Архивный заказ {self.pk} - Стол {self.table_number}"
+
+
+class JobQuerySet(models.QuerySet):
+    """
+    Набор запросов для фоновых задач
+    """
+
+    def claim(self, limit: int) -> List[int]:
+        """
+        Забирает до limit задач из очереди (старые первыми).
+        Статус меняется условным UPDATE ... WHERE status = "queued",
+        поэтому задачу получает только один обработчик, даже если
+        очередь читают несколько процессов
+        :return: номера полученных задач
+        """
+        claimed: List[int] = []
+        candidates: List[int] = list(
+            self.filter(status=Job.STATUS_QUEUED)
+            .order_by("created_at", "pk")
+            .values_list("pk", flat=True)[:limit]
+        )
+        for pk in candidates:
+            if self.filter(pk=pk, status=Job.STATUS_QUEUED).update(
+                status=Job.STATUS_RUNNING, started_at=timezone.now()
+            ):
+                claimed.append(pk)
+        return claimed
+
+
+class Job(models.Model):
+    """
+    Модель Job - фоновая задача (отчёт или выгрузка).
+    Очередь хранится в БД, задачи выполняет команда run_jobs
+    в пуле процессов, результат пишется в файл в JOBS_RESULT_DIR.
+    """
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["status", "created_at"], name="job_status_created_idx"
+            ),
+        ]
+
+    KIND_REVENUE_REPORT: str = "revenue_report"
+    KIND_ORDERS_EXPORT: str = "orders_export"
+    KIND_CHOICES: List[tuple[str, str]] = [
+        (KIND_REVENUE_REPORT, "Отчёт о выручке"),
+        (KIND_ORDERS_EXPORT, "Выгрузка оплаченных заказов"),
+    ]
+    STATUS_QUEUED: str = "queued"
+    STATUS_RUNNING: str = "running"
+    STATUS_DONE: str = "done"
+    STATUS_FAILED: str = "failed"
+    STATUS_CHOICES: List[tuple[str, str]] = [
+        (STATUS_QUEUED, "В очереди"),
+        (STATUS_RUNNING, "Выполняется"),
+        (STATUS_DONE, "Готово"),
+        (STATUS_FAILED, "Ошибка"),
+    ]
+    cafe: Field = models.ForeignKey(
+        Cafe, on_delete=models.PROTECT, default=current_cafe_id, related_name="jobs"
+    )
+    kind: Field = models.CharField(max_length=32, choices=KIND_CHOICES)
+    status: Field = models.CharField(
+        max_length=16, choices=STATUS_CHOICES, default=STATUS_QUEUED
+    )
+    progress: Field = models.PositiveSmallIntegerField(default=0)  # проценты
+    result_file: Field = models.CharField(max_length=255, blank=True)
+    error: Field = models.TextField(blank=True)
+    created_at: Field = models.DateTimeField(default=timezone.now)
+    started_at: Field = models.DateTimeField(null=True, blank=True)
+    finished_at: Field = models.DateTimeField(null=True, blank=True)
+
+    objects = JobQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Задача {self.pk} {self.kind} ({self.status})"
+
+    @property
+    def result_path(self) -> Optional[Path]:
+        """
+        Полный путь к файлу результата или None, если результата нет
+        """
+        if not self.result_file:
+            return None
+        return Path(settings.JOBS_RESULT_DIR) / self.result_file
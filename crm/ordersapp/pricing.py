@@ -0,0 +1,113 @@
+"""
+Цены блюд в заказах по истории цен (:model:`ordersapp.DishPrice`).
+
+Блюдо заказа стоит столько, сколько стоило на момент создания заказа
+(Order.created_at): изменение цены в меню не меняет сумм уже созданных
+заказов, пересчёт при изменении блюд и архивация дают ту же сумму.
+Если у блюда нет цены на этот момент (например, блюда созданы через
+bulk_create, без истории), берётся текущая цена блюда (Dish.price).
+
+PriceBook - индекс цен в памяти: для каждого блюда времена начала
+действия цен по возрастанию и цены, цена на момент ищется двоичным
+поиском. Индекс строится одним запросом на пачку заказов, поэтому
+пересчёт, чеки и выгрузки не делают запрос цены на каждое блюдо.
+"""
+
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db.models import QuerySet
+
+from .models import DishPrice, Order
+
+
+class PriceBook:
+    """
+    Индекс цен блюд по времени
+    :param history: строки (блюдо, начало действия, цена),
+        отсортированные по блюду и времени
+    :param current: текущие цены блюд для моментов без истории
+    """
+
+    def __init__(
+        self,
+        history: Iterable[Tuple[int, datetime, Decimal]],
+        current: Optional[Dict[int, Decimal]] = None,
+    ) -> None:
+        self._times: Dict[int, List[datetime]] = defaultdict(list)
+        self._prices: Dict[int, List[Decimal]] = defaultdict(list)
+        for dish_id, effective_from, price in history:
+            self._times[dish_id].append(effective_from)
+            self._prices[dish_id].append(price)
+        self._current: Dict[int, Decimal] = current or {}
+
+    @classmethod
+    def load(
+        cls,
+        dish_ids: Iterable[int],
+        using: str,
+        current: Optional[Dict[int, Decimal]] = None,
+    ) -> "PriceBook":
+        """
+        Индекс по истории цен указанных блюд (один запрос)
+        :param using: псевдоним БД с блюдами
+        """
+        history: QuerySet = (
+            DishPrice.objects.using(using)
+            .filter(dish_id__in=set(dish_ids))
+            .order_by("dish_id", "effective_from", "pk")
+            .values_list("dish_id", "effective_from", "price")
+        )
+        return cls(history, current)
+
+    def price(self, dish_id: int, at: datetime) -> Decimal:
+        """
+        Цена блюда, действовавшая в момент at
+        """
+        times: Optional[List[datetime]] = self._times.get(dish_id)
+        if times:
+            index: int = bisect_right(times, at)
+            if index:
+                return self._prices[dish_id][index - 1]
+        return self._current.get(dish_id, Decimal(0))
+
+
+def order_items(
+    created: Dict[int, datetime], using: str
+) -> Dict[int, List[Tuple[int, str, Decimal]]]:
+    """
+    Блюда заказов с ценами на момент создания заказа:
+    один запрос связей с блюдами и один запрос истории цен
+    :param created: время создания каждого заказа {номер заказа: время}
+    :param using: псевдоним БД с заказами
+    :return: {номер заказа: [(блюдо, название, цена), ...]}
+    """
+    rows: List[tuple] = list(
+        Order.items.through.objects.using(using)
+        .filter(order_id__in=list(created))
+        .order_by("pk")
+        .values_list("order_id", "dish_id", "dish__name", "dish__price")
+    )
+    book: PriceBook = PriceBook.load(
+        (row[1] for row in rows), using, {row[1]: row[3] for row in rows}
+    )
+    items: Dict[int, List[Tuple[int, str, Decimal]]] = defaultdict(list)
+    for order_id, dish_id, name, _ in rows:
+        items[order_id].append((dish_id, name, book.price(dish_id, created[order_id])))
+    return items
+
+
+def order_totals(orders: QuerySet) -> Dict[int, Decimal]:
+    """
+    Суммы заказов по ценам на момент их создания.
+    Заказы не блокируются: запись суммы увеличивает версию заказа,
+    и параллельное сохранение с устаревшей версией получит
+    OrderVersionConflict
+    :return: {номер заказа: сумма}
+    """
+    created: Dict[int, datetime] = dict(orders.values_list("pk", "created_at"))
+    items = order_items(created, orders.db)
+    return {pk: sum((price for _, _, price in items[pk]), Decimal(0)) for pk in created}
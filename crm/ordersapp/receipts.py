@@ -0,0 +1,297 @@
+"""
+Чеки (счета) для печати: заказа и всего стола.
+
+Данные чека читаются тремя запросами (заказы, блюда с названиями
+и история их цен через values_list), без моделей и без запросов
+на каждое блюдо; цены блюд - на момент создания заказа.
+Форматы:
+    - text: обычный текст под ширину ленты (RECEIPT_WIDTH символов);
+    - escpos: тот же текст командами ESC/POS в кодировке CP866
+      (жирный заголовок, выравнивание, отрез ленты);
+    - html: страница для печати из браузера.
+Готовый чек хранится в кэше Django по версиям заказов: любое изменение
+заказа увеличивает версию, поэтому устаревший чек не будет отдан,
+а повторная печать стоит одного запроса версий. Названия и цены блюд
+версию заказа не меняют: их изменение меняет поколение меню
+(bump_menu_generation), которое тоже входит в ключ чека.
+"""
+
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import QuerySet
+from django.template.loader import render_to_string
+
+from .cache import new_generation
+from .models import Cafe, Order, OrderEvent
+from .pricing import order_items
+
+RECEIPT_TYPES: Dict[str, str] = {
+    "text": "text/plain; charset=utf-8",
+    "escpos": "application/octet-stream",
+    "html": "text/html; charset=utf-8",
+}
+CACHE_KEY: str = "ordersapp:receipt:{}:{}:{}"
+MENU_GENERATION_KEY: str = "ordersapp:receipt:menu_generation"
+CENT: Decimal = Decimal("0.01")
+
+# команды ESC/POS
+ESC_INIT: bytes = b"\x1b@"
+ESC_CODEPAGE_CP866: bytes = b"\x1bt\x11"
+ESC_BOLD: Tuple[bytes, bytes] = (b"\x1bE\x01", b"\x1bE\x00")
+ESC_CENTER: Tuple[bytes, bytes] = (b"\x1ba\x01", b"\x1ba\x00")
+ESC_CUT: bytes = b"\n\n\n\x1dV\x01"
+ESCPOS_ENCODING: str = "cp866"
+
+# строка чека: стиль ("title", "bold", "line") и текст
+Line = Tuple[str, str]
+
+
+def _money(value: Decimal) -> str:
+    return str(Decimal(value).quantize(CENT))
+
+
+def load_orders(orders: QuerySet) -> List[dict]:
+    """
+    Данные для чеков: заказы по порядку номеров и их блюда
+    с ценами на момент создания заказа (pricing.order_items)
+    :param orders: заказы (одного кафе)
+    :return: словари с ключами pk, table_number, status, total_price,
+        version и items - список пар (название, цена)
+    """
+    rows: List[dict] = list(
+        orders.order_by("pk").values(
+            "pk", "table_number", "status", "total_price", "version", "created_at"
+        )
+    )
+    items = order_items({row["pk"]: row["created_at"] for row in rows}, orders.db)
+    for row in rows:
+        row["items"] = [(name, price) for _, name, price in items[row["pk"]]]
+    return rows
+
+
+def _columns(left: str, right: str, width: int) -> str:
+    """
+    Строка в две колонки: текст слева (обрезается), сумма справа
+    """
+    left = left[: max(width - len(right) - 1, 0)]
+    return f"{left}{right.rjust(width - len(left))}"
+
+
+def receipt_lines(
+    orders: List[dict], cafe: Cafe, table: Optional[int] = None
+) -> List[Line]:
+    """
+    Строки чека заказа или, если указан стол, счёта стола
+    :param orders: заказы из load_orders
+    :param table: номер стола для счёта по всем его заказам
+    """
+    width: int = settings.RECEIPT_WIDTH
+    rule: Line = ("line", "-" * width)
+    lines: List[Line] = [("title", cafe.name)]
+    if table is not None:
+        lines.append(("title", f"Счёт стола {table}"))
+    else:
+        lines.append(("title", f"Заказ № {orders[0]['pk']}"))
+        lines.append(
+            (
+                "line",
+                _columns(
+                    f"Стол {orders[0]['table_number']}", orders[0]["status"], width
+                ),
+            )
+        )
+    lines.append(rule)
+    for order in orders:
+        if table is not None:
+            lines.append(
+                ("bold", _columns(f"Заказ № {order['pk']}", order["status"], width))
+            )
+        for name, price in order["items"]:
+            lines.append(("line", _columns(name, _money(price), width)))
+        if table is not None:
+            lines.append(("line", _columns("", _money(order["total_price"]), width)))
+    lines.append(rule)
+    total: Decimal = sum((order["total_price"] for order in orders), Decimal(0))
+    label: str = "К ОПЛАТЕ" if table is not None else "ИТОГО"
+    lines.append(("bold", _columns(label, _money(total), width)))
+    return lines
+
+
+def _text(lines: List[Line]) -> bytes:
+    width: int = settings.RECEIPT_WIDTH
+    return "".join(
+        f"{text.center(width).rstrip() if style == 'title' else text}\n"
+        for style, text in lines
+    ).encode()
+
+
+def _escpos(lines: List[Line]) -> bytes:
+    out: List[bytes] = [ESC_INIT, ESC_CODEPAGE_CP866]
+    for style, text in lines:
+        data: bytes = text.encode(ESCPOS_ENCODING, errors="replace") + b"\n"
+        if style == "title":
+            data = ESC_CENTER[0] + ESC_BOLD[0] + data + ESC_BOLD[1] + ESC_CENTER[1]
+        elif style == "bold":
+            data = ESC_BOLD[0] + data + ESC_BOLD[1]
+        out.append(data)
+    out.append(ESC_CUT)
+    return b"".join(out)
+
+
+def _html(orders: List[dict], cafe: Cafe, table: Optional[int]) -> bytes:
+    context: dict = {
+        "cafe": cafe,
+        "table": table,
+        # суммы строками: шаблон не должен локализовать их ("301,25")
+        "orders": [
+            {
+                **order,
+                "total_price": _money(order["total_price"]),
+                "items": [(name, _money(price)) for name, price in order["items"]],
+            }
+            for order in orders
+        ],
+        "total": _money(sum((order["total_price"] for order in orders), Decimal(0))),
+    }
+    return render_to_string("ordersapp/receipt.html", context).encode()
+
+
+def render_receipt(
+    orders: List[dict], cafe: Cafe, kind: str, table: Optional[int] = None
+) -> bytes:
+    """
+    Чек в формате kind (см. RECEIPT_TYPES)
+    :param orders: заказы из load_orders
+    :param table: номер стола для счёта по всем его заказам
+    """
+    if kind == "html":
+        return _html(orders, cafe, table)
+    lines: List[Line] = receipt_lines(orders, cafe, table)
+    return _escpos(lines) if kind == "escpos" else _text(lines)
+
+
+def menu_generation() -> str:
+    """
+    Текущее поколение меню (названий и цен блюд)
+    """
+    return cache.get_or_set(MENU_GENERATION_KEY, new_generation, timeout=None)
+
+
+def bump_menu_generation(using: Optional[str] = None) -> None:
+    """
+    Меняет поколение меню после коммита транзакции: сохранённые
+    чеки с прежними названиями и ценами блюд больше не отдаются.
+    Новое поколение - случайная строка, а не счётчик, поэтому
+    одновременные изменения не нужно согласовывать
+    :param using: псевдоним БД, в которую пишутся блюда
+    """
+    transaction.on_commit(
+        lambda: cache.set(MENU_GENERATION_KEY, new_generation(), timeout=None),
+        using=using,
+    )
+
+
+def receipt_key(
+    cafe: Cafe,
+    kind: str,
+    versions: Iterable[tuple],
+    menu: str,
+    table: Optional[int] = None,
+) -> str:
+    """
+    Ключ кэша чека: кафе, формат, ширина ленты, стол, поколение меню
+    и версии заказов
+    :param versions: пары (номер заказа, версия)
+    :param menu: поколение меню (menu_generation)
+    """
+    source: str = "|".join(
+        [
+            cafe.name,
+            menu,
+            str(settings.RECEIPT_WIDTH),
+            str(table),
+            ",".join(f"{pk}:{version}" for pk, version in versions),
+        ]
+    )
+    digest: str = hashlib.sha1(source.encode()).hexdigest()
+    return CACHE_KEY.format(kind, cafe.pk, digest)
+
+
+def cached_receipt(
+    orders: QuerySet, cafe: Cafe, kind: str, table: Optional[int] = None
+) -> Optional[bytes]:
+    """
+    Чек из кэша, при промахе - отрисовка и сохранение в кэш
+    :param orders: заказы чека
+    :param table: номер стола для счёта по всем его заказам
+    :return: чек или None, если заказов нет
+    """
+    versions: List[tuple] = list(orders.order_by("pk").values_list("pk", "version"))
+    if not versions:
+        return None
+    # поколение читается до отрисовки: переименование во время неё
+    # сменит поколение, и чек со старыми названиями не будет найден
+    menu: str = menu_generation()
+    content: Optional[bytes] = cache.get(receipt_key(cafe, kind, versions, menu, table))
+    if content is not None:
+        return content
+    rows: List[dict] = load_orders(
+        orders.model.objects.using(orders.db).filter(pk__in=[pk for pk, _ in versions])
+    )
+    if not rows:
+        return None
+    content = render_receipt(rows, cafe, kind, table)
+    # ключ по прочитанным версиям: заказ мог измениться после первого запроса
+    loaded: List[tuple] = [(row["pk"], row["version"]) for row in rows]
+    cache.set(
+        receipt_key(cafe, kind, loaded, menu, table),
+        content,
+        settings.RECEIPT_CACHE_TIMEOUT,
+    )
+    return content
+
+
+def shift_orders(
+    cafe: Cafe, since: datetime, until: Optional[datetime] = None
+) -> QuerySet:
+    """
+    Заказы кафе, оплаченные за смену: по событиям оплаты в журнале OrderEvent
+    :param since: начало смены
+    :param until: конец смены, None - до текущего момента
+    """
+    events: QuerySet = OrderEvent.objects.filter(
+        cafe=cafe, to_status=Order.STATUS_PAID, created_at__gte=since
+    )
+    if until is not None:
+        events = events.filter(created_at__lt=until)
+    return Order.objects.filter(
+        cafe=cafe, status=Order.STATUS_PAID, pk__in=events.values("order_id")
+    )
+
+
+def iter_receipts(
+    orders: QuerySet, cafe: Cafe, kind: str, chunk_size: int = 500
+) -> Iterator[bytes]:
+    """
+    Чеки заказов по одному, потоково: номера заказов читаются
+    курсором, данные - пачками по chunk_size заказов, поэтому
+    в памяти не больше одной пачки
+    """
+    ids: Iterator[int] = (
+        orders.order_by("pk").values_list("pk", flat=True).iterator(chunk_size)
+    )
+    while True:
+        chunk: List[int] = list(islice(ids, chunk_size))
+        if not chunk:
+            return
+        for row in load_orders(
+            orders.model.objects.using(orders.db).filter(pk__in=chunk)
+        ):
+            yield render_receipt([row], cafe, kind)
@@ -0,0 +1,132 @@
+"""
+Отчёты по журналу статусов заказов (:model:`ordersapp.OrderEvent`).
+
+Время приготовления заказа - интервал от перехода в "В ожидании"
+до первого перехода в "Готово". Среднее и перцентили считаются
+в SQL оконными функциями, без выгрузки событий в Python.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from django.db import connections
+
+from .models import Dish, Order, OrderEvent
+
+GROUPS: tuple[str, ...] = ("dish", "hour")
+
+# Разница во времени (в секундах) и час события для разных СУБД
+_SECONDS_SQL: Dict[str, str] = {
+    "sqlite": "(julianday(r.ready_at) - julianday(p.pending_at)) * 86400.0",
+    "postgresql": "EXTRACT(EPOCH FROM (r.ready_at - p.pending_at))",
+}
+_HOUR_SQL: Dict[str, str] = {
+    "sqlite": "CAST(strftime('%%H', p.pending_at) AS INTEGER)",
+    "postgresql": "CAST(EXTRACT(HOUR FROM p.pending_at) AS INTEGER)",
+}
+
+
+def _build_sql(
+    vendor: str, group_by: str, since: bool, until: bool, cafe: bool = False
+) -> str:
+    if vendor not in _SECONDS_SQL:
+        raise NotImplementedError(f"Отчёт не поддерживает СУБД {vendor}")
+    event_table: str = OrderEvent._meta.db_table
+    items_table: str = Order.items.through._meta.db_table
+    dish_table: str = Dish._meta.db_table
+    scope: str = " AND cafe_id = %s" if cafe else ""
+    period: str = "".join(
+        [
+            " AND created_at >= %s" if since else "",
+            " AND created_at < %s" if until else "",
+        ]
+    )
+    if group_by == "dish":
+        key_sql: str = "d.id"
+        label_sql: str = "d.name"
+        join_sql: str = (
+            f" JOIN {items_table} oi ON oi.order_id = prep.order_id"
+            f" JOIN {dish_table} d ON d.id = oi.dish_id"
+        )
+    else:
+        key_sql = label_sql = "prep.hour"
+        join_sql = ""
+    return f"""
+        WITH pending AS (
+            SELECT order_id, MIN(created_at) AS pending_at
+            FROM {event_table}
+            WHERE to_status = %s{scope}{period}
+            GROUP BY order_id
+        ),
+        ready AS (
+            SELECT order_id, MIN(created_at) AS ready_at
+            FROM {event_table}
+            WHERE to_status = %s{scope}
+            GROUP BY order_id
+        ),
+        prep AS (
+            SELECT p.order_id,
+                   {_HOUR_SQL[vendor]} AS hour,
+                   {_SECONDS_SQL[vendor]} AS seconds
+            FROM pending p
+            JOIN ready r ON r.order_id = p.order_id AND r.ready_at >= p.pending_at
+        ),
+        ranked AS (
+            SELECT {key_sql} AS group_key,
+                   {label_sql} AS label,
+                   prep.seconds AS seconds,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY {key_sql} ORDER BY prep.seconds
+                   ) AS rn,
+                   COUNT(*) OVER (PARTITION BY {key_sql}) AS cnt
+            FROM prep{join_sql}
+        )
+        SELECT group_key,
+               label,
+               COUNT(*) AS orders,
+               AVG(seconds) AS avg_seconds,
+               MIN(CASE WHEN rn >= 0.5 * cnt THEN seconds END) AS p50_seconds,
+               MIN(CASE WHEN rn >= 0.9 * cnt THEN seconds END) AS p90_seconds,
+               MIN(CASE WHEN rn >= 0.95 * cnt THEN seconds END) AS p95_seconds,
+               MAX(seconds) AS max_seconds
+        FROM ranked
+        GROUP BY group_key, label
+        ORDER BY group_key
+    """
+
+
+def preparation_stats(
+    group_by: str = "dish",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    cafe_id: Optional[int] = None,
+    using: str = "default",
+) -> List[Dict[str, Any]]:
+    """
+    Считает время приготовления заказов по блюдам или по часам
+    :param group_by: "dish" - по блюдам, "hour" - по часу поступления заказа
+    :param since: учитывать заказы, поступившие не раньше этого времени
+    :param until: учитывать заказы, поступившие раньше этого времени
+    :param cafe_id: только заказы этого кафе
+    :param using: псевдоним БД
+    :return: список строк с количеством заказов, средним и перцентилями (в секундах)
+    """
+    if group_by not in GROUPS:
+        raise ValueError(f"group_by должен быть одним из {GROUPS}")
+    connection = connections[using]
+    scoped: bool = cafe_id is not None
+    sql: str = _build_sql(
+        connection.vendor, group_by, since is not None, until is not None, scoped
+    )
+    scope: List[Any] = [cafe_id] if scoped else []
+    params: List[Any] = [Order.STATUS_PENDING, *scope]
+    params += [
+        connection.ops.adapt_datetimefield_value(value)
+        for value in (since, until)
+        if value is not None
+    ]
+    params += [Order.STATUS_READY, *scope]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns: List[str] = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
@@ -1,12 +1,34 @@
-from typing import Tuple
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-from django.db.models import Model
+from django.db.models import Model, QuerySet
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
-from .models import Order
+from .models import Cafe, Dish, Job, Order, TableState
+from .tenancy import current_cafe
+
+
+def _cafe(context: Dict[str, Any]) -> Optional[Cafe]:
+    """
+    Кафе запроса сериализатора, вне запроса - текущее кафе
+    """
+    return getattr(context.get("request"), "cafe", None) or current_cafe()
+
+
+class CafeDishField(serializers.PrimaryKeyRelatedField):
+    """
+    Блюдо по номеру: выбрать можно только блюдо из меню кафе запроса
+    """
+
+    def get_queryset(self) -> QuerySet[Dish]:
+        cafe: Optional[Cafe] = _cafe(self.context)
+        return Dish.objects.filter(cafe=cafe) if cafe else Dish.objects.all()
 
 
 class OrderSerializer(serializers.ModelSerializer):
+    items = CafeDishField(many=True, allow_empty=False)
+
     class Meta:
         model: Model = Order
         fields: Tuple[str] = (
@@ -15,4 +37,90 @@ class OrderSerializer(serializers.ModelSerializer):
             "items",
             "status",
             "total_price",
+            "version",
+        )
+        read_only_fields: Tuple[str] = ("total_price", "version")
+
+    def validate_table_number(self, value: int) -> int:
+        cafe: Optional[Cafe] = _cafe(self.context)
+        if cafe is not None and value not in cafe.tables:
+            raise serializers.ValidationError(f"В кафе {cafe} нет стола {value}.")
+        return value
+
+
+# поля заказа без items: читаются через values() для быстрой сериализации
+ORDER_VALUES: Tuple[str, ...] = (
+    "pk",
+    "table_number",
+    "status",
+    "total_price",
+    "version",
+)
+
+
+def serialize_orders(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Быстрая сериализация заказов только для чтения.
+    Принимает строки Order.objects.values(*ORDER_VALUES), блюда всех
+    заказов читает одним запросом и собирает словари напрямую,
+    без моделей и полей сериализатора. Результат совпадает
+    с OrderSerializer(many=True).data
+    :param rows: строки заказов (например, страница пагинации)
+    :return: список заказов в формате API
+    """
+    rows = list(rows)
+    items: Dict[int, List[int]] = defaultdict(list)
+    through = Order.items.through
+    for order_id, dish_id in (
+        through.objects.filter(order_id__in=[row["pk"] for row in rows])
+        .order_by("pk")
+        .values_list("order_id", "dish_id")
+    ):
+        items[order_id].append(dish_id)
+    as_string: bool = api_settings.COERCE_DECIMAL_TO_STRING
+    return [
+        {
+            "pk": row["pk"],
+            "table_number": row["table_number"],
+            "items": items[row["pk"]],
+            "status": row["status"],
+            # DecimalField уже приведён к 2 знакам конвертером БД
+            "total_price": str(row["total_price"]) if as_string else row["total_price"],
+            "version": row["version"],
+        }
+        for row in rows
+    ]
+
+
+class TableStateSerializer(serializers.ModelSerializer):
+    class Meta:
+        model: Model = TableState
+        fields: Tuple[str] = (
+            "table_number",
+            "open_orders",
+            "unpaid_total",
+            "last_activity",
+        )
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model: Model = Job
+        fields: Tuple[str] = (
+            "pk",
+            "kind",
+            "status",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        )
+        read_only_fields: Tuple[str] = (
+            "status",
+            "progress",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
         )
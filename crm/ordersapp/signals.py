@@ -1,14 +1,92 @@
-from django.db.models.signals import m2m_changed
+from collections import defaultdict
+
+from django.db.models import F
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Order
+from .cache import bump_orders_generation
+from .models import Dish, DishPrice, Order, TableState
+from .pricing import order_totals
+from .receipts import bump_menu_generation
 
 
 @receiver(m2m_changed, sender=Order.items.through)
 def update_order_total_price(sender, instance, action, **kwargs):
     """
     Автоматически пересчитывает total_price при изменении блюд в заказе.
+    Блюда оцениваются по ценам на момент создания заказа (pricing.order_totals),
+    суммы записываются одним UPDATE на каждую сумму с увеличением версии:
+    параллельное сохранение с устаревшей версией получит OrderVersionConflict.
+    """
+    if action not in ["post_add", "post_remove", "post_clear"]:
+        return
+    if kwargs.get("reverse"):
+        # dish.orders.add(...) - instance это блюдо, pk_set - заказы
+        order_ids = kwargs.get("pk_set") or []
+    else:
+        order_ids = [instance.pk]
+    using = kwargs.get("using")
+    bump_orders_generation(using)
+    orders = Order.objects.using(using).filter(pk__in=order_ids)
+    by_total = defaultdict(list)
+    for pk, total in order_totals(orders).items():
+        by_total[total].append(pk)
+    for total, pks in by_total.items():
+        Order.objects.using(using).filter(pk__in=pks).update(
+            total_price=total, version=F("version") + 1
+        )
+    if kwargs.get("reverse"):
+        TableState.refresh_for_orders(orders, using=using)
+    else:
+        TableState.refresh(instance.cafe_id, [instance.table_number], using=using)
+        # обновляем объект в памяти, чтобы следующее сохранение не конфликтовало
+        instance.total_price, instance.version = orders.values_list(
+            "total_price", "version"
+        ).get(pk=instance.pk)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_orders_cache(sender, **kwargs):
+    """
+    Любое изменение заказа делает устаревшими закэшированные списки заказов
+    """
+    bump_orders_generation(kwargs.get("using"))
+
+
+@receiver(post_save, sender=Dish)
+@receiver(post_delete, sender=Dish)
+@receiver(post_save, sender=DishPrice)
+@receiver(post_delete, sender=DishPrice)
+def invalidate_receipts(sender, **kwargs):
+    """
+    Названия и цены блюд печатаются в чеках, но версию заказов не меняют:
+    сохранённые чеки становятся устаревшими
+    """
+    bump_menu_generation(kwargs.get("using"))
+
+
+@receiver(post_save, sender=Order)
+def refresh_table_state_on_save(sender, instance, **kwargs):
+    """
+    Пересчитывает состояние стола в транзакции сохранения заказа.
+    Если заказ перенесли на другой стол, пересчитывается и прежний стол
+    """
+    tables = {instance.table_number}
+    previous = getattr(instance, "_loaded_table_number", None)
+    if previous is not None:
+        tables.add(previous)
+    TableState.refresh(instance.cafe_id, tables, using=kwargs.get("using"))
+
+
+@receiver(post_delete, sender=Order)
+def refresh_table_state_on_delete(sender, instance, **kwargs):
+    """
+    Пересчитывает состояние стола после удаления заказа.
+    Оплаченный заказ на счёт стола не влияет (например, при архивации)
     """
-    if action in ["post_add", "post_remove", "post_clear"]:
-        instance.total_price = sum(dish.price for dish in instance.items.all())
-        instance.save(update_fields=["total_price"])  # Обновляем только total_price
+    if instance.status == Order.STATUS_PAID:
+        return
+    TableState.refresh(
+        instance.cafe_id, [instance.table_number], using=kwargs.get("using")
+    )
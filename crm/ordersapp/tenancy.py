@@ -0,0 +1,166 @@
+"""
+Несколько кафе в одном приложении (:model:`ordersapp.Cafe`).
+
+Кафе запроса определяет CafeMiddleware: параметр ?cafe=<slug>
+(запоминается в сессии), заголовок X-Cafe (планшеты, API), кафе
+из сессии или кафе по умолчанию (DEFAULT_CAFE). Кафе доступно
+как request.cafe и на время запроса хранится в контекстной переменной:
+по ней CafeRouter направляет запросы к данным кафе в его БД,
+а новые блюда и заказы без явного кафе получают текущее кафе.
+
+Кафе читаются из кэша Django (CAFE_CACHE_TIMEOUT секунд),
+поэтому определение кафе не добавляет запрос к БД.
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Callable, Generator, Optional, Type
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, models, transaction
+from django.http import Http404, HttpRequest, HttpResponse
+
+if TYPE_CHECKING:
+    from .models import Cafe
+
+# кафе по умолчанию создаёт миграция 0012_cafe
+DEFAULT_CAFE_ID: int = 1
+SESSION_KEY: str = "ordersapp_cafe"
+CACHE_KEY: str = "ordersapp:cafe:{}"
+
+# модели с данными кафе: хранятся в БД кафе (Cafe.database)
+PARTITIONED_MODELS: frozenset = frozenset(
+    {
+        "dish",
+        "dishprice",
+        "order",
+        "order_items",
+        "orderevent",
+        "tablestate",
+        "archivedorder",
+    }
+)
+
+_current_cafe: ContextVar[Optional["Cafe"]] = ContextVar("cafe", default=None)
+
+
+def current_cafe() -> Optional["Cafe"]:
+    """
+    Кафе текущего запроса (или блока using_cafe), None - вне запроса
+    """
+    return _current_cafe.get()
+
+
+def current_cafe_id() -> int:
+    """
+    Номер текущего кафе, вне запроса - кафе по умолчанию.
+    Значение по умолчанию для поля cafe моделей
+    """
+    cafe: Optional["Cafe"] = _current_cafe.get()
+    return cafe.pk if cafe is not None else DEFAULT_CAFE_ID
+
+
+@contextmanager
+def using_cafe(cafe: "Cafe") -> Generator["Cafe", None, None]:
+    """
+    Выполняет блок от имени кафе: запросы идут в БД кафе,
+    новые объекты создаются в этом кафе (команды, фоновые задачи)
+    """
+    token = _current_cafe.set(cafe)
+    try:
+        yield cafe
+    finally:
+        _current_cafe.reset(token)
+
+
+def get_cafe(slug: str) -> Optional["Cafe"]:
+    """
+    Кафе по slug из кэша, при промахе - из БД
+    :return: кафе или None, если такого нет
+    """
+    from .models import Cafe
+
+    key: str = CACHE_KEY.format(slug)
+    cafe: Optional[Cafe] = cache.get(key)
+    if cafe is None:
+        cafe = Cafe.objects.using(DEFAULT_DB_ALIAS).filter(slug=slug).first()
+        if cafe is not None:
+            cache.set(key, cafe, settings.CAFE_CACHE_TIMEOUT)
+    return cafe
+
+
+def forget_cafes(*slugs: str) -> None:
+    """
+    Удаляет кафе из кэша сразу и ещё раз после коммита:
+    до коммита другой запрос мог снова закэшировать старые данные
+    """
+    keys = [CACHE_KEY.format(slug) for slug in slugs]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+class CafeMiddleware:
+    """
+    Определяет кафе запроса и выполняет запрос от его имени.
+    Неизвестное кафе - ответ 404. Должен стоять после SessionMiddleware
+    """
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        selected: str = request.GET.get("cafe", "").strip()
+        slug: str = (
+            selected
+            or request.headers.get("X-Cafe", "").strip()
+            or request.session.get(SESSION_KEY)
+            or settings.DEFAULT_CAFE
+        )
+        cafe: Optional["Cafe"] = get_cafe(slug)
+        if cafe is None:
+            raise Http404(f"Кафе {slug} не найдено")
+        if selected and request.session.get(SESSION_KEY) != cafe.slug:
+            request.session[SESSION_KEY] = cafe.slug
+        request.cafe = cafe
+        with using_cafe(cafe):
+            return self.get_response(request)
+
+
+class CafeRouter:
+    """
+    Роутер БД: данные кафе (PARTITIONED_MODELS) читаются и пишутся
+    в БД кафе (Cafe.database), остальные модели - в default.
+    Объект, уже прочитанный из БД, остаётся в своей БД,
+    объект, привязанный к кафе (order.cafe = cafe), идёт в БД этого кафе
+    """
+
+    @staticmethod
+    def _db(model: Type[models.Model], **hints) -> Optional[str]:
+        if (
+            model._meta.app_label != "ordersapp"
+            or model._meta.model_name not in PARTITIONED_MODELS
+        ):
+            return None
+        instance: Optional[models.Model] = hints.get("instance")
+        if instance is not None:
+            if instance._meta.model_name == "cafe":
+                return instance.db_alias
+            if instance._state.db:
+                return instance._state.db
+        cafe: Optional["Cafe"] = _current_cafe.get()
+        return cafe.db_alias if cafe is not None else None
+
+    def db_for_read(self, model: Type[models.Model], **hints) -> Optional[str]:
+        return self._db(model, **hints)
+
+    def db_for_write(self, model: Type[models.Model], **hints) -> Optional[str]:
+        return self._db(model, **hints)
+
+    def allow_relation(
+        self, obj1: models.Model, obj2: models.Model, **hints
+    ) -> Optional[bool]:
+        # кафе хранится в default, его данные - в БД кафе
+        if "cafe" in (obj1._meta.model_name, obj2._meta.model_name):
+            return True
+        return None
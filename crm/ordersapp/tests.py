@@ -1,11 +1,55 @@
+import gzip
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
 from random import choices, randint
 from string import ascii_letters
+from unittest import mock, skipIf
 
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.db.models import Q
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 
-from .models import Dish, Order
+from crm.fast_json import FastJSONRenderer
+from crm.middleware import brotli
+
+from .archive import iter_paid_orders, paid_revenue_total
+from .cache import (
+    GENERATION_KEY,
+    bump_orders_generation,
+    orders_generation,
+    orders_list_cache,
+)
+from .index_audit import audit, explain
+from .jobs import HANDLERS, run_job
+from .models import (
+    ArchivedOrder,
+    Cafe,
+    Dish,
+    DishPrice,
+    IdempotencyKey,
+    Job,
+    Order,
+    OrderEvent,
+    OrderVersionConflict,
+    TableState,
+)
+from .pricing import PriceBook
+from .receipts import ESC_CUT, ESC_INIT
+from .serializers import ORDER_VALUES, OrderSerializer, serialize_orders
+from .tenancy import CafeRouter, get_cafe, using_cafe
 
 
 class DishCreateViewTestCase(TestCase):
@@ -246,6 +290,15 @@ class OrderUpdateViewTestCase(TestCase):
             Order.objects.filter(Q(pk=self.order.pk) & Q(status="Готово")).exists()
         )  # Проверяем, что статус обновлен
 
+    def test_update_with_empty_version(self):
+        """Пустое поле версии - проверяется версия из БД, а не ошибка 500"""
+        response = self.client.post(
+            reverse("ordersapp:order_update", kwargs={"pk": self.order.pk}),
+            {"status": "Готово", "items": self.dish[0].pk, "version": ""},
+        )
+        self.assertRedirects(response, reverse("ordersapp:orders_list"))
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "Готово")
+
 
 class OrderSearchListViewTestCase(TestCase):
     @classmethod
@@ -294,14 +347,45 @@ class OrderTotalIncomesListViewTestCase(TestCase):
             table_number=3, status="Готово", total_price=50.00
         )  # Не должен считаться
 
+    def setUp(self) -> None:
+        results = tempfile.TemporaryDirectory()
+        self.addCleanup(results.cleanup)
+        override = override_settings(JOBS_RESULT_DIR=results.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
     def test_total_income_calculation(self):
         """Тест подсчета общей выручки"""
-        response = self.client.get(reverse("ordersapp:total_incomes"))
+        url = reverse("ordersapp:total_incomes")
+        self.assertRedirects(self.client.post(url), url)
+        # выручку считает фоновая задача, страница только читает её итог
+        response = self.client.get(url)
+        self.assertContains(response, "Отчёт о выручке ещё не готов")
+        for pk in Job.objects.claim(5):
+            run_job(pk)
+        response = self.client.get(url)
         self.assertEqual(response.status_code, 200)
 
         # Проверяем, что на странице есть сумма 301.25 (100.50 + 200.75)
         self.assertContains(response, "301.25")
 
+    def test_pending_report_is_reused(self):
+        """Повторное нажатие не ставит второй отчёт, пока первый не выполнен"""
+        url = reverse("ordersapp:total_incomes")
+        self.client.post(url)
+        self.client.post(url)
+        self.assertEqual(Job.objects.filter(kind=Job.KIND_REVENUE_REPORT).count(), 1)
+        self.assertContains(self.client.get(url), "Отчёт о выручке считается")
+
+    def test_paid_orders_paginated(self):
+        """Страница загружает только одну страницу оплаченных заказов"""
+        Order.objects.bulk_create(
+            Order(table_number=4, status="Оплачено", total_price=1) for _ in range(60)
+        )
+        response = self.client.get(reverse("ordersapp:total_incomes"))
+        self.assertEqual(len(response.context["object_list"]), 50)
+        self.assertContains(response, "Страница 1 из 2")
+
     def test_only_paid_orders_are_counted(self):
         """Тест фильтрации: в список должны попадать только оплаченные заказы"""
         response = self.client.get(reverse("ordersapp:total_incomes"))
@@ -319,3 +403,1050 @@ class OrderTotalIncomesListViewTestCase(TestCase):
 
         # Проверяем, что на странице нет числа
         self.assertNotContains(response, "301.25")
+
+
+class OrderEventTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем блюдо и заказ в ожидании"""
+        cls.dish = Dish.objects.create(name="Блюдо для теста", price=10)
+        cls.order = Order.objects.create(table_number=1)
+        cls.order.items.set([cls.dish])
+
+    def test_create_writes_event(self):
+        """Создание заказа записывает первый переход статуса"""
+        events = OrderEvent.objects.filter(order=self.order)
+        self.assertEqual(events.count(), 1)
+        self.assertIsNone(events[0].from_status)
+        self.assertEqual(events[0].to_status, Order.STATUS_PENDING)
+
+    def test_update_view_writes_event(self):
+        """Смена статуса через OrderUpdateView попадает в журнал"""
+        self.client.post(
+            reverse("ordersapp:order_update", kwargs={"pk": self.order.pk}),
+            {"status": Order.STATUS_READY, "items": self.dish.pk},
+        )
+        self.assertTrue(
+            OrderEvent.objects.filter(
+                order=self.order,
+                from_status=Order.STATUS_PENDING,
+                to_status=Order.STATUS_READY,
+            ).exists()
+        )
+
+    def test_total_price_save_does_not_write_event(self):
+        """Пересчёт суммы без смены статуса не пишет событие"""
+        self.order.items.clear()
+        self.assertEqual(OrderEvent.objects.filter(order=self.order).count(), 1)
+
+    def test_bulk_update_status(self):
+        """Массовая смена статуса пишет события для каждого заказа"""
+        other = Order.objects.create(table_number=2)
+        changed = Order.objects.filter(pk__in=[self.order.pk, other.pk]).update_status(
+            Order.STATUS_PAID
+        )
+        self.assertEqual(changed, 2)
+        self.assertEqual(
+            OrderEvent.objects.filter(to_status=Order.STATUS_PAID).count(), 2
+        )
+
+    def test_events_survive_order_delete(self):
+        """Журнал сохраняется после удаления заказа"""
+        pk = self.order.pk
+        self.order.delete()
+        self.assertTrue(OrderEvent.objects.filter(order_id=pk).exists())
+
+
+class PreparationStatsTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем заказы, приготовленные за 60 и 180 секунд"""
+        cls.dish = Dish.objects.create(name="Блюдо для теста", price=10)
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        for seconds in (60, 180):
+            order = Order.objects.create(table_number=1)
+            order.items.set([cls.dish])
+            OrderEvent.objects.filter(order=order).update(created_at=start)
+            OrderEvent.objects.create(
+                order=order,
+                from_status=Order.STATUS_PENDING,
+                to_status=Order.STATUS_READY,
+                created_at=start + timedelta(seconds=seconds),
+            )
+        cls.start = start
+
+    def test_stats_by_dish(self):
+        """Среднее и перцентили по блюду считаются в SQL"""
+        response = self.client.get(reverse("ordersapp:order-preparation-stats"))
+        self.assertEqual(response.status_code, 200)
+        row = response.json()[0]
+        self.assertEqual(row["label"], "Блюдо для теста")
+        self.assertEqual(row["orders"], 2)
+        self.assertAlmostEqual(row["avg_seconds"], 120, places=1)
+        self.assertAlmostEqual(row["p50_seconds"], 60, places=1)
+        self.assertAlmostEqual(row["max_seconds"], 180, places=1)
+
+    def test_stats_by_hour_and_period(self):
+        """Группировка по часам и фильтр по периоду"""
+        response = self.client.get(
+            reverse("ordersapp:order-preparation-stats"),
+            {"group": "hour", "since": self.start.isoformat()},
+        )
+        self.assertEqual(response.json()[0]["group_key"], self.start.hour)
+        response = self.client.get(
+            reverse("ordersapp:order-preparation-stats"),
+            {"since": (self.start + timedelta(hours=1)).isoformat()},
+        )
+        self.assertEqual(response.json(), [])
+
+    def test_invalid_group(self):
+        """Неизвестная группировка возвращает 400"""
+        response = self.client.get(
+            reverse("ordersapp:order-preparation-stats"), {"group": "table"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_period(self):
+        """Несуществующая дата периода возвращает 400, а не 500"""
+        for value in ("вчера", "2024-13-01T00:00"):
+            response = self.client.get(
+                reverse("ordersapp:order-preparation-stats"), {"since": value}
+            )
+            self.assertEqual(response.status_code, 400)
+
+
+class OrderVersionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем блюдо и заказ"""
+        cls.dish = Dish.objects.create(name="Блюдо для теста", price=10)
+        cls.order = Order.objects.create(table_number=1)
+
+    def test_save_increments_version(self):
+        """Каждое сохранение увеличивает версию"""
+        order = Order.objects.get(pk=self.order.pk)
+        order.status = Order.STATUS_READY
+        order.save()
+        self.assertEqual(Order.objects.get(pk=order.pk).version, 2)
+
+    def test_stale_save_raises_conflict(self):
+        """Сохранение устаревшей копии не затирает чужие изменения"""
+        first = Order.objects.get(pk=self.order.pk)
+        second = Order.objects.get(pk=self.order.pk)
+        first.status = Order.STATUS_READY
+        first.save()
+        second.status = Order.STATUS_PAID
+        with self.assertRaises(OrderVersionConflict):
+            second.save()
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "Готово")
+
+    def test_items_change_increments_version(self):
+        """Пересчёт суммы при изменении блюд тоже меняет версию"""
+        stale = Order.objects.get(pk=self.order.pk)
+        self.order.items.add(self.dish)
+        self.assertEqual(self.order.total_price, 10)
+        stale.status = Order.STATUS_PAID
+        with self.assertRaises(OrderVersionConflict):
+            stale.save()
+
+    def test_update_view_stale_version(self):
+        """Форма с устаревшей версией возвращает ошибку вместо перезаписи"""
+        url = reverse("ordersapp:order_update", kwargs={"pk": self.order.pk})
+        Order.objects.filter(pk=self.order.pk).update(version=5)
+        response = self.client.post(
+            url, {"status": "Готово", "items": self.dish.pk, "version": 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Заказ уже изменён другим пользователем")
+        self.assertEqual(response.context["form"]["version"].value(), 5)
+        self.assertEqual(Order.objects.get(pk=self.order.pk).status, "В ожидании")
+
+    def test_api_etag_and_if_match(self):
+        """API отдаёт ETag и отвечает 409 на устаревший If-Match"""
+        url = reverse("ordersapp:order-detail", kwargs={"pk": self.order.pk})
+        response = self.client.get(url)
+        self.assertEqual(response["ETag"], '"1"')
+        payload = {"table_number": 1, "items": [self.dish.pk], "status": "Готово"}
+        response = self.client.put(
+            url, payload, content_type="application/json", HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.put(
+            url, payload, content_type="application/json", HTTP_IF_MATCH='"1"'
+        )
+        self.assertEqual(response.status_code, 409)
+
+
+class OrderLostUpdateTestCase(TransactionTestCase):
+    def test_concurrent_updates(self):
+        """
+        Два официанта одновременно читают заказ и сохраняют разные статусы:
+        одно сохранение проходит, второе получает конфликт (потерянного обновления нет)
+        """
+        order = Order.objects.create(table_number=1)
+        loaded = threading.Barrier(2)
+        results = {}
+
+        def waiter(new_status):
+            try:
+                copy = Order.objects.get(pk=order.pk)
+                loaded.wait()  # оба прочитали одну и ту же версию
+                copy.status = new_status
+                try:
+                    copy.save()
+                    results[new_status] = "saved"
+                except OrderVersionConflict:
+                    results[new_status] = "conflict"
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=waiter, args=(new_status,))
+            for new_status in (Order.STATUS_READY, Order.STATUS_PAID)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(results.values()), ["conflict", "saved"])
+        saved = [key for key, value in results.items() if value == "saved"][0]
+        order.refresh_from_db()
+        self.assertEqual(order.status, saved)
+        self.assertEqual(order.version, 2)
+
+
+class OrderIdempotencyTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем блюдо для заказов"""
+        cls.dish = Dish.objects.create(name="Блюдо для теста", price=10)
+        cls.url = reverse("ordersapp:order-list")
+
+    def post(self, key, table_number=1):
+        return self.client.post(
+            self.url,
+            {"table_number": table_number, "items": [self.dish.pk]},
+            content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_replay_returns_original_response(self):
+        """Повтор запроса с тем же ключом не создаёт второй заказ"""
+        first = self.post("tablet-1-0001")
+        second = self.post("tablet-1-0001")
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_key_reused_with_other_body(self):
+        """Тот же ключ с другим телом запроса - ошибка 422"""
+        self.post("tablet-1-0002")
+        response = self.post("tablet-1-0002", table_number=2)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_invalid_request_is_not_stored(self):
+        """Ответ с ошибкой валидации не сохраняется, повтор можно исправить"""
+        response = self.post("tablet-1-0003", table_number=42)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.filter(key="tablet-1-0003").exists())
+
+    def test_expired_keys_are_purged(self):
+        """Команда очистки удаляет устаревшие ключи, и ключ снова можно использовать"""
+        self.post("tablet-1-0004")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=30))
+        call_command("purge_idempotency_keys", stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+        self.assertEqual(self.post("tablet-1-0004").status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+
+class OrderConcurrentIdempotencyTestCase(TransactionTestCase):
+    def test_concurrent_duplicates(self):
+        """
+        Два одновременных запроса с одним ключом создают один заказ,
+        и оба получают один и тот же ответ
+        """
+        dish = Dish.objects.create(name="Блюдо для теста", price=10)
+        start = threading.Barrier(3)
+        responses = []
+
+        def tablet():
+            try:
+                start.wait()
+                responses.append(
+                    self.client_class().post(
+                        reverse("ordersapp:order-list"),
+                        {"table_number": 1, "items": [dish.pk]},
+                        content_type="application/json",
+                        HTTP_IDEMPOTENCY_KEY="tablet-2-0001",
+                    )
+                )
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=tablet) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([r.status_code for r in responses], [201, 201, 201])
+        self.assertEqual(len({r.json()["pk"] for r in responses}), 1)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+class OrderListCacheTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем заказы с разными статусами"""
+        Order.objects.create(table_number=1, status="Оплачено", total_price=100)
+        Order.objects.create(table_number=2, status="Готово", total_price=50)
+        cls.url = reverse("ordersapp:order-list")
+
+    def setUp(self):
+        orders_list_cache.clear()
+
+    def test_bump_waits_for_write_database(self):
+        """Поколение кэша растёт после коммита той БД, куда шла запись"""
+        with mock.patch("ordersapp.cache.transaction.on_commit") as on_commit:
+            bump_orders_generation("cafe_north")
+            Order.objects.filter(table_number=1).update_status("Готово")
+        self.assertEqual(
+            [call.kwargs["using"] for call in on_commit.call_args_list],
+            ["cafe_north", "default"],
+        )
+
+    def test_evicted_generation_is_new(self):
+        """Вытесненное из кэша поколение не совпадает с прежним"""
+        generation = orders_generation()
+        cache.delete(GENERATION_KEY)
+        self.assertNotEqual(orders_generation(), generation)
+
+    def test_same_filters_hit_cache(self):
+        """Одинаковые фильтры в разном порядке берутся из кэша"""
+        first = self.client.get(
+            self.url, {"status": "Оплачено", "ordering": "-total_price"}
+        )
+        with self.assertNumQueries(0):
+            second = self.client.get(
+                f"{self.url}?ordering=-total_price&status=Оплачено&search="
+            )
+        self.assertEqual(first.json(), second.json())
+        stats = self.client.get(reverse("ordersapp:order-cache-stats")).json()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_ratio"], 0.5)
+
+    def test_order_change_invalidates(self):
+        """Изменение заказа сбрасывает закэшированные списки"""
+        self.client.get(self.url, {"status": "Оплачено"})
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(table_number=3, status="Оплачено")
+        response = self.client.get(self.url, {"status": "Оплачено"})
+        self.assertEqual(response.json()["count"], 2)
+        self.assertEqual(orders_list_cache.stats()["invalidations"], 1)
+
+    def test_lru_eviction(self):
+        """При превышении размера вытесняется давно не использованная запись"""
+        orders_list_cache.max_entries = 2
+        self.addCleanup(setattr, orders_list_cache, "max_entries", 256)
+        for table in (1, 2, 3):
+            self.client.get(self.url, {"table_number": table})
+        stats = orders_list_cache.stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertEqual(stats["evictions"], 1)
+
+    def test_disabled_without_shared_cache(self):
+        """С размером 0 (продакшен без общего кэша) кэш списка выключен"""
+        orders_list_cache.max_entries = 0
+        self.addCleanup(setattr, orders_list_cache, "max_entries", 256)
+        for _ in range(2):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        stats = orders_list_cache.stats()
+        self.assertFalse(stats["enabled"])
+        self.assertEqual((stats["entries"], stats["hits"]), (0, 0))
+
+
+class TableStateTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем блюда и заказ на 7-м столе"""
+        cls.soup = Dish.objects.create(name="Суп", price=150)
+        cls.tea = Dish.objects.create(name="Чай", price=50)
+        cls.order = Order.objects.create(table_number=7)
+        cls.order.items.set([cls.soup, cls.tea])
+
+    def setUp(self):
+        """Кафе запроса берётся из кэша: прогреваем его"""
+        get_cafe(settings.DEFAULT_CAFE)
+
+    def state(self, table_number):
+        return TableState.objects.get(table_number=table_number)
+
+    def test_create_and_items_update_state(self):
+        """Создание заказа и изменение блюд обновляют сумму стола"""
+        state = self.state(7)
+        self.assertEqual(state.open_orders, 1)
+        self.assertEqual(state.unpaid_total, 200)
+        self.assertIsNotNone(state.last_activity)
+
+    def test_paid_order_closes_bill(self):
+        """Оплаченный заказ не входит в счёт стола"""
+        self.order.status = Order.STATUS_PAID
+        self.order.save()
+        state = self.state(7)
+        self.assertEqual(state.open_orders, 0)
+        self.assertEqual(state.unpaid_total, 0)
+
+    def test_bulk_status_and_delete(self):
+        """Массовая смена статуса и удаление заказа пересчитывают стол"""
+        other = Order.objects.create(table_number=7)
+        other.items.set([self.tea])
+        self.assertEqual(self.state(7).unpaid_total, 250)
+        Order.objects.filter(pk=self.order.pk).update_status(Order.STATUS_PAID)
+        self.assertEqual(self.state(7).unpaid_total, 50)
+        other.delete()
+        self.assertEqual(self.state(7).open_orders, 0)
+
+    def test_move_to_other_table(self):
+        """Перенос заказа на другой стол пересчитывает оба стола"""
+        self.order.table_number = 3
+        self.order.save()
+        self.assertEqual(self.state(7).unpaid_total, 0)
+        self.assertEqual(self.state(3).unpaid_total, 200)
+
+    def test_api_single_table(self):
+        """API отдаёт состояние одного стола одним запросом по ключу"""
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("ordersapp:tablestate-detail", kwargs={"pk": 7})
+            )
+        self.assertEqual(response.json()["unpaid_total"], "200.00")
+        self.assertEqual(response.json()["open_orders"], 1)
+
+    def test_floor_plan(self):
+        """План зала показывает все девять столов"""
+        response = self.client.get(reverse("ordersapp:tables_floor"))
+        self.assertEqual(len(response.context["tables"]), 9)
+        self.assertTemplateUsed(response, "ordersapp/tables_floor.html")
+
+
+class ArchiveOrdersTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем старый и свежий оплаченные заказы и заказ в ожидании"""
+        cls.dish = Dish.objects.create(name="Суп", price=150)
+        cls.old, cls.fresh, cls.pending = [
+            Order.objects.create(table_number=table) for table in (1, 2, 3)
+        ]
+        for order in (cls.old, cls.fresh, cls.pending):
+            order.items.set([cls.dish])
+        Order.objects.filter(pk__in=[cls.old.pk, cls.fresh.pk]).update_status(
+            Order.STATUS_PAID
+        )
+        OrderEvent.objects.filter(order=cls.old, to_status=Order.STATUS_PAID).update(
+            created_at=timezone.now() - timedelta(days=40)
+        )
+
+    def archive(self, *args):
+        call_command("archive_orders", *args, stdout=StringIO())
+
+    def test_archive_old_paid_orders(self):
+        """В архив переносятся только оплаченные заказы старше порога"""
+        self.archive("--older-than-days", "30", "--batch-size", "1")
+        self.assertFalse(Order.objects.filter(pk=self.old.pk).exists())
+        archived = ArchivedOrder.objects.get(pk=self.old.pk)
+        self.assertEqual(archived.items, [[self.dish.pk, "150.00"]])
+        self.assertEqual(archived.total_price, 150)
+        self.assertIsNotNone(archived.paid_at)
+        self.assertTrue(Order.objects.filter(pk=self.fresh.pk).exists())
+        self.assertTrue(Order.objects.filter(pk=self.pending.pk).exists())
+
+    def test_dry_run(self):
+        """Пробный запуск ничего не переносит"""
+        self.archive("--dry-run")
+        self.assertFalse(ArchivedOrder.objects.exists())
+
+    def test_revenue_and_export_include_archive(self):
+        """Выручка и выгрузка видят горячие и архивные заказы"""
+        self.archive()
+        self.assertEqual(paid_revenue_total(), 300)
+        exported = {order["pk"]: order for order in iter_paid_orders()}
+        self.assertEqual(sorted(exported), sorted([self.old.pk, self.fresh.pk]))
+        self.assertEqual(exported[self.old.pk]["items"][0]["name"], "Суп")
+        url = reverse("ordersapp:total_incomes")
+        with tempfile.TemporaryDirectory() as results:
+            with override_settings(JOBS_RESULT_DIR=results):
+                self.client.post(url)
+                for pk in Job.objects.claim(5):
+                    run_job(pk)
+                response = self.client.get(url)
+        self.assertEqual(response.context["total"], "300.00")
+
+
+class IndexAuditTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем заказы на двух столах, часть из них оплачена"""
+        dish = Dish.objects.create(name="Чай", price=50)
+        for table in (1, 7, 7):
+            Order.objects.create(table_number=table).items.set([dish])
+        Order.objects.filter(table_number=1).update_status(Order.STATUS_PAID)
+
+    def test_open_orders_use_partial_index(self):
+        """Неоплаченные заказы стола читаются по частичному индексу"""
+        sql, params = (
+            Order.objects.filter(table_number=7)
+            .exclude(status=Order.STATUS_PAID)
+            .values("total_price")
+            .query.sql_with_params()
+        )
+        with connection.cursor() as cursor:
+            sql = connection.ops.last_executed_query(cursor, sql, params)
+        self.assertIn("order_open_idx", " ".join(explain(sql)))
+
+    def test_hot_scenarios_without_full_scans(self):
+        """Запросы по столу, создание и оплата заказа не сканируют таблицу"""
+        checked, findings = audit(ignore_tables=("ordersapp_dish",))
+        self.assertGreater(checked, 0)
+        scanned = {f.scenario for f in findings if f.kind == "scan"}
+        for scenario in (
+            "API: активные заказы стола",
+            "API: создание заказа",
+            "API: оплата",
+        ):
+            self.assertNotIn(scenario, scanned)
+
+    def test_audit_rolls_back(self):
+        """Аудит не оставляет созданных заказов"""
+        out = StringIO()
+        call_command("audit_indexes", stdout=out)
+        self.assertIn("Проверено запросов", out.getvalue())
+        self.assertEqual(Order.objects.count(), 3)
+
+
+class FastSerializationTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем заказы с блюдами и без"""
+        dishes = [Dish.objects.create(name=f"Блюдо {i}", price=i + 0.5) for i in (1, 2)]
+        for table, items in ((1, dishes), (2, dishes[:1]), (3, [])):
+            Order.objects.create(table_number=table).items.set(items)
+
+    def test_same_data_as_model_serializer(self):
+        """Быстрая сериализация совпадает с OrderSerializer"""
+        orders = Order.objects.order_by("pk")
+        self.assertEqual(
+            serialize_orders(orders.values(*ORDER_VALUES)),
+            OrderSerializer(orders, many=True).data,
+        )
+
+    def test_renderer_matches_drf(self):
+        """FastJSONRenderer выдаёт те же байты, что и JSONRenderer"""
+        data = {
+            "orders": serialize_orders(Order.objects.values(*ORDER_VALUES)),
+            "created": timezone.now(),
+            "total": Decimal("10.50"),
+            "text": "Оплачено",
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_invalid_json_body(self):
+        """Некорректный JSON в теле запроса - ответ 400"""
+        response = self.client.post(
+            reverse("ordersapp:order-list"), "{", content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CompressionTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем заказы, чтобы страница списка была больше порога сжатия"""
+        dish = Dish.objects.create(name="Борщ", price=250)
+        for table in range(1, 10):
+            Order.objects.create(table_number=table).items.set([dish])
+
+    def test_gzip_html(self):
+        """Большая HTML-страница сжимается gzip"""
+        plain = self.client.get(reverse("ordersapp:orders_list"))
+        response = self.client.get(
+            reverse("ordersapp:orders_list"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    @skipIf(brotli is None, "brotli не установлен")
+    def test_brotli_preferred(self):
+        """При поддержке brotli клиентом ответ сжимается brotli"""
+        plain = self.client.get(reverse("ordersapp:orders_list"))
+        response = self.client.get(
+            reverse("ordersapp:orders_list"), HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertTrue(brotli.decompress(response.content).startswith(plain.content))
+
+    @skipIf(brotli is None, "brotli не установлен")
+    def test_brotli_html_breach_padding(self):
+        """HTML дополняется случайным комментарием: длина сжатого ответа меняется"""
+        plain = self.client.get(reverse("ordersapp:orders_list")).content
+        sizes = set()
+        for _ in range(10):
+            response = self.client.get(
+                reverse("ordersapp:orders_list"), HTTP_ACCEPT_ENCODING="br"
+            )
+            content = brotli.decompress(response.content)
+            self.assertRegex(content[len(plain) :], rb"^<!-- [0-9a-f]* -->$")
+            sizes.add(len(response.content))
+        self.assertGreater(len(sizes), 1)
+
+    def test_small_response_not_compressed(self):
+        """Ответы короче порога отдаются без сжатия"""
+        response = self.client.get(
+            reverse("ordersapp:tablestate-detail", kwargs={"pk": 1}),
+            HTTP_ACCEPT_ENCODING="gzip, br",
+        )
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+
+class JobTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем два оплаченных заказа и один в ожидании"""
+        dish = Dish.objects.create(name="Кофе", price=120)
+        for table in (1, 1, 2):
+            Order.objects.create(table_number=table).items.set([dish])
+        Order.objects.filter(table_number=1).update_status(Order.STATUS_PAID)
+
+    def setUp(self) -> None:
+        results = tempfile.TemporaryDirectory()
+        self.addCleanup(results.cleanup)
+        override = override_settings(JOBS_RESULT_DIR=results.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def submit(self, kind):
+        response = self.client.post(reverse("ordersapp:job-list"), {"kind": kind})
+        self.assertEqual(response.status_code, 202)
+        return response.json()["pk"]
+
+    def test_claim_once(self):
+        """Задачу из очереди получает только один обработчик"""
+        pk = self.submit(Job.KIND_REVENUE_REPORT)
+        self.assertEqual(Job.objects.claim(5), [pk])
+        self.assertEqual(Job.objects.claim(5), [])
+        self.assertEqual(Job.objects.get(pk=pk).status, Job.STATUS_RUNNING)
+
+    def test_revenue_report_download(self):
+        """Отчёт о выручке выполняется и скачивается после готовности"""
+        pk = self.submit(Job.KIND_REVENUE_REPORT)
+        download = reverse("ordersapp:job-download", kwargs={"pk": pk})
+        self.assertEqual(self.client.get(download).status_code, 409)
+        Job.objects.claim(1)
+        self.assertEqual(run_job(pk), Job.STATUS_DONE)
+        status = self.client.get(reverse("ordersapp:job-detail", kwargs={"pk": pk}))
+        self.assertEqual(status.json()["progress"], 100)
+        response = self.client.get(download)
+        self.assertEqual(response.status_code, 200)
+        content = b"".join(response.streaming_content).decode()
+        self.assertIn("1,2,240.00", content)
+        self.assertIn("Итого,2,240.00", content)
+
+    def test_orders_export(self):
+        """Выгрузка содержит все оплаченные заказы с блюдами"""
+        pk = self.submit(Job.KIND_ORDERS_EXPORT)
+        Job.objects.claim(1)
+        run_job(pk)
+        lines = Job.objects.get(pk=pk).result_path.read_text().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("Кофе (120.00)", lines[1])
+
+    def test_failed_job(self):
+        """Ошибка задачи сохраняется в статусе, файл не остаётся"""
+        pk = self.submit(Job.KIND_ORDERS_EXPORT)
+        Job.objects.claim(1)
+        broken = mock.Mock(side_effect=RuntimeError("диск заполнен"))
+        with mock.patch.dict(HANDLERS, {Job.KIND_ORDERS_EXPORT: broken}):
+            self.assertEqual(run_job(pk), Job.STATUS_FAILED)
+        job = Job.objects.get(pk=pk)
+        self.assertIn("диск заполнен", job.error)
+        self.assertIsNone(job.result_path)
+
+
+class CafeTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем второе кафе с двумя столами, его блюдо и заказ"""
+        cls.main = Cafe.objects.get(slug="main")
+        cls.north = Cafe.objects.create(name="Север", slug="north", tables=[10, 11])
+        cls.main_dish = Dish.objects.create(name="Суп", price=150)
+        cls.north_dish = Dish.objects.create(cafe=cls.north, name="Уха", price=300)
+        cls.main_order = Order.objects.create(table_number=1)
+        cls.north_order = Order.objects.create(cafe=cls.north, table_number=10)
+        cls.north_order.items.set([cls.north_dish])
+        cls.url = reverse("ordersapp:order-list")
+
+    def setUp(self):
+        cache.clear()  # кафе и поколение заказов из других тестов
+        orders_list_cache.clear()
+
+    def test_idempotency_key_per_cafe(self):
+        """Одинаковый Idempotency-Key в разных кафе создаёт заказ в каждом"""
+        for cafe, dish, table in (
+            (self.main, self.main_dish, 1),
+            (self.north, self.north_dish, 10),
+        ):
+            for _ in range(2):
+                response = self.client.post(
+                    self.url,
+                    {"table_number": table, "items": [dish.pk]},
+                    content_type="application/json",
+                    HTTP_IDEMPOTENCY_KEY="tablet-1-0001",
+                    HTTP_X_CAFE=cafe.slug,
+                )
+                self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json()["table_number"], table)
+        self.assertEqual(Order.objects.filter(cafe=self.main).count(), 2)
+        self.assertEqual(Order.objects.filter(cafe=self.north).count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_api_scoped_by_cafe(self):
+        """API показывает только заказы кафе из заголовка X-Cafe"""
+        main = self.client.get(self.url).json()["results"]
+        north = self.client.get(self.url, HTTP_X_CAFE="north").json()["results"]
+        self.assertEqual([order["pk"] for order in main], [self.main_order.pk])
+        self.assertEqual([order["pk"] for order in north], [self.north_order.pk])
+        response = self.client.get(
+            reverse("ordersapp:order-detail", kwargs={"pk": self.north_order.pk})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_cafe_from_query_is_remembered(self):
+        """Кафе, выбранное параметром ?cafe=, запоминается в сессии"""
+        self.client.get(reverse("ordersapp:orders_list"), {"cafe": "north"})
+        response = self.client.get(reverse("ordersapp:orders_list"))
+        self.assertEqual(list(response.context["orders"]), [self.north_order])
+        response = self.client.get(reverse("ordersapp:tables_floor"))
+        self.assertEqual(
+            [table.table_number for table in response.context["tables"]], [10, 11]
+        )
+        self.assertEqual(response.context["tables"][0].unpaid_total, 300)
+
+    def test_unknown_cafe(self):
+        """Неизвестное кафе - 404"""
+        response = self.client.get(self.url, HTTP_X_CAFE="nowhere")
+        self.assertEqual(response.status_code, 404)
+
+    def test_create_uses_cafe_tables_and_menu(self):
+        """Стол и блюда нового заказа проверяются по раскладке и меню кафе"""
+
+        def post(table_number, dish):
+            return self.client.post(
+                self.url,
+                {"table_number": table_number, "items": [dish.pk]},
+                content_type="application/json",
+                HTTP_X_CAFE="north",
+            )
+
+        self.assertEqual(post(1, self.north_dish).status_code, 400)
+        self.assertEqual(post(11, self.main_dish).status_code, 400)
+        response = post(11, self.north_dish)
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.json()["pk"])
+        self.assertEqual(order.cafe, self.north)
+        self.assertEqual(order.events.get().cafe_id, self.north.pk)
+        state = TableState.objects.get(cafe=self.north, table_number=11)
+        self.assertEqual(state.unpaid_total, 300)
+
+    def test_layout_change_syncs_tables(self):
+        """Изменение раскладки кафе добавляет и убирает столы"""
+        self.north.tables = [11, 12]
+        self.north.save()
+        tables = TableState.objects.filter(cafe=self.north)
+        self.assertEqual(
+            sorted(tables.values_list("table_number", flat=True)), [11, 12]
+        )
+        self.assertEqual(TableState.objects.filter(cafe=self.main).count(), 9)
+        with self.assertRaises(ValidationError):
+            Cafe(name="Юг", slug="south", tables=[1, 1]).full_clean()
+        with self.assertRaises(ValidationError):
+            Cafe(name="Юг", slug="south", database="missing").full_clean()
+
+    def test_router(self):
+        """Данные кафе с отдельной БД читаются и пишутся в его БД"""
+        router = CafeRouter()
+        remote = Cafe(pk=99, slug="remote", database="cafe_remote")
+        self.assertIsNone(router.db_for_write(Order))
+        with using_cafe(remote):
+            self.assertEqual(router.db_for_write(Order), "cafe_remote")
+            self.assertEqual(router.db_for_read(Order.items.through), "cafe_remote")
+            self.assertIsNone(router.db_for_read(Job))
+            self.assertIsNone(router.db_for_read(Cafe))
+            # прочитанный объект остаётся в своей БД
+            self.assertEqual(
+                router.db_for_write(Order, instance=self.main_order), "default"
+            )
+            self.assertEqual(Order().cafe_id, remote.pk)
+        self.assertEqual(router.db_for_write(Order, instance=remote), "cafe_remote")
+
+
+class MaintenanceTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем заказ с двумя блюдами и оплаченный заказ"""
+        soup = Dish.objects.create(name="Суп", price=150)
+        tea = Dish.objects.create(name="Чай", price=50)
+        cls.order = Order.objects.create(table_number=4)
+        cls.order.items.set([soup, tea])
+        cls.paid = Order.objects.create(table_number=5)
+        cls.paid.items.set([tea])
+        Order.objects.filter(pk=cls.paid.pk).update_status(Order.STATUS_PAID)
+        # update() не вызывает сигнал пересчёта: суммы расходятся с блюдами
+        Order.objects.update(total_price=1)
+
+    def maintain(self, *args):
+        out = StringIO()
+        call_command("cafe_maintenance", *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_reports_drift(self):
+        """Пробный запуск находит расхождение и ничего не меняет"""
+        out = self.maintain("--dry-run")
+        self.assertIn("integrity", out)
+        self.assertIn("расхождений сумм: 1, поправка 199.00 руб", out)
+        self.assertNotIn("analyze", out)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.total_price, 1)
+
+    def test_reconcile_fixes_totals(self):
+        """Сверка исправляет сумму, версию и счёт стола, оплаченные не трогает"""
+        version = Order.objects.get(pk=self.order.pk).version
+        out = self.maintain()
+        self.assertIn("исправлено", out)
+        self.assertIn("ANALYZE", out)
+        order = Order.objects.get(pk=self.order.pk)
+        self.assertEqual(order.total_price, 200)
+        self.assertEqual(order.version, version + 1)
+        self.assertEqual(TableState.objects.get(table_number=4).unpaid_total, 200)
+        self.assertEqual(Order.objects.get(pk=self.paid.pk).total_price, 1)
+        self.assertIn("суммы заказов совпадают", self.maintain("--skip", "vacuum"))
+
+    def test_include_paid(self):
+        """С --include-paid сверяются и оплаченные заказы"""
+        self.maintain("--include-paid", "--skip", "analyze")
+        self.assertEqual(Order.objects.get(pk=self.paid.pk).total_price, 50)
+
+
+class ReceiptTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем два открытых заказа на 7-м столе и оплаченный заказ"""
+        cls.soup = Dish.objects.create(name="Суп", price=150)
+        cls.tea = Dish.objects.create(name="Чай", price=50)
+        cls.order = Order.objects.create(table_number=7)
+        cls.order.items.set([cls.soup, cls.tea])
+        cls.other = Order.objects.create(table_number=7)
+        cls.other.items.set([cls.tea])
+        cls.paid = Order.objects.create(table_number=7)
+        cls.paid.items.set([cls.soup])
+        Order.objects.filter(pk=cls.paid.pk).update_status(Order.STATUS_PAID)
+
+    def setUp(self):
+        """Чеки прошлых тестов не должны попасть в кэш этого"""
+        cache.clear()
+        get_cafe(settings.DEFAULT_CAFE)
+
+    def receipt(self, name, pk, kind="text"):
+        return self.client.get(
+            reverse(f"ordersapp:{name}-receipt", kwargs={"pk": pk}), {"type": kind}
+        )
+
+    def test_order_receipt_cached_by_version(self):
+        """Повторная печать берёт чек из кэша, изменение заказа - новый чек"""
+        response = self.receipt("order", self.order.pk)
+        self.assertEqual(response["Content-Type"], "text/plain; charset=utf-8")
+        text = response.content.decode()
+        self.assertIn(f"Заказ № {self.order.pk}", text)
+        self.assertIn("Суп", text)
+        self.assertIn("200.00", text)
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.receipt("order", self.order.pk).content, text.encode()
+            )
+        self.order.items.remove(self.tea)
+        self.assertIn("150.00", self.receipt("order", self.order.pk).content.decode())
+        self.assertNotIn("Чай", self.receipt("order", self.order.pk).content.decode())
+
+    def test_dish_rename_invalidates_receipt(self):
+        """Переименование блюда не меняет версию заказа, но меняет чек"""
+        self.assertIn("Суп", self.receipt("order", self.order.pk).content.decode())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.soup.name = "Борщ"
+            self.soup.save()
+        text = self.receipt("order", self.order.pk).content.decode()
+        self.assertIn("Борщ", text)
+        self.assertNotIn("Суп", text)
+
+    def test_table_receipt(self):
+        """Счёт стола - все неоплаченные заказы стола"""
+        text = self.receipt("tablestate", 7).content.decode()
+        self.assertIn("Счёт стола 7", text)
+        self.assertIn(f"Заказ № {self.other.pk}", text)
+        self.assertNotIn(f"Заказ № {self.paid.pk}", text)
+        self.assertIn("250.00", text)
+        self.assertEqual(self.receipt("tablestate", 5).status_code, 404)
+
+    def test_escpos_and_html(self):
+        """Чек в командах ESC/POS (CP866) и в HTML"""
+        content = self.receipt("order", self.order.pk, "escpos").content
+        self.assertTrue(content.startswith(ESC_INIT))
+        self.assertTrue(content.endswith(ESC_CUT))
+        self.assertIn("Суп".encode("cp866"), content)
+        response = self.receipt("tablestate", 7, "html")
+        self.assertEqual(response["Content-Type"], "text/html; charset=utf-8")
+        self.assertContains(response, "250.00 руб")
+        self.assertEqual(self.receipt("order", self.order.pk, "pdf").status_code, 400)
+
+    def test_shift_receipts_command(self):
+        """Команда печатает чеки заказов, оплаченных за смену"""
+        with tempfile.TemporaryDirectory() as folder:
+            path = f"{folder}/shift.txt"
+            out = StringIO()
+            call_command(
+                "render_receipts", "--output", path, "--chunk-size", "1", stdout=out
+            )
+            self.assertIn("чеков: 1", out.getvalue())
+            with open(path, encoding="utf-8") as file:
+                self.assertIn(f"Заказ № {self.paid.pk}", file.read())
+            since = (timezone.now() + timedelta(hours=1)).isoformat()
+            call_command(
+                "render_receipts", "--output", path, "--since", since, stdout=out
+            )
+            self.assertIn("чеков: 0", out.getvalue())
+            with self.assertRaisesMessage(CommandError, "--until"):
+                call_command("render_receipts", "--until", "2025-13-01T10:00")
+
+
+class PriceHistoryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        """Создаем блюда и вчерашний заказ, затем повышаем цену супа"""
+        cls.soup = Dish.objects.create(name="Суп", price=150)
+        cls.tea = Dish.objects.create(name="Чай", price=50)
+        DishPrice.objects.update(effective_from=timezone.now() - timedelta(days=2))
+        cls.old = Order.objects.create(
+            table_number=1, created_at=timezone.now() - timedelta(days=1)
+        )
+        cls.old.items.set([cls.soup])
+        cls.soup.price = 200
+        cls.soup.save()
+
+    def test_price_change_recorded_once(self):
+        """Изменение цены пишется в историю, сохранение без изменения - нет"""
+        self.soup.save()
+        self.tea.save(update_fields=["name"])
+        self.assertEqual(
+            list(self.soup.prices.order_by("pk").values_list("price", flat=True)),
+            [150, 200],
+        )
+
+    def test_old_order_keeps_prices(self):
+        """Пересчёт старого заказа берёт цены на момент его создания"""
+        self.old.items.add(self.tea)
+        self.old.refresh_from_db()
+        self.assertEqual(self.old.total_price, 200)
+        new = Order.objects.create(table_number=2)
+        new.items.set([self.soup, self.tea])
+        new.refresh_from_db()
+        self.assertEqual(new.total_price, 250)
+        # сверка в БД (items_total) считает так же, как индекс цен
+        out = StringIO()
+        call_command("cafe_maintenance", "--dry-run", "--skip", "integrity", stdout=out)
+        self.assertIn("суммы заказов совпадают", out.getvalue())
+
+    def test_receipt_and_export_use_order_prices(self):
+        """Чек и выгрузка показывают цены на момент создания заказа"""
+        get_cafe(settings.DEFAULT_CAFE)
+        response = self.client.get(
+            reverse("ordersapp:order-receipt", kwargs={"pk": self.old.pk})
+        )
+        self.assertIn("150.00", response.content.decode())
+        self.assertNotIn("200.00", response.content.decode())
+        Order.objects.filter(pk=self.old.pk).update_status(Order.STATUS_PAID)
+        exported = {order["pk"]: order for order in iter_paid_orders()}
+        self.assertEqual(exported[self.old.pk]["items"][0]["price"], 150)
+
+    def test_price_book_lookup(self):
+        """Индекс цен: двоичный поиск по времени, до истории - текущая цена"""
+        now = timezone.now()
+        book = PriceBook(
+            [
+                (1, now - timedelta(days=2), Decimal("10")),
+                (1, now - timedelta(days=1), Decimal("12")),
+                (1, now + timedelta(days=1), Decimal("15")),
+            ],
+            {1: Decimal("11"), 2: Decimal("7")},
+        )
+        self.assertEqual(book.price(1, now - timedelta(days=3)), Decimal("11"))
+        self.assertEqual(book.price(1, now - timedelta(days=2)), Decimal("10"))
+        self.assertEqual(book.price(1, now), Decimal("12"))
+        self.assertEqual(book.price(1, now + timedelta(days=2)), Decimal("15"))
+        self.assertEqual(book.price(2, now), Decimal("7"))
+
+
+class ProductionSettingsTestCase(TestCase):
+    @staticmethod
+    def production_settings(expression, **env):
+        """
+        Значение выражения от настроек профиля продакшена в отдельном процессе:
+        настройки читают окружение при импорте
+        """
+        script = (
+            "import django; django.setup(); from django.conf import settings; "
+            f"print({expression})"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=settings.BASE_DIR,
+            env={
+                **os.environ,
+                "DJANGO_CACHE_BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                **env,
+                "DJANGO_SETTINGS_MODULE": "crm.settings_production",
+            },
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        return result.stdout.split()
+
+    def test_no_debug_toolbar_with_debug_env(self):
+        """Профиль продакшена без debug toolbar даже при DJANGO_DEBUG=1"""
+        self.assertEqual(
+            self.production_settings(
+                "'debug_toolbar' in settings.INSTALLED_APPS, "
+                "any('debug_toolbar' in m for m in settings.MIDDLEWARE), "
+                "settings.DEBUG_TOOLBAR_CONFIG['SHOW_TOOLBAR_CALLBACK'](None)",
+                DJANGO_DEBUG="1",
+            ),
+            ["False", "False", "False"],
+        )
+
+    def test_list_cache_needs_shared_cache(self):
+        """Кэш списка заказов включён только с общим бэкендом кэша"""
+        self.assertEqual(
+            self.production_settings("settings.ORDERS_LIST_CACHE_SIZE"), ["0"]
+        )
+        with tempfile.TemporaryDirectory() as folder:
+            size = self.production_settings(
+                "settings.ORDERS_LIST_CACHE_SIZE",
+                DJANGO_CACHE_BACKEND="django.core.cache.backends.filebased.FileBasedCache",
+                DJANGO_CACHE_LOCATION=folder,
+                DJANGO_ORDERS_LIST_CACHE_SIZE="256",
+            )
+        self.assertEqual(size, ["256"])
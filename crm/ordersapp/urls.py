@@ -6,6 +6,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     DishCreateView,
     DishListView,
+    JobViewSet,
     OrderCreateView,
     OrderDeleteView,
     OrderListView,
@@ -13,12 +14,16 @@ from .views import (
     OrderTotalIncomesListView,
     OrderUpdateView,
     OrderViewSet,
+    TableStateListView,
+    TableStateViewSet,
     order_index,
 )
 
 app_name: str = "ordersapp"
 routers: DefaultRouter = DefaultRouter()
 routers.register("orders", OrderViewSet)
+routers.register("tables", TableStateViewSet)
+routers.register("jobs", JobViewSet)
 
 urlpatterns: List[path] = [
     path("", order_index, name="index"),
@@ -31,4 +36,5 @@ urlpatterns: List[path] = [
     path("orders/<int:pk>/update/", OrderUpdateView.as_view(), name="order_update"),
     path("orders/search/", OrderSearchListView.as_view(), name="order_search"),
     path("orders/total/", OrderTotalIncomesListView.as_view(), name="total_incomes"),
+    path("tables/", TableStateListView.as_view(), name="tables_floor"),
 ]
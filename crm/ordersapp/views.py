@@ -1,11 +1,18 @@
+import hashlib
+import json
 import logging
+from decimal import Decimal
 from logging import Logger
-from typing import Any, List, Tuple, Type
+from typing import Any, List, Optional, Tuple, Type
 
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, router, transaction
 from django.db.models import Q, QuerySet
-from django.http import HttpRequest, HttpResponse
-from django.shortcuts import render
+from django.http import FileResponse, HttpRequest, HttpResponse
+from django.shortcuts import redirect, render
 from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.views.generic import (
     CreateView,
     DeleteView,
@@ -13,21 +20,85 @@ from django.views.generic import (
     UpdateView,
 )
 from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
 from rest_framework.filters import OrderingFilter, SearchFilter
-from rest_framework.viewsets import ModelViewSet
-
-from .models import Dish, Order
-from .serializers import OrderSerializer
+from rest_framework.mixins import CreateModelMixin
+from rest_framework.response import Response
+from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+
+from .cache import normalize_query, orders_generation, orders_list_cache
+from .forms import OrderCreateForm, OrderUpdateForm
+from .jobs import revenue_report_total, submit_revenue_report
+from .models import (
+    Dish,
+    IdempotencyKey,
+    Job,
+    Order,
+    OrderEvent,
+    OrderVersionConflict,
+    TableState,
+)
+from .receipts import RECEIPT_TYPES, cached_receipt
+from .reports import GROUPS, preparation_stats
+from .serializers import (
+    ORDER_VALUES,
+    JobSerializer,
+    OrderSerializer,
+    TableStateSerializer,
+    serialize_orders,
+)
 
 log: Logger = logging.getLogger(__name__)
 
 
-class OrderViewSet(ModelViewSet):
+class OrderConflict(APIException):
+    """
+    Ответ 409: заказ изменён другим пользователем
+    """
+
+    status_code: int = status.HTTP_409_CONFLICT
+    default_detail: str = "Заказ уже изменён другим пользователем, обновите данные."
+    default_code: str = "conflict"
+
+
+def receipt_response(
+    request: HttpRequest, orders: QuerySet, table: Optional[int] = None
+) -> HttpResponse:
+    """
+    Ответ с чеком заказов в формате из параметра ?type= (text по умолчанию,
+    escpos или html). Чек берётся из кэша по версиям заказов
+    :param orders: заказы чека
+    :param table: номер стола для счёта по всем его заказам
+    """
+    kind: str = request.query_params.get("type", "text")
+    if kind not in RECEIPT_TYPES:
+        raise ValidationError(
+            {"type": f"Допустимые значения: {', '.join(RECEIPT_TYPES)}"}
+        )
+    content: Optional[bytes] = cached_receipt(orders, request.cafe, kind, table)
+    if content is None:
+        raise NotFound("Нет заказов для чека.")
+    return HttpResponse(content, content_type=RECEIPT_TYPES[kind])
+
+
+class CafeScopedMixin:
+    """
+    Ограничивает выборку представления кафе запроса (request.cafe,
+    см. tenancy.CafeMiddleware): данные других кафе не видны и не изменяются
+    """
+
+    def get_queryset(self) -> QuerySet:
+        return super().get_queryset().filter(cafe=self.request.cafe)
+
+
+class OrderViewSet(CafeScopedMixin, ModelViewSet):
     """
     Набор представлений для действий над Order
     Полный CRUD для сущностей заказа
     Атрибуты:
-        - queryset: Запрос для выборки всех заказов из базы данных.
+        - queryset: Запрос для выборки заказов кафе из базы данных.
         - serializer_class: Сериализатор для обработки данных модели Order.
         - filter_backends: Набор фильтров (поиск, фильтрация, сортировка).
         - search_fields: Поля, доступные для поиска (по статусу заказа).
@@ -35,7 +106,8 @@ class OrderViewSet(ModelViewSet):
         - ordering_fields: Поля, доступные для сортировки (номер стола, общая стоимость, статус).
     """
 
-    queryset: QuerySet[Order] = Order.objects.all()
+    # явный порядок: стабильная пагинация, индекс стола/статуса отдаёт строки по pk
+    queryset: QuerySet[Order] = Order.objects.order_by("pk")
     serializer_class: Type[OrderSerializer] = OrderSerializer
     filter_backends: List[Type] = [
         SearchFilter,
@@ -54,21 +126,259 @@ class OrderViewSet(ModelViewSet):
     ]
 
     def list(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Список заказов с кэшированием страницы по набору фильтров.
+        Сериализация быстрая, через values() (см. serialize_orders).
+        Поколение читается до выборки: если заказ изменится во время
+        выборки, запись сразу окажется устаревшей.
+        """
         log.debug("Получение списка заказов")
-        return super().list(request, *args, **kwargs)
+        key = normalize_query(request)
+        generation: str = orders_generation()
+        data = orders_list_cache.get(key, generation)
+        if data is not None:
+            return Response(data)
+        # заказы читаются через values() и сериализуются без OrderSerializer:
+        # на больших страницах это основное время ответа
+        rows: QuerySet = self.filter_queryset(self.get_queryset()).values(*ORDER_VALUES)
+        page: Optional[List[dict]] = self.paginate_queryset(rows)
+        if page is not None:
+            response: Response = self.get_paginated_response(serialize_orders(page))
+        else:
+            response = Response(serialize_orders(rows))
+        orders_list_cache.set(key, generation, response.data)
+        return response
+
+    @action(detail=False, methods=["get"], url_path="cache-stats")
+    def cache_stats(self, request: HttpRequest) -> Response:
+        """
+        Статистика кэша списка заказов: записи, попадания, промахи, доля попаданий
+        """
+        return Response(orders_list_cache.stats())
 
     def create(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        log.info(f"Создание заказа: {request.data}")
-        return super().create(request, *args, **kwargs)
+        """
+        Создание заказа. С заголовком Idempotency-Key повтор запроса
+        возвращает сохранённый ответ первого запроса, не выполняя
+        повторно валидацию и создание заказа.
+        """
+        key: str = request.headers.get("Idempotency-Key", "").strip()
+        if not key:
+            log.info("Создание заказа: %s", request.data)
+            return super().create(request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field("key").max_length:
+            raise ValidationError({"Idempotency-Key": "Слишком длинный ключ"})
+
+        fingerprint: str = hashlib.sha256(
+            json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder).encode()
+        ).hexdigest()
+        stored: Optional[IdempotencyKey] = IdempotencyKey.objects.filter(
+            cafe=request.cafe, key=key
+        ).first()
+        if stored is not None and stored.is_expired():
+            stored.delete()  # ключ устарел, но ещё не удалён командой очистки
+            stored = None
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        log.info("Создание заказа (ключ %s): %s", key, request.data)
+        try:
+            # ключ хранится в default, заказ - в БД кафе
+            with transaction.atomic(), transaction.atomic(
+                using=router.db_for_write(Order)
+            ):
+                # ключ вставляется первым: параллельный дубликат ждёт
+                # окончания этой транзакции и получает IntegrityError
+                record: IdempotencyKey = IdempotencyKey.objects.create(
+                    cafe=request.cafe, key=key, fingerprint=fingerprint
+                )
+                response: Response = super().create(request, *args, **kwargs)
+                record.status_code = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=["status_code", "response_body"])
+                return response
+        except IntegrityError:
+            stored = IdempotencyKey.objects.filter(cafe=request.cafe, key=key).first()
+            if stored is None:
+                raise
+            return self._replay(stored, fingerprint)
+
+    def perform_create(self, serializer: OrderSerializer) -> None:
+        serializer.save(cafe=self.request.cafe)
+
+    def _replay(self, stored: IdempotencyKey, fingerprint: str) -> Response:
+        """
+        Ответ на повтор запроса с уже использованным Idempotency-Key
+        """
+        if stored.fingerprint != fingerprint:
+            return Response(
+                {"detail": "Idempotency-Key уже использован с другим телом запроса."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        log.info("Повтор создания заказа по ключу %s", stored.key)
+        return Response(
+            stored.response_body,
+            status=stored.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    def retrieve(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        response: Response = super().retrieve(request, *args, **kwargs)
+        response["ETag"] = f'"{response.data["version"]}"'
+        return response
 
     def update(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        log.info(f"Обновление заказа {kwargs.get('pk')}: {request.data}")
-        return super().update(request, *args, **kwargs)
+        log.info("Обновление заказа %s: %s", kwargs.get("pk"), request.data)
+        response: Response = super().update(request, *args, **kwargs)
+        response["ETag"] = f'"{response.data["version"]}"'
+        return response
+
+    def perform_update(self, serializer: OrderSerializer) -> None:
+        """
+        Сохраняет заказ с проверкой версии.
+        Ожидаемая версия берётся из заголовка If-Match (ETag из GET),
+        иначе - версия, прочитанная в начале запроса.
+        """
+        expected: Optional[int] = self._if_match_version()
+        if expected is not None:
+            serializer.instance.version = expected
+        try:
+            with transaction.atomic(using=router.db_for_write(Order)):
+                serializer.save()
+        except OrderVersionConflict as exc:
+            log.warning("Конфликт версий при обновлении заказа %s", exc.pk)
+            raise OrderConflict()
+
+    def _if_match_version(self) -> Optional[int]:
+        header: str = self.request.headers.get("If-Match", "").strip()
+        if not header or header == "*":
+            return None
+        tag: str = header.removeprefix("W/").strip('"')
+        if not tag.isdigit():
+            raise ValidationError({"If-Match": 'Ожидается ETag вида "<версия>"'})
+        return int(tag)
 
     def destroy(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        log.warning(f"Удаление заказа {kwargs.get('pk')}")
+        log.warning("Удаление заказа %s", kwargs.get("pk"))
         return super().destroy(request, *args, **kwargs)
 
+    @action(detail=True, methods=["get"])
+    def receipt(self, request: HttpRequest, pk: Optional[str] = None) -> HttpResponse:
+        """
+        Чек заказа для печати: GET /api/orders/<номер>/receipt/?type=text|escpos|html
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        return receipt_response(request, self.get_queryset().filter(pk=pk))
+
+    @action(detail=False, methods=["get"], url_path="preparation-stats")
+    def preparation_stats(self, request: HttpRequest) -> Response:
+        """
+        Время приготовления заказов (от "В ожидании" до "Готово") в секундах:
+        количество, среднее и перцентили p50/p90/p95.
+        Параметры запроса:
+            - group: "dish" (по блюдам, по умолчанию) или "hour" (по часам)
+            - since, until: период поступления заказов в формате ISO 8601
+        """
+        group: str = request.query_params.get("group", "dish")
+        if group not in GROUPS:
+            raise ValidationError(
+                {"group": f"Допустимые значения: {', '.join(GROUPS)}"}
+            )
+        period: dict = {}
+        for name in ("since", "until"):
+            value: str = request.query_params.get(name)
+            if value:
+                try:
+                    # ValueError - формат верный, но такой даты нет (13-й месяц)
+                    parsed = parse_datetime(value)
+                except ValueError:
+                    parsed = None
+                if parsed is None:
+                    raise ValidationError({name: "Ожидается дата и время в ISO 8601"})
+                if timezone.is_naive(parsed):
+                    parsed = timezone.make_aware(parsed)
+                period[name] = parsed
+        log.debug("Статистика приготовления: %s %s", group, period)
+        return Response(
+            preparation_stats(
+                group_by=group,
+                cafe_id=request.cafe.pk,
+                using=router.db_for_read(OrderEvent),
+                **period,
+            )
+        )
+
+
+class TableStateViewSet(CafeScopedMixin, ReadOnlyModelViewSet):
+    """
+    Текущее состояние столов кафе: открытые заказы, сумма к оплате,
+    последнее изменение. GET /api/tables/<номер>/ - чтение одной строки по ключу
+    """
+
+    queryset: QuerySet[TableState] = TableState.objects.order_by("table_number")
+    serializer_class: Type[TableStateSerializer] = TableStateSerializer
+    pagination_class = None
+    # стол ищется по номеру в кафе, адрес прежний: /api/tables/<номер>/
+    lookup_field: str = "table_number"
+    lookup_url_kwarg: str = "pk"
+
+    @action(detail=True, methods=["get"])
+    def receipt(self, request: HttpRequest, pk: Optional[str] = None) -> HttpResponse:
+        """
+        Счёт стола: все его неоплаченные заказы одним чеком,
+        GET /api/tables/<номер>/receipt/?type=text|escpos|html
+        """
+        if not str(pk).isdigit():
+            raise NotFound()
+        orders: QuerySet[Order] = Order.objects.filter(
+            cafe=request.cafe, table_number=pk
+        ).exclude(status=Order.STATUS_PAID)
+        return receipt_response(request, orders, table=int(pk))
+
+
+class JobViewSet(CafeScopedMixin, CreateModelMixin, ReadOnlyModelViewSet):
+    """
+    Фоновые задачи: отчёт о выручке и выгрузка оплаченных заказов.
+        - POST /api/jobs/ {"kind": "revenue_report"} - поставить в очередь (202)
+        - GET /api/jobs/<номер>/ - статус и прогресс в процентах
+        - GET /api/jobs/<номер>/download/ - файл результата
+    Выполняет задачи команда run_jobs
+    """
+
+    queryset: QuerySet[Job] = Job.objects.order_by("-pk")
+    serializer_class: Type[JobSerializer] = JobSerializer
+    filter_backends: List[Type] = [DjangoFilterBackend]
+    filterset_fields: List[str] = ["kind", "status"]
+
+    def create(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        response: Response = super().create(request, *args, **kwargs)
+        log.info("Фоновая задача %s поставлена в очередь", response.data["kind"])
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
+
+    def perform_create(self, serializer: JobSerializer) -> None:
+        serializer.save(cafe=self.request.cafe)
+
+    @action(detail=True, methods=["get"])
+    def download(self, request: HttpRequest, pk: Optional[str] = None) -> HttpResponse:
+        """
+        Файл результата задачи. Пока задача не выполнена - 409
+        """
+        job: Job = self.get_object()
+        path = job.result_path
+        if job.status != Job.STATUS_DONE or path is None or not path.exists():
+            return Response(
+                {"detail": "Результат ещё не готов.", "status": job.status},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return FileResponse(
+            path.open("rb"),
+            as_attachment=True,
+            filename=job.result_file,
+            content_type="text/csv; charset=utf-8",
+        )
+
 
 def order_index(request: HttpRequest) -> HttpResponse:
     """
@@ -91,11 +401,12 @@ class DishCreateView(CreateView):
     success_url: str = reverse_lazy("ordersapp:dishes_list")
 
     def form_valid(self, form: Any):
-        log.info(f"Создано новое блюдо: {form.instance.name}")
+        form.instance.cafe = self.request.cafe
+        log.info("Создано новое блюдо: %s", form.instance.name)
         return super().form_valid(form)
 
 
-class DishListView(ListView):
+class DishListView(CafeScopedMixin, ListView):
     """
     Класс для отображения списка блюд
     """
@@ -117,17 +428,21 @@ class OrderCreateView(CreateView):
 
     log.debug("Create order")
     model: Type[Order] = Order
-    fields: Tuple[str, str] = ("table_number", "items")
+    form_class: Type[OrderCreateForm] = OrderCreateForm
     template_name_suffix: str = "_create"
 
     success_url: str = reverse_lazy("ordersapp:orders_list")
 
+    def get_form_kwargs(self) -> dict:
+        return {**super().get_form_kwargs(), "cafe": self.request.cafe}
+
     def form_valid(self, form: Any) -> HttpResponse:
-        log.info(f"Создан новый заказ: стол {form.instance.table_number}")
+        form.instance.cafe = self.request.cafe
+        log.info("Создан новый заказ: стол %s", form.instance.table_number)
         return super().form_valid(form)
 
 
-class OrderListView(ListView):
+class OrderListView(CafeScopedMixin, ListView):
     """
     Класс для отображения списка заказов
     """
@@ -135,14 +450,14 @@ class OrderListView(ListView):
     log.debug("Orders list")
     template_name: str = "ordersapp/orders_list.html"
     context_object_name: str = "orders"
-    queryset: QuerySet[Order] = Order.objects.all()
+    queryset: QuerySet[Order] = Order.objects.prefetch_related("items")
 
     def get_queryset(self) -> QuerySet[Order]:
         log.debug("Запрос списка заказов")
         return super().get_queryset()
 
 
-class OrderDeleteView(DeleteView):
+class OrderDeleteView(CafeScopedMixin, DeleteView):
     """
     Класс для удаления заказа
     """
@@ -152,24 +467,53 @@ class OrderDeleteView(DeleteView):
     success_url: str = reverse_lazy("ordersapp:orders_list")
 
     def delete(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
-        log.warning(f"Удаление заказа {kwargs.get('pk')}")
+        log.warning("Удаление заказа %s", kwargs.get("pk"))
         return super().delete(request, *args, **kwargs)
 
 
-class OrderUpdateView(UpdateView):
+class OrderUpdateView(CafeScopedMixin, UpdateView):
     """
     Класс для обновления статуса заказа
     """
 
     log.debug("Update status order")
     model: Type[Order] = Order
-    fields: Tuple[str, str] = ("status", "items")
+    form_class: Type[OrderUpdateForm] = OrderUpdateForm
     template_name_suffix: str = "_update_form"
     success_url: str = reverse_lazy("ordersapp:orders_list")
 
+    def get_form_kwargs(self) -> dict:
+        return {**super().get_form_kwargs(), "cafe": self.request.cafe}
+
     def form_valid(self, form: Any) -> HttpResponse:
-        log.info(f"Обновлен заказ {form.instance.pk}: статус {form.instance.status}")
-        return super().form_valid(form)
+        try:
+            with transaction.atomic(using=router.db_for_write(Order)):
+                response: HttpResponse = super().form_valid(form)
+        except OrderVersionConflict:
+            log.warning("Конфликт версий при обновлении заказа %s", form.instance.pk)
+            # показываем ошибку и подставляем актуальную версию,
+            # чтобы повторная отправка формы сознательно перезаписала заказ
+            form.data = form.data.copy()
+            form.data["version"] = Order.objects.values_list("version", flat=True).get(
+                pk=form.instance.pk
+            )
+            form.add_error(
+                None, "Заказ уже изменён другим пользователем. Проверьте данные."
+            )
+            return self.form_invalid(form)
+        log.info("Обновлен заказ %s: статус %s", form.instance.pk, form.instance.status)
+        return response
+
+
+class TableStateListView(CafeScopedMixin, ListView):
+    """
+    Класс для отображения плана зала:
+    сколько должен каждый стол прямо сейчас
+    """
+
+    template_name: str = "ordersapp/tables_floor.html"
+    context_object_name: str = "tables"
+    queryset: QuerySet[TableState] = TableState.objects.order_by("table_number")
 
 
 class OrderSearchListView(ListView):
@@ -184,26 +528,53 @@ class OrderSearchListView(ListView):
 
     def get_queryset(self) -> QuerySet[Order]:
         query: str = self.request.GET.get("q", "")
-        log.debug(f"Поиск заказа по запросу: {query}")
-        object_list: QuerySet[Order] = Order.objects.filter(
-            Q(status__icontains=query) | Q(table_number__icontains=query)
+        log.debug("Поиск заказа по запросу: %s", query)
+        object_list: QuerySet[Order] = Order.objects.prefetch_related("items").filter(
+            Q(status__icontains=query) | Q(table_number__icontains=query),
+            cafe=self.request.cafe,
         )
         return object_list
 
 
 class OrderTotalIncomesListView(ListView):
     """
-    Класс для подсчета выручки за смену
+    Класс для подсчета выручки за смену.
+    Выручку считает фоновая задача revenue_report (см. jobs), страница
+    показывает итог последнего выполненного отчёта и ставит новый
+    в очередь по кнопке. Оплаченные заказы выводятся постранично
     """
 
     log.debug("Total incomes order")
     model: Type[Order] = Order
     template_name: str = "ordersapp/total_incomes.html"
+    paginate_by: int = 50
 
-    def get_queryset(self) -> Tuple[QuerySet[Order], float]:
-        orders: QuerySet[Order] = Order.objects.prefetch_related("items").filter(
-            status__contains="Оплачено"
+    def get_queryset(self) -> QuerySet[Order]:
+        return (
+            Order.objects.prefetch_related("items")
+            .filter(cafe=self.request.cafe, status=Order.STATUS_PAID)
+            .order_by("-pk")
         )
-        total: float = sum((item.total_price for item in orders.all()))
-        log.info(f"Общая выручка за смену: {total}")
-        return orders, total
+
+    def get_context_data(self, **kwargs) -> dict:
+        context: dict = super().get_context_data(**kwargs)
+        reports: QuerySet[Job] = Job.objects.filter(
+            cafe=self.request.cafe, kind=Job.KIND_REVENUE_REPORT
+        ).order_by("-pk")
+        report: Optional[Job] = reports.filter(status=Job.STATUS_DONE).first()
+        total: Optional[Decimal] = revenue_report_total(report) if report else None
+        # сумма строкой: шаблон не должен локализовать её ("301,25")
+        context["total"] = None if total is None else str(total)
+        context["report"] = report
+        context["pending_report"] = reports.filter(
+            status__in=(Job.STATUS_QUEUED, Job.STATUS_RUNNING)
+        ).first()
+        return context
+
+    def post(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """
+        Ставит отчёт о выручке в очередь (или берёт уже ожидающий)
+        """
+        job: Job = submit_revenue_report(request.cafe)
+        log.info("Отчёт о выручке: задача %s", job.pk)
+        return redirect("ordersapp:total_incomes")
@@ -0,0 +1,27 @@
+"""
+Точки входа для процессов пула команды run_jobs.
+
+Процессы запускаются через spawn: модуль импортируется до настройки
+Django, поэтому модели и задачи импортируются внутри функций.
+"""
+
+
+def init() -> None:
+    """
+    Инициализация процесса пула: настройка Django
+    (DJANGO_SETTINGS_MODULE наследуется от родительского процесса)
+    """
+    import django
+
+    django.setup()
+
+
+def run(pk: int) -> str:
+    """
+    Выполняет фоновую задачу в процессе пула
+    :param pk: номер задачи
+    :return: итоговый статус задачи
+    """
+    from .jobs import run_job
+
+    return run_job(pk)